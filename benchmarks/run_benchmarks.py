@@ -0,0 +1,207 @@
+"""
+Benchmark suite for the processing and plotting paths.
+
+Times the cold import of the package and its main modules (each in a fresh interpreter), load_data, process_daily, process_yearly, query, stream_yearly, group_attendance_by_time (for every 'by' option) and
+headless rendering of each plot function on synthetic data at several scales (see synthetic.py), and saves the
+results as a JSON baseline. With --compare, the run is checked against an earlier baseline and any stage that got
+slower than the threshold is reported as a regression (exit code 1).
+
+Examples (run from the repository root):
+    python benchmarks/run_benchmarks.py --scales 1 10 --output baseline.json
+    python benchmarks/run_benchmarks.py --scales 1 10 --compare baseline.json --threshold 0.25
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+
+import matplotlib
+matplotlib.use("Agg")
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mlbattendanceplotter import processing
+from mlbattendanceplotter.processing import load_data, process_daily, process_yearly, stream_yearly, \
+    group_attendance_by_time, daily_table, build_trend_table, registry, selection_cache, SOURCE_FILES
+from mlbattendanceplotter.query import query
+from mlbattendanceplotter.rendering import render_plot
+from synthetic import generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data")
+
+# Modules whose cold import time is measured. The package and plotting module must not pull in the drawing libraries
+# or read any data, so these should stay well under the time of importing pandas plus seaborn/matplotlib/plotly.
+IMPORT_MODULES = ["mlbattendanceplotter", "mlbattendanceplotter.processing", "mlbattendanceplotter.plotting"]
+
+# Plot function (optionally followed by a variant label) -> (format, kwargs) rendered by the 'render' stages
+RENDER_JOBS = {
+    "bar_attendance_by_time": ("png", {"by": "month", "team": "BOS", "year": 2016, "show_league_avg": True}),
+    "bar_by_team": ("png", {"y": "attendance%"}),
+    "scatter_daily": ("png", {"x": "tavg", "y": "attendance%", "team": "BOS", "lobf": True}),
+    "scatter_yearly": ("png", {"x": "win_pct", "y": "attendance%"}),
+    "scatter_3d": ("html", {"x": "win_pct", "y": "tavg", "z": "attendance%", "time": "daily"}),
+    "line_trend": ("png", {"y": "attendance%_rolling", "team": "BOS"}),
+    "correlation_heatmap": ("png", {"time": "yearly"}),
+    "correlation_heatmap (pair_grid)": ("png", {"time": "yearly", "variables": ["tavg", "win_pct", "attendance%"],
+                                                "pair_grid": True}),
+    "bar_attendance_by_time_grid": ("png", {"by": "month", "year": 2016, "facet": "team"}), # One panel per team
+    "scatter_daily_grid": ("png", {"x": "tavg", "y": "attendance%", "year": 2016, "facet": "team", "lobf": True}),
+}
+
+def measure(func, repeat):
+    """Runs func() 'repeat' times and returns the fastest and median wall times in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {"min": min(times), "median": statistics.median(times)}
+
+def import_time(module):
+    """Returns the wall time in seconds of importing 'module' in a fresh interpreter."""
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(output.stdout)
+
+def run_imports(repeat):
+    """Times the cold import of every module in IMPORT_MODULES and returns {stage: timings}."""
+    results = {}
+    for module in IMPORT_MODULES:
+        times = [import_time(module) for _ in range(repeat)]
+        results[f"import {module}"] = {"min": min(times), "median": statistics.median(times)}
+    return results
+
+def prepare_data(scale, data_dir):
+    """Generates (or reuses) the synthetic CSVs for 'scale' and returns their directory."""
+    directory = os.path.join(data_dir, f"scale-{scale}")
+    if not all(os.path.exists(os.path.join(directory, file)) for file in SOURCE_FILES.values()):
+        generate(scale, directory)
+    return directory
+
+def run_scale(directory, repeat, render):
+    """Runs every stage on the data in 'directory' and returns {stage: timings}."""
+    registry.directory = directory
+    results = {}
+
+    def cold_load():
+        for path in glob.glob(os.path.join(directory, "*.parquet")):
+            os.remove(path)
+        registry.invalidate()
+        load_data()
+
+    def warm_load():
+        registry.invalidate()
+        load_data()
+
+    results["load_data (csv)"] = measure(cold_load, repeat)
+    results["load_data (cached)"] = measure(warm_load, repeat)
+
+    games, weather, census = load_data()
+    results["process_daily (merge)"] = measure(lambda: process_daily(games, weather), repeat)
+    results["process_yearly (merge)"] = measure(lambda: process_yearly(games, weather, census), repeat)
+
+    def selection(func):
+        def run():
+            selection_cache.clear()
+            func(team="BOS", year=2016)
+        return run
+
+    process_daily() # Build the registry's derived tables once, as a long-running process would
+    process_yearly()
+    results["process_daily (selection)"] = measure(selection(process_daily), repeat)
+    results["process_yearly (selection)"] = measure(selection(process_yearly), repeat)
+    results["query (selection)"] = measure(selection(
+        lambda team, year: query("daily", team, year, columns=["tavg", "attendance%"])), repeat)
+    results["stream_yearly"] = measure(lambda: stream_yearly(chunksize=250_000), repeat)
+
+    results["build_trend_table"] = measure(lambda: build_trend_table(daily_table()), repeat)
+
+    daily_df = process_daily(games, weather)
+    for by in ["start time", "weekday", "month", "year"]:
+        results[f"group_attendance_by_time ({by})"] = measure(
+            lambda: group_attendance_by_time(daily_df, by), repeat)
+
+    if render:
+        for job, (fmt, kwargs) in RENDER_JOBS.items():
+            plot = job.split(" ")[0]
+            results[f"render {job}"] = measure(lambda: render_plot(plot, fmt=fmt, **kwargs), repeat)
+
+    results["rows"] = {"games": len(games), "weather": len(weather), "census": len(census)}
+    return results
+
+def compare(current, baseline, threshold):
+    """Returns a list of (scale, stage, baseline seconds, current seconds) for stages slower than the threshold."""
+    regressions = []
+    for stage, timings in current.get("imports", {}).items():
+        previous = baseline.get("imports", {}).get(stage)
+        if previous is not None and timings["min"] > previous["min"] * (1 + threshold):
+            regressions.append(("-", stage, previous["min"], timings["min"]))
+    for scale, stages in current["scales"].items():
+        for stage, timings in stages.items():
+            previous = baseline.get("scales", {}).get(scale, {}).get(stage)
+            if stage == "rows" or previous is None:
+                continue
+            if timings["min"] > previous["min"] * (1 + threshold):
+                regressions.append((scale, stage, previous["min"], timings["min"]))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the mlbattendanceplotter processing/plotting paths.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10],
+                        help="Data sizes as multiples of the shipped data (e.g. 1 10 100 1000).")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the fastest run is compared.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Baseline JSON file to check the results against.")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Relative slowdown reported as a regression (default 0.25 = 25%%).")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="Where the synthetic data is generated.")
+    parser.add_argument("--skip-render", action="store_true", help="Skip the rendering stages.")
+    args = parser.parse_args(argv)
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "repeat": args.repeat,
+        },
+        "imports": run_imports(args.repeat),
+        "scales": {},
+    }
+    for stage, timings in results["imports"].items():
+        print(f"{'':<13}{stage:<40} {timings['min'] * 1000:>10.1f} ms")
+    original_directory = registry.directory
+    try:
+        for scale in args.scales:
+            directory = prepare_data(scale, args.data_dir)
+            results["scales"][str(scale)] = stages = run_scale(directory, args.repeat, not args.skip_render)
+            for stage, timings in stages.items():
+                if stage != "rows":
+                    print(f"scale {scale:>5}  {stage:<40} {timings['min'] * 1000:>10.1f} ms")
+    finally:
+        registry.directory = original_directory
+        registry.invalidate()
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        for scale, stage, before, after in regressions:
+            print(f"REGRESSION scale {scale}: {stage} {before * 1000:.1f} ms -> {after * 1000:.1f} ms")
+        if regressions:
+            return 1
+        print("No regressions.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Synthetic data generator for the benchmark suite.
+
+Writes Baseball Reference, Meteostat and census shaped CSVs (same file names and columns as the package data) at a
+multiple of the real row counts. Scale 1 matches the shipped data: 30 teams x 8 seasons, 81 home games and 200
+weather days per team-season. Larger scales add teams, so each team-season keeps its realistic shape.
+"""
+import os
+import numpy as np
+import pandas as pd
+
+from mlbattendanceplotter.processing import SOURCE_FILES, team_abb_dict
+
+YEARS = list(range(2012, 2020))
+HOME_GAMES = 81
+WEATHER_DAYS = 200 # March 20th - October 5th
+
+def team_codes(n_teams):
+    """Returns n_teams team abbreviations: the 30 real ones first, then synthetic 'X0031', 'X0032', ..."""
+    real = sorted(team_abb_dict)
+    return real[:n_teams] + [f"X{i:04d}" for i in range(len(real) + 1, n_teams + 1)]
+
+def generate_games(teams, rng):
+    """Returns a bref_2012_2019.csv-shaped DataFrame with HOME_GAMES rows per team-season."""
+    n_seasons = len(teams) * len(YEARS)
+    n = n_seasons * HOME_GAMES
+    season = np.repeat(np.arange(n_seasons), HOME_GAMES)
+    team_idx, year_idx = season // len(YEARS), season % len(YEARS)
+    game_num = np.tile(np.arange(1, HOME_GAMES + 1), n_seasons)
+
+    # Home games spread over the season, roughly every other day starting in early April
+    opening_day = pd.to_datetime([f"{year}-04-01" for year in YEARS]).values[year_idx]
+    dates = opening_day + (game_num * 2 + rng.integers(0, 2, n)).astype("timedelta64[D]")
+
+    capacity = rng.integers(35_000, 56_000, len(teams))[team_idx]
+    attendance_pct = np.clip(rng.normal(70, 18, n), 10, 100).round(2)
+    win_pct = np.clip(rng.normal(0.5, 0.08, n), 0, 1).round(3)
+    return pd.DataFrame({
+        "date": pd.DatetimeIndex(dates).strftime("%Y-%m-%d"),
+        "year": np.array(YEARS)[year_idx],
+        "team": np.array(teams)[team_idx],
+        "win_pct": win_pct,
+        "attendance": (capacity * attendance_pct / 100).round(0),
+        "attendance%": attendance_pct,
+        "num_home_game": game_num,
+        "opp": np.array(teams)[rng.integers(0, len(teams), n)],
+        "opp_win_pct": np.clip(rng.normal(0.5, 0.08, n), 0, 1).round(3),
+        "start_time": np.where(rng.random(n) < 0.35, "Day", "Night"),
+        "cli": rng.gamma(2, 0.5, n).round(2),
+    })
+
+def generate_weather(teams, rng):
+    """Returns a weather_2012_2019.csv-shaped DataFrame with WEATHER_DAYS rows per team-season."""
+    n_seasons = len(teams) * len(YEARS)
+    n = n_seasons * WEATHER_DAYS
+    season = np.repeat(np.arange(n_seasons), WEATHER_DAYS)
+    team_idx, year_idx = season // len(YEARS), season % len(YEARS)
+    day = np.tile(np.arange(WEATHER_DAYS), n_seasons)
+
+    first_day = pd.to_datetime([f"{year}-03-20" for year in YEARS]).values[year_idx]
+    tavg = 55 + 25 * np.sin(day / WEATHER_DAYS * np.pi) + rng.normal(0, 6, n)
+    spread = rng.uniform(5, 15, n)
+    prcp = np.where(rng.random(n) < 0.7, 0.0, rng.exponential(0.3, n)).round(2)
+    df = pd.DataFrame({
+        "team": np.array(teams)[team_idx],
+        "year": np.array(YEARS)[year_idx],
+        "date": pd.DatetimeIndex(first_day + day.astype("timedelta64[D]")).strftime("%Y-%m-%d"),
+        "tavg": tavg.round(2),
+        "tmin": (tavg - spread).round(2),
+        "tmax": (tavg + spread).round(2),
+        "prcp": prcp,
+    })
+    # Missing readings, like the real weather stations
+    df.loc[rng.random(n) < 0.025, "tavg"] = np.nan
+    df.loc[rng.random(n) < 0.07, "prcp"] = np.nan
+    return df
+
+def generate_census(teams, rng):
+    """Returns a census_2012_2019.csv-shaped DataFrame with one row per team-season."""
+    n = len(teams) * len(YEARS)
+    team_idx, year_idx = np.arange(n) // len(YEARS), np.arange(n) % len(YEARS)
+    car = rng.uniform(60, 90, n)
+    transit = rng.uniform(1, 35, n)
+    return pd.DataFrame({
+        "team": np.array(teams)[team_idx],
+        "city": [team_abb_dict.get(team, f"City {team}") for team in np.array(teams)[team_idx]],
+        "year": np.array(YEARS)[year_idx],
+        "population": rng.integers(300_000, 8_700_000, n).astype(float),
+        "median_age": rng.uniform(30, 42, n).round(1),
+        "median_household_income": rng.integers(30_000, 110_000, n).astype(float),
+        "average_household_size": rng.uniform(2.1, 3.1, n).round(1),
+        "pct_public_transit": transit.round(1),
+        "pct_car": car.round(1),
+        "pct_walk": rng.uniform(1, 12, n).round(1),
+        "poverty_rate": rng.uniform(8, 35, n).round(1),
+        "payroll_est": rng.integers(50_000_000, 270_000_000, n),
+    })
+
+def generate(scale, out_dir, seed=0):
+    """
+    Writes synthetic games/weather/census CSVs at 'scale' times the shipped row counts into out_dir.
+    Returns out_dir.
+    """
+    rng = np.random.default_rng(seed)
+    teams = team_codes(30 * scale)
+    os.makedirs(out_dir, exist_ok=True)
+    for name, generator in [("games", generate_games), ("weather", generate_weather), ("census", generate_census)]:
+        generator(teams, rng).to_csv(os.path.join(out_dir, SOURCE_FILES[name]), index=False)
+    return out_dir
@@ -1,3 +1,16 @@
-from . import processing
-from . import plotting
+import importlib
 
+# Submodules are imported on first attribute access (e.g. mlbattendanceplotter.plotting), so importing the package
+# itself costs almost nothing. Data files are read on first use by the processing registry.
+SUBMODULES = ("processing", "plotting", "query", "rendering", "cache", "instrumentation", "stats", "dense", "ingest",
+              "serve", "batch", "shared")
+
+__all__ = list(SUBMODULES)
+
+def __getattr__(name):
+    if name in SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(SUBMODULES))
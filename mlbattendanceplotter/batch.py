@@ -0,0 +1,236 @@
+"""
+Runs a declarative job file of charts and data extracts in one process tree, sharing the loaded data between them.
+
+A job file (JSON, or YAML if PyYAML is installed) lists charts and extracts with their arguments:
+    charts:
+      - plot: bar_by_team
+        kwargs: {y: attendance%, year: 2019}
+        name: attendance_2019.png              # optional, default '<index>_<plot>.<format>'
+      - plot: scatter_daily
+        kwargs: {x: tavg, y: attendance, team: BOS, year: 2019, lobf: true}
+        format: svg                            # optional: png (default), svg or html
+    extracts:
+      - extract: grouped                       # yearly, daily or grouped (see rendering.extract_frame)
+        kwargs: {by: month, team: BOS, year: 2019}
+        format: csv                            # optional: csv (default) or json
+
+Work is shared at three levels. Identical jobs are run once and their output copied. The source data and derived
+tables (daily/yearly tables, attendance cube) that any job needs are built once before the workers start, and forked
+workers inherit them. Jobs that need the same team/year selection run in the same worker, one after the other, so the
+selection is only computed once (see selection_cache). Groups of jobs run in parallel in a process pool.
+Every output is written to the output directory together with 'manifest.json', which records each job's output
+path, size, wall time, worker group and error, if any.
+
+Example:
+    python -m mlbattendanceplotter.batch nightly.yaml --out-dir reports --workers 4
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import multiprocessing
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+
+from .processing import canonical_selection, daily_table, yearly_table, attendance_cube
+from .rendering import PLOT_FUNCTIONS, FORMATS, EXTRACTS, DATA_FORMATS, render_plot, render_extract, init_worker, \
+    headless
+from .cache import bind_arguments, normalize_argument
+
+MANIFEST = "manifest.json"
+
+def load_jobs(path):
+    """Reads a job file (JSON, or YAML for .yaml/.yml files) and returns its dict."""
+    with open(path) as file:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError as error:
+                raise ValueError("Reading YAML job files requires the 'pyyaml' package; use JSON instead.") from error
+            spec = yaml.safe_load(file)
+        else:
+            spec = json.load(file)
+    return spec
+
+def normalize_jobs(spec):
+    """
+    Returns the jobs of a job file spec as dicts with 'kind' ('chart' or 'extract'), 'target' (plot or extract name),
+    'kwargs', 'format' and 'name' keys. A spec that is not a mapping of 'charts' and/or 'extracts' lists, invalid
+    plots, extracts, formats, arguments or duplicate names raise a ValueError before anything runs.
+    """
+    if not isinstance(spec, dict) or not set(spec) <= {"charts", "extracts"}:
+        raise ValueError("A job file must be a mapping with 'charts' and/or 'extracts' lists.")
+    jobs = []
+    for kind, key, valid, formats, default_format in [("chart", "plot", PLOT_FUNCTIONS, FORMATS, "png"),
+                                                      ("extract", "extract", EXTRACTS, DATA_FORMATS, "csv")]:
+        for index, entry in enumerate(spec.get(f"{kind}s") or []):
+            target = entry.get(key)
+            if target not in valid:
+                raise ValueError(f"Invalid {key} '{target}' in {kind} {index}. Valid {key}s are: {', '.join(valid)}.")
+            fmt = entry.get("format", default_format)
+            if fmt not in formats:
+                raise ValueError(f"Invalid format '{fmt}' in {kind} {index}. Valid formats are: {', '.join(formats)}.")
+            kwargs = dict(entry.get("kwargs") or {})
+            if kind == "chart":
+                try:
+                    bind_arguments(target, (), kwargs)
+                except TypeError as error:
+                    raise ValueError(f"Invalid arguments for {target}() in chart {index}: {error}") from error
+            jobs.append({"kind": kind, "target": target, "kwargs": kwargs, "format": fmt,
+                         "name": entry.get("name", f"{index:04d}_{target}.{fmt}")})
+
+    names = [job["name"] for job in jobs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Output names used by several jobs: {', '.join(duplicates)}.")
+    return jobs
+
+def job_key(job):
+    """Returns a key that is equal for jobs producing the same output (chart defaults are filled in)."""
+    arguments = bind_arguments(job["target"], (), job["kwargs"], defaults=True) if job["kind"] == "chart" \
+        else job["kwargs"]
+    return json.dumps([job["kind"], job["target"], job["format"], arguments], sort_keys=True,
+                      default=normalize_argument)
+
+def shared_work(job):
+    """
+    Returns (level, teams, years) of the intermediate result a job starts from: the 'daily' or 'yearly' selection,
+    or a roll-up of the attendance 'cube'. Jobs with the same key are run by the same worker.
+    """
+    kwargs = job["kwargs"]
+    target = job["target"]
+    if target in ("bar_attendance_by_time", "bar_attendance_by_time_grid"):
+        level = "cube"
+    elif target in ("bar_by_team", "scatter_yearly", "yearly"):
+        level = "yearly"
+    elif target == "scatter_3d":
+        level = kwargs.get("time", "daily")
+    elif target == "correlation_heatmap":
+        level = kwargs.get("time", "yearly")
+    else:
+        level = "daily"
+    return level, canonical_selection(kwargs.get("team")), canonical_selection(kwargs.get("year"))
+
+def prepare(levels):
+    """Builds the registry tables needed for the given levels ('daily', 'yearly', 'cube') in this process."""
+    if "daily" in levels or "cube" in levels:
+        daily_table()
+    if "yearly" in levels:
+        yearly_table()
+    if "cube" in levels:
+        attendance_cube()
+
+def run_job(job, out_dir):
+    """Runs one normalized job, writes its output and returns its manifest entry."""
+    path = os.path.join(out_dir, job["name"])
+    entry = {"name": job["name"], "kind": job["kind"], "target": job["target"], "kwargs": job["kwargs"],
+             "format": job["format"], "path": path}
+    start = time.perf_counter()
+    try:
+        if job["kind"] == "chart":
+            data = render_plot(job["target"], fmt=job["format"], **job["kwargs"])
+        else:
+            data = render_extract(job["target"], fmt=job["format"], **job["kwargs"])
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(data)
+        entry["bytes"] = len(data)
+    except Exception as error:
+        entry["error"] = repr(error)
+    entry["wall_time"] = time.perf_counter() - start
+    return entry
+
+def run_group(jobs, out_dir):
+    """Runs jobs that share an intermediate result one after the other and returns their manifest entries."""
+    return [run_job(job, out_dir) for job in jobs]
+
+def run_batch(spec, out_dir, workers=None):
+    """
+    Runs every chart and extract of a job file spec (see load_jobs) and writes the outputs and a manifest to out_dir.
+    Parameters:
+        spec (dict or str): Job file contents, or the path of a JSON/YAML job file.
+        out_dir (str): Directory the outputs and 'manifest.json' are written to. Created if it does not exist.
+        workers (int): Number of worker processes. Defaults to the number of CPUs. With workers=1 all jobs run in
+                        the calling process, with the Agg backend (see rendering.headless).
+    Returns the manifest dict: run totals and one entry per job (in job file order) with its 'path', 'bytes',
+        'wall_time', 'group' and 'duplicate_of' (the job whose output was copied), or 'error' if it failed.
+    """
+    started = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    jobs = normalize_jobs(load_jobs(spec) if isinstance(spec, str) else spec)
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    unique = {} # output key -> first job with that output
+    duplicate_of = {}
+    for job in jobs:
+        first = unique.setdefault(job_key(job), job)
+        if first is not job:
+            duplicate_of[job["name"]] = first["name"]
+    groups = {}
+    for job in unique.values():
+        groups.setdefault(shared_work(job), []).append(job)
+    groups = sorted(groups.values(), key=len, reverse=True) # Longest groups first
+
+    prepare_start = time.perf_counter()
+    prepare({shared_work(job)[0] for job in unique.values()})
+    prepare_time = time.perf_counter() - prepare_start
+
+    if workers == 1 or len(groups) <= 1:
+        with headless():
+            results = [run_group(group, out_dir) for group in groups]
+    else:
+        # Forked workers inherit the tables built by prepare() instead of rebuilding them
+        context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+        with ProcessPoolExecutor(max_workers=min(workers, len(groups)), mp_context=context,
+                                 initializer=init_worker) as executor:
+            results = list(executor.map(run_group, groups, [out_dir] * len(groups)))
+
+    entries = {}
+    for index, group in enumerate(results):
+        for entry in group:
+            entries[entry["name"]] = dict(entry, group=index, duplicate_of=None)
+    for job in jobs:
+        if job["name"] in duplicate_of:
+            original = entries[duplicate_of[job["name"]]]
+            entry = dict(original, name=job["name"], path=os.path.join(out_dir, job["name"]), wall_time=0.0,
+                         duplicate_of=original["name"])
+            if "error" not in original:
+                shutil.copyfile(original["path"], entry["path"])
+            entries[job["name"]] = entry
+
+    manifest = {
+        "started": started.isoformat(),
+        "wall_time": time.perf_counter() - start,
+        "prepare_time": prepare_time,
+        "workers": workers,
+        "jobs": len(jobs),
+        "distinct_jobs": len(unique),
+        "groups": len(groups),
+        "failed": sum("error" in entries[job["name"]] for job in jobs),
+        "outputs": [entries[job["name"]] for job in jobs],
+    }
+    with open(os.path.join(out_dir, MANIFEST), "w") as file:
+        json.dump(manifest, file, indent=2, default=normalize_argument)
+    return manifest
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the charts and data extracts listed in a job file.")
+    parser.add_argument("jobs", help="JSON or YAML job file.")
+    parser.add_argument("--out-dir", default="reports", help="Where the outputs and manifest.json are written.")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: number of CPUs).")
+    args = parser.parse_args(argv)
+
+    manifest = run_batch(args.jobs, args.out_dir, args.workers)
+    for entry in manifest["outputs"]:
+        status = entry.get("error") or ("copy of " + entry["duplicate_of"] if entry["duplicate_of"] else "ok")
+        print(f"{entry['name']:<40} {entry['wall_time'] * 1000:>9.1f} ms  {status}")
+    print(f"{manifest['jobs']} jobs ({manifest['distinct_jobs']} distinct, {manifest['groups']} groups) in "
+          f"{manifest['wall_time']:.2f} s, {manifest['failed']} failed. Manifest: "
+          f"{os.path.join(args.out_dir, MANIFEST)}")
+    return 1 if manifest["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
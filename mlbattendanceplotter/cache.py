@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import inspect
+import hashlib
+import functools
+import threading
+
+from .processing import registry
+
+class ChartCache:
+    """
+    Content-addressed on-disk cache of rendered charts.
+    Each chart is stored under a hash of the plotting function, its normalized arguments, the output format, the
+    contents of the source data (including rows appended in memory only) and whether the data is held in compact
+    form, so a cache hit returns the stored bytes without loading or processing any data. When the cache grows past
+    'max_bytes', the least recently used charts are deleted.
+    Parameters:
+        directory (str): Directory the rendered charts are stored in. Created if it does not exist.
+        max_bytes (int): Size cap of the cache directory in bytes. Defaults to 256 MB.
+        fmt (str): Format charts are rendered in: 'png' (default), 'svg' or 'html'.
+    """
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, fmt="png"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.fmt = fmt
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, plot, args=(), kwargs=None):
+        """Returns the cache key of the chart produced by plotting function 'plot' called with args and kwargs."""
+        payload = json.dumps({
+            "plot": plot,
+            "arguments": bind_arguments(plot, args, kwargs, defaults=True),
+            "format": self.fmt,
+            "data": registry.fingerprint(),
+            "compact": registry.compact, # float32 columns can round differently
+        }, sort_keys=True, default=normalize_argument)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        """Returns the file path a chart with 'key' is stored at."""
+        return os.path.join(self.directory, f"{key}.{self.fmt}")
+
+    def get(self, key):
+        """Returns the stored bytes for 'key', or None on a cache miss. A hit marks the chart as recently used."""
+        path = self.path(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            touch(path)
+        except OSError:
+            return None
+        return data
+
+    def put(self, key, data):
+        """Stores rendered chart bytes under 'key' and evicts the least recently used charts if over the size cap."""
+        path = self.path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+        touch(path)
+        self.evict()
+
+    def evict(self):
+        """Deletes the least recently used charts until the cache directory is within 'max_bytes'."""
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass # Already removed by another process
+                total -= size
+
+    def clear(self):
+        """Deletes every chart in the cache."""
+        for entry in os.scandir(self.directory):
+            if entry.is_file():
+                os.remove(entry.path)
+
+    def render(self, plot, args=(), kwargs=None):
+        """
+        Returns the rendered bytes of plotting function 'plot' called with args and kwargs, rendering and storing the
+        chart only on a cache miss.
+        """
+        from .rendering import render_plot
+
+        key = self.key(plot, args, kwargs)
+        data = self.get(key)
+        if data is not None:
+            self.hits += 1
+            return data
+        self.misses += 1
+
+        data = render_plot(plot, fmt=self.fmt, **bind_arguments(plot, args, kwargs))
+        self.put(key, data)
+        return data
+
+def touch(path):
+    """Sets a file's modification time, which doubles as its last-use time for LRU eviction, to now."""
+    now = time.time_ns() # Finer than the file system clock, so back-to-back uses keep their order
+    os.utime(path, ns=(now, now))
+
+def bind_arguments(plot, args=(), kwargs=None, defaults=False):
+    """
+    Binds positional and keyword arguments of plotting function 'plot' to parameter names, so that equivalent calls
+    produce the same dict. With defaults=True, unspecified parameters are filled in with their default values.
+    The 'show' argument is dropped since it does not change the chart.
+    """
+    from . import plotting
+
+    bound = inspect.signature(inspect.unwrap(getattr(plotting, plot))).bind(*args, **(kwargs or {}))
+    if defaults:
+        bound.apply_defaults()
+    return {name: value for name, value in bound.arguments.items() if name != "show"}
+
+def normalize_argument(value):
+    """JSON fallback for plot arguments: tuples/sets become lists and NumPy scalars become Python numbers."""
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, tuple):
+        return list(value)
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Cannot use argument {value!r} in a chart cache key.")
+
+def cacheable(func):
+    """
+    Decorator that adds a 'cache' keyword argument to a plotting function. When a ChartCache is passed, the chart
+    is rendered in the cache's format and its bytes are returned, coming straight from the cache when possible.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, cache=None, **kwargs):
+        if cache is None:
+            return func(*args, **kwargs)
+        return cache.render(func.__name__, args, kwargs)
+    return wrapper
@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+
+WEATHER_VARIABLES = ["tavg", "tmin", "tmax", "prcp"]
+ATTENDANCE_VARIABLES = ["attendance", "attendance%"]
+
+class SeasonArrays:
+    """
+    Dense [team, year, day-of-season] arrays of daily values (e.g. weather readings or attendance).
+    Teams and years are stored once as integer codes along the first two axes, and days along the third axis are
+    counted from the earliest day of the year found in the data ('day_origin', 1 = January 1st). Cells without an
+    observation are NaN in every array and False in 'observed'. Lookups by (team, date) are plain array indexing,
+    so joining daily values onto games needs no string-keyed merge.
+    Build one with SeasonArrays.from_frame().
+    Attributes:
+        teams (pd.Index): Team abbreviation of each position along the first axis.
+        years (pd.Index): Year of each position along the second axis.
+        day_origin (int): Day of the year (1-366) stored at position 0 of the third axis.
+        values (dict): Variable name -> np.ndarray of shape (teams, years, days).
+        counts (np.ndarray): Number of source rows that fell in each cell (e.g. 2 for a doubleheader).
+    """
+    def __init__(self, teams, years, day_origin, values, counts):
+        self.teams = pd.Index(teams)
+        self.years = pd.Index(years)
+        self.day_origin = day_origin
+        self.values = values
+        self.counts = counts
+
+    @classmethod
+    def from_frame(cls, df, variables, dtype="float64"):
+        """
+        Builds the arrays from a long frame with 'team' and 'date' columns and one column per variable.
+        Rows that share a team and date (doubleheaders) are averaged into one cell.
+        Parameters:
+            df (pd.DataFrame): Long-format rows, e.g. the weather or games source.
+            variables (list): Columns to store.
+            dtype (str): Array dtype. float32 halves the memory at the cost of precision.
+        """
+        df = df[df["team"].notna() & df["date"].notna()]
+        dates = pd.DatetimeIndex(df["date"])
+        team = df["team"]
+        if isinstance(team.dtype, pd.CategoricalDtype):
+            teams = pd.Index(sorted(team.cat.remove_unused_categories().cat.categories.astype(str)))
+        else:
+            teams = pd.Index(sorted(team.astype(str).unique()))
+        years = pd.Index(np.unique(dates.year))
+        day_of_year = dates.dayofyear.to_numpy()
+        day_origin = int(day_of_year.min()) if len(df) else 1
+        shape = (len(teams), len(years), int(day_of_year.max()) - day_origin + 1 if len(df) else 0)
+
+        cells = np.ravel_multi_index((team_positions(teams, team), years.get_indexer(dates.year),
+                                      day_of_year - day_origin), shape)
+        size = int(np.prod(shape))
+        counts = np.bincount(cells, minlength=size)
+        values = {}
+        for variable in variables:
+            column = df[variable].to_numpy(dtype="float64", na_value=np.nan)
+            present = ~np.isnan(column)
+            totals = np.bincount(cells[present], column[present], minlength=size)
+            readings = np.bincount(cells[present], minlength=size)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                values[variable] = (totals / readings).astype(dtype).reshape(shape)
+        return cls(teams, years, day_origin, values, counts.astype(np.int16).reshape(shape))
+
+    def add_rows(self, df):
+        """
+        Returns new arrays holding these cells plus the rows of df (a long frame as taken by from_frame(), e.g. a new
+        day of readings). Teams, years and days are added to the axes as needed. Rows that share a cell are
+        averaged, and they replace any value the cell already held. These arrays are left unchanged.
+        """
+        df = df[df["team"].notna() & df["date"].notna()]
+        dates = pd.DatetimeIndex(df["date"])
+        teams = self.teams.union(pd.Index(df["team"].astype(str).unique()))
+        years = self.years.union(pd.Index(np.unique(dates.year)))
+        day_of_year = dates.dayofyear.to_numpy()
+        last_day = self.day_origin + self.counts.shape[2] - 1
+        day_origin = int(min(self.day_origin, day_of_year.min())) if len(df) else self.day_origin
+        shape = (len(teams), len(years), int(max(last_day, day_of_year.max() if len(df) else last_day)) - day_origin + 1)
+
+        # Existing cells, at their positions along the new axes
+        block = np.ix_(teams.get_indexer(self.teams), years.get_indexer(self.years),
+                       np.arange(self.counts.shape[2]) + self.day_origin - day_origin)
+        counts = np.zeros(shape, dtype=self.counts.dtype)
+        counts[block] = self.counts
+        values = {}
+        for variable, array in self.values.items():
+            values[variable] = np.full(shape, np.nan, dtype=array.dtype)
+            values[variable][block] = array
+
+        cells = np.ravel_multi_index((team_positions(teams, df["team"]), years.get_indexer(dates.year),
+                                      day_of_year - day_origin), shape)
+        rows = np.bincount(cells, minlength=counts.size).reshape(shape)
+        touched = rows > 0
+        counts[touched] = rows[touched]
+        for variable in values:
+            column = df[variable].to_numpy(dtype="float64", na_value=np.nan)
+            present = ~np.isnan(column)
+            totals = np.bincount(cells[present], column[present], minlength=counts.size)
+            readings = np.bincount(cells[present], minlength=counts.size)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                values[variable][touched] = (totals / readings).reshape(shape)[touched]
+        return SeasonArrays(teams, years, day_origin, values, counts)
+
+    @property
+    def observed(self):
+        """Boolean [team, year, day] mask of the cells with at least one source row."""
+        return self.counts > 0
+
+    @property
+    def nbytes(self):
+        """Memory held by the arrays, in bytes."""
+        return self.counts.nbytes + sum(array.nbytes for array in self.values.values())
+
+    def codes(self, team, date):
+        """
+        Returns (team, year, day) index arrays for array-likes of teams and dates. Positions outside the arrays
+        (unknown team or year, day out of range) get -1 in all three.
+        """
+        dates = pd.DatetimeIndex(date)
+        team_codes = team_positions(self.teams, team)
+        year_codes = self.years.get_indexer(dates.year)
+        day_codes = dates.dayofyear.to_numpy() - self.day_origin
+        valid = (team_codes >= 0) & (year_codes >= 0) & (day_codes >= 0) & (day_codes < self.counts.shape[2])
+        return tuple(np.where(valid, codes, -1) for codes in (team_codes, year_codes, day_codes))
+
+    def lookup(self, variable, team, date):
+        """Returns the values of 'variable' for array-likes of teams and dates, NaN where there is no observation."""
+        team_codes, year_codes, day_codes = self.codes(team, date)
+        valid = team_codes >= 0
+        result = np.full(len(team_codes), np.nan, dtype=self.values[variable].dtype)
+        result[valid] = self.values[variable][team_codes[valid], year_codes[valid], day_codes[valid]]
+        return result
+
+    def value(self, variable, team, date):
+        """Returns a single value of 'variable' for one team and date (NaN if not observed)."""
+        date = pd.Timestamp(date)
+        if team not in self.teams or date.year not in self.years:
+            return np.nan
+        day = date.dayofyear - self.day_origin
+        if not 0 <= day < self.counts.shape[2]:
+            return np.nan
+        return self.values[variable][self.teams.get_loc(team), self.years.get_loc(date.year), day]
+
+    def select(self, variable, team=None, year=None):
+        """
+        Returns the [team, year, day] sub-array of 'variable' for the given team(s) and year(s). Teams and years that
+        are not stored are ignored. None selects all of them (with both None, the stored array itself is returned).
+        """
+        array = self.values[variable]
+        for axis, (index, values) in enumerate([(self.teams, team), (self.years, year)]):
+            if values is None:
+                continue
+            if isinstance(values, (str, int)):
+                values = [values]
+            positions = index.get_indexer(list(values))
+            array = np.take(array, np.sort(positions[positions >= 0]), axis=axis)
+        return array
+
+    def dates(self, year):
+        """Returns the dates along the day axis for 'year' (a pd.DatetimeIndex)."""
+        first = pd.Timestamp(year=int(year), month=1, day=1) + pd.Timedelta(days=self.day_origin - 1)
+        return pd.date_range(first, periods=self.counts.shape[2], freq="D")
+
+    def to_frame(self, team=None, year=None):
+        """Returns the observed cells for the given team(s)/year(s) in long format: team, year, date and variables."""
+        team_codes, year_codes, day_codes = np.nonzero(self.observed)
+        keep = np.ones(len(team_codes), dtype=bool)
+        for index, codes, values in [(self.teams, team_codes, team), (self.years, year_codes, year)]:
+            if values is not None:
+                values = [values] if isinstance(values, (str, int)) else list(values)
+                keep &= np.isin(codes, index.get_indexer(values))
+        team_codes, year_codes, day_codes = team_codes[keep], year_codes[keep], day_codes[keep]
+
+        years = self.years.to_numpy()[year_codes]
+        first_days = pd.to_datetime(pd.Series(years).astype(str) + "-01-01").to_numpy()
+        df = pd.DataFrame({
+            "team": self.teams.to_numpy()[team_codes],
+            "year": years,
+            "date": first_days + (day_codes + self.day_origin - 1).astype("timedelta64[D]"),
+        })
+        for variable, array in self.values.items():
+            df[variable] = array[team_codes, year_codes, day_codes]
+        return df
+
+def team_positions(teams, team):
+    """Returns the position in the 'teams' index of each team in an array-like (-1 for unknown teams)."""
+    team = pd.Series(team)
+    if isinstance(team.dtype, pd.CategoricalDtype): # Map the few categories, not every row
+        positions = teams.get_indexer(team.cat.categories.astype(str))
+        codes = team.cat.codes.to_numpy()
+        return np.where(codes >= 0, positions[codes], -1)
+    return teams.get_indexer(team.astype(str))
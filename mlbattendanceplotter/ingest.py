@@ -0,0 +1,417 @@
+"""
+Rebuilds the source CSVs that load_data() reads (games, weather and census) from their original services.
+
+Every source is fetched as one partition per team-season by a Fetcher. The default fetchers wrap the services used
+by the processing notebooks (pybaseball's Baseball Reference scraper, Meteostat and the Census ACS API). A CsvFetcher
+reads partitions from local files or a URL instead, e.g. a fixture server. Partitions are fetched concurrently with
+bounded parallelism and retries, and each one is saved under a raw directory as soon as it arrives. A refresh only
+fetches the partitions that are missing. The raw partitions are then cleaned with the notebooks' steps and written
+as the package's CSVs.
+
+Example (fetch whatever is missing and rebuild the data directory):
+    python -m mlbattendanceplotter.ingest --census-key YOUR_KEY
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .processing import DATA_DIRECTORY, SOURCE_FILES, team_abb_dict
+
+YEARS = range(2012, 2020)
+SOURCES = ("games", "weather", "census")
+STADIUM_FILE = os.path.join(DATA_DIRECTORY, "stadium_data.csv")
+RAW_DIRECTORY = os.path.join(DATA_DIRECTORY, "raw") # Fetched partitions, one CSV per source/team/year
+
+# Census variables of interest
+ACS_VARS = {
+    'population': 'B01003_001E',
+    'median_age': 'B01002_001E',
+    'median_household_income' : 'B19013_001E',
+    'num_households' : 'B11001_001E',
+    'num_people_in_households' : 'B11002_001E',
+    'total_workers' : 'B08301_001E',
+    'public_transportation_to_work' : 'B08301_010E',
+    'car_to_work' : 'B08301_002E',
+    'walk_to_work' : 'B08301_019E',
+    'population_poverty_eligible' : 'B17001_001E',
+    'population_below_poverty' : 'B17001_002E'
+}
+
+# Team -> (city label, state FIPS, place FIPS). Chicago and New York teams share a place. Toronto has no US census data.
+CENSUS_PLACES = {
+    'ARI' : ('Arizona Diamondbacks', '04', '55000'),
+    'OAK' : ('Oakland Athletics', '06', '53000'),
+    'ATL' : ('Atlanta Braves', '13', '04000'),
+    'BAL' : ('Baltimore Orioles', '24', '04000'),
+    'BOS' : ('Boston Red Sox', '25', '07000'),
+    'CHW' : ('Chicago White Sox', '17', '14000'),
+    'CHC' : ('Chicago Cubs', '17', '14000'),
+    'CIN' : ('Cincinnati Reds', '39', '15000'),
+    'CLE' : ('Cleveland Guardians', '39', '16000'),
+    'COL' : ('Colorado Rockies', '08', '20000'),
+    'DET' : ('Detroit Tigers', '26', '22000'),
+    'HOU' : ('Houston Astros', '48', '35000'),
+    'KCR' : ('Kansas City Royals', '29', '38000'),
+    'LAA' : ('Anaheim Angels', '06', '02000'),
+    'LAD' : ('Los Angeles Dodgers', '06', '44000'),
+    'MIA' : ('Miami Marlins', '12', '45000'),
+    'MIL' : ('Milwaukee Brewers', '55', '53000'),
+    'MIN' : ('Minnesota Twins', '27', '43000'),
+    'NYY' : ('New York Yankees', '36', '51000'), # Bronx
+    'NYM' : ('New York Mets', '36', '51000'), # Queens
+    'PHI' : ('Philadelphia Phillies', '42', '60000'),
+    'PIT' : ('Pittsburgh Pirates', '42', '61000'),
+    'SDP' : ('San Diego Padres', '06', '66000'),
+    'SFG' : ('San Francisco Giants', '06', '67000'),
+    'SEA' : ('Seattle Mariners', '53', '63000'),
+    'STL' : ('St. Louis Cardinals', '29', '65000'),
+    'TBR' : ('Tampa Bay Rays', '12', '63000'),
+    'TEX' : ('Texas Rangers', '48', '04000'),
+    'WSN' : ('Washington Nationals', '11', '50000'),
+}
+
+# Stadium locations (latitude, longitude) used to find the nearest weather station
+STADIUM_LOCATIONS = {
+    "ARI" : (33.4454, -112.0666), # Chase Field
+    "ATL" : (33.8907, -84.4676), # Truist Park
+    "BAL" : (39.2837, -76.6216), # Camden Yards
+    "BOS" : (42.3464, -71.0970), # Fenway Park
+    "CHC" : (41.9481, -87.6555), # Wrigley Field
+    "CHW" : (41.8296, -87.6337), # Rate Field
+    "CIN" : (39.0972, -84.5069), # Great American Ballpark
+    "CLE" : (41.4960, -81.6851), # Progressive Field
+    "COL" : (39.7560, -104.9929), # Coors Field
+    "DET" : (42.3392, -83.0488), # Comerica Park
+    "HOU" : (29.7572, -95.3552), # Daikin Park
+    "KCR" : (39.0515, -94.4804), # Kauffman Stadium
+    "LAA" : (33.8002, -117.8828), # Angel Stadium
+    "LAD" : (34.0736, -118.2398), # Dodger Stadium
+    "MIA" : (25.7781, -80.2195), # LoanDepot Park
+    "MIL" : (43.0280, -87.9712), # American Family Field
+    "MIN" : (44.9816, -93.2778), # Target Field
+    "NYM" : (40.7572, -73.8458), # Citi Field
+    "NYY" : (40.8295, -73.9265), # Yankee Stadium
+    "OAK" : (37.7455, -122.1990), # Oakland Coliseum
+    "PHI" : (39.9060, -75.1664), # Citizens Bank Park
+    "PIT" : (40.4469, -80.0056), # PNC Park
+    "SDP" : (32.7071, -117.1568), # Petco Park
+    "SEA" : (47.5913, -122.3325), # T-Mobile Park
+    "SFG" : (37.7786, -122.3902), # Oracle Park
+    "STL" : (38.6225, -90.1930), # Busch Stadium
+    "TBR" : (27.7680, -82.6532), # Tropicana Field
+    "TEX" : (32.7476, -97.0841), # Globe Life Field
+    "TOR" : (43.6416, -79.389), # Rogers Centre
+    "WSN" : (38.8727, -77.0074) # Nationals Park
+}
+
+### Fetchers ###
+class Fetcher(ABC):
+    """
+    Base class of the partition fetchers. Subclasses implement fetch(team, year), which returns the raw rows of one
+    team-season as a pd.DataFrame (empty if the source has nothing for it) and raises on errors worth retrying.
+    covers(team) tells which teams the source has data for.
+    """
+    @abstractmethod
+    def fetch(self, team, year):
+        """Returns the raw rows of one team-season as a pd.DataFrame."""
+
+    def covers(self, team):
+        return True
+
+class BaseballReferenceFetcher(Fetcher):
+    """Game results and attendance from Baseball Reference, via pybaseball's schedule_and_record()."""
+    def fetch(self, team, year):
+        from pybaseball import schedule_and_record
+        return schedule_and_record(year, team)
+
+class MeteostatFetcher(Fetcher):
+    """
+    Daily weather (°C, mm) from the Meteostat station nearest each stadium with a reading for at least 'min_days'
+    of the March 20th - October 5th window (the nearest station sometimes has no data).
+    """
+    def __init__(self, locations=STADIUM_LOCATIONS, min_days=200, candidates=5):
+        self.locations = locations
+        self.min_days = min_days
+        self.candidates = candidates
+
+    def covers(self, team):
+        return team in self.locations
+
+    def fetch(self, team, year):
+        from meteostat import Stations, Daily
+        start, end = datetime(year, 3, 20), datetime(year, 10, 5)
+        stations = Stations().nearby(*self.locations[team]).inventory("daily", (start, end)).fetch(self.candidates)
+        for station_id in stations.index:
+            data = Daily(station_id, start, end).fetch()
+            if len(data) >= self.min_days:
+                return data.reset_index().rename(columns={"time": "date"})
+        raise LookupError(f"No weather station near {team} has {self.min_days} days of data for {year}.")
+
+class CensusFetcher(Fetcher):
+    """American Community Survey (1-year) estimates for each team's city, via the 'census' package."""
+    def __init__(self, api_key, places=CENSUS_PLACES):
+        self.api_key = api_key
+        self.places = places
+
+    def covers(self, team):
+        return team in self.places
+
+    def fetch(self, team, year):
+        from census import Census
+        _, state, place = self.places[team]
+        data = Census(self.api_key, year=year).acs1.get(list(ACS_VARS.values()),
+                                                        {'for': f'place:{place}', 'in': f'state:{state}'})
+        codes = {code: name for name, code in ACS_VARS.items()}
+        return pd.DataFrame(data[:1]).rename(columns=codes)[list(ACS_VARS)] if data else pd.DataFrame()
+
+class CsvFetcher(Fetcher):
+    """
+    Reads partitions from CSV files or URLs, e.g. local fixtures or a fixture server standing in for a service.
+    Parameters:
+        template (str): Path or URL with '{team}' and '{year}' fields, e.g. 'http://localhost:8000/games/{team}/{year}.csv'.
+        teams (list): Optional teams the files cover. By default every team is attempted.
+    """
+    def __init__(self, template, teams=None):
+        self.template = template
+        self.teams = None if teams is None else set(teams)
+
+    def covers(self, team):
+        return self.teams is None or team in self.teams
+
+    def fetch(self, team, year):
+        return pd.read_csv(self.template.format(team=team, year=year))
+
+def default_fetchers(census_key=None):
+    """Returns {source: Fetcher} for the original remote services. Census data is only fetched with an API key."""
+    fetchers = {"games": BaseballReferenceFetcher(), "weather": MeteostatFetcher()}
+    if census_key:
+        fetchers["census"] = CensusFetcher(census_key)
+    return fetchers
+
+### Partitions ###
+def partition_path(raw_dir, source, team, year):
+    """Returns the path a raw team-season partition of 'source' is saved at."""
+    return os.path.join(raw_dir, source, f"{team}_{year}.csv")
+
+def fetch_partition(fetcher, team, year, path, retries=3, backoff=1.0):
+    """
+    Fetches one partition and saves it at 'path', retrying up to 'retries' times with exponential backoff.
+    The file is written atomically, so an interrupted run never leaves a partial partition behind.
+    """
+    for attempt in range(retries + 1):
+        try:
+            df = fetcher.fetch(team, year)
+            break
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+def fetch_partitions(fetchers, teams=None, years=YEARS, raw_dir=RAW_DIRECTORY, workers=8, retries=3, backoff=1.0,
+                     refresh=False):
+    """
+    Fetches the missing team-season partitions of every source concurrently.
+    Parameters:
+        fetchers (dict): Source name -> Fetcher.
+        teams (list): Teams to fetch. Defaults to every team (see team_abb_dict) the fetcher covers.
+        years (iterable): Seasons to fetch. Defaults to 2012-2019.
+        raw_dir (str): Directory the partitions are saved under.
+        workers (int): Maximum number of partitions fetched at the same time, across all sources.
+        retries (int): Retries per partition before it is reported as failed.
+        backoff (float): Seconds before the first retry, doubled on each further retry.
+        refresh (bool): If True, partitions that are already saved are fetched again.
+    Returns {source: {"fetched": [(team, year), ...], "skipped": [...], "failed": {(team, year): error message}}}.
+    """
+    teams = list(team_abb_dict) if teams is None else list(teams)
+    report = {source: {"fetched": [], "skipped": [], "failed": {}} for source in fetchers}
+    pending = []
+    for source, fetcher in fetchers.items():
+        for team in filter(fetcher.covers, teams):
+            for year in years:
+                path = partition_path(raw_dir, source, team, year)
+                if not refresh and os.path.exists(path):
+                    report[source]["skipped"].append((team, year))
+                else:
+                    pending.append((source, team, year, path))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch_partition, fetchers[source], team, year, path, retries, backoff):
+                   (source, team, year) for source, team, year, path in pending}
+        for future, (source, team, year) in futures.items():
+            try:
+                future.result()
+                report[source]["fetched"].append((team, year))
+            except Exception as e:
+                report[source]["failed"][(team, year)] = f"{type(e).__name__}: {e}"
+    return report
+
+def read_partitions(raw_dir, source):
+    """Returns every saved partition of 'source' as one pd.DataFrame with 'team' and 'year' columns added."""
+    frames = []
+    for path in sorted(glob.glob(os.path.join(raw_dir, source, "*_*.csv"))):
+        team, year = os.path.splitext(os.path.basename(path))[0].rsplit("_", 1)
+        try:
+            df = pd.read_csv(path)
+        except pd.errors.EmptyDataError:
+            continue # The source had no data for this team-season
+        frames.append(df.assign(team=team, year=int(year)))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+### Cleaning ###
+def read_stadiums(path=STADIUM_FILE):
+    """Returns the stadium data (capacity and estimated payroll per team-season) with lowercase column names."""
+    stadiums = pd.read_csv(path, encoding="utf-8-sig")
+    stadiums.columns = stadiums.columns.str.lower()
+    return stadiums
+
+def clean_games(raw, stadiums):
+    """
+    Turns raw schedule_and_record rows into the games table (bref_2012_2019.csv): win % from the W-L record, parsed
+    dates, day/night start times, the opponent's win %, home games only with their number in the season, and
+    attendance as a share of stadium capacity. Little League Classic games (under 3,000 fans) and the Houston games
+    moved by Hurricane Harvey (under 7,000) are removed.
+    Parameters:
+        raw (pd.DataFrame): Raw rows of every team-season, with 'team' and 'year' columns (see read_partitions).
+        stadiums (pd.DataFrame): Stadium data (see read_stadiums).
+    """
+    df = raw.copy()
+    record = df["W-L"].astype(str).str.extract(r"^\s*(\d+)-(\d+)\s*$").astype(float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        df["win_pct"] = (record[0] / (record[0] + record[1])).round(2)
+
+    # 'Friday, Apr 6' and 'Sunday, May 13 (2)' (doubleheaders) -> datetime
+    dates = df["Date"].str.replace(r"^\w+,\s*", "", regex=True).str.replace(r"\s\(\d+\)", "", regex=True)
+    df["date"] = pd.to_datetime(dates + " " + df["year"].astype(str), format="%b %d %Y")
+    df["start_time"] = df["D/N"].map({"D": "Day", "N": "Night"})
+
+    # Opponent's win % on the same date. As in the original notebook, a doubleheader matches both of the opponent's
+    # games, so refreshed data lines up with the shipped CSVs.
+    opponents = df[["date", "team", "win_pct"]].rename(columns={"team": "opp", "win_pct": "opp_win_pct"})
+    df = df.rename(columns={"Opp": "opp", "Attendance": "attendance", "cLI": "cli"})
+    df = df.merge(opponents, on=["date", "opp"], how="left")
+
+    # Home games only, numbered within each team-season
+    df = df[df["Home_Away"] != "@"].sort_values(["team", "year", "date"], kind="stable")
+    df["num_home_game"] = df.groupby(["team", "year"]).cumcount() + 1
+
+    # Attendance as a share of stadium capacity (capped at 100%)
+    df = df.merge(stadiums[["year", "team", "capacity"]], on=["year", "team"], how="left")
+    df["attendance%"] = (df["attendance"] / df["capacity"] * 100).clip(upper=100).round(2)
+
+    df = df[df["attendance"] >= 3000] # Little League Classic
+    df = df[(df["team"] != "HOU") | (df["attendance"] >= 7000)] # Hurricane Harvey
+    return df[["date", "year", "team", "win_pct", "attendance", "attendance%", "num_home_game", "opp", "opp_win_pct",
+               "start_time", "cli"]].reset_index(drop=True)
+
+def clean_weather(raw):
+    """Converts raw daily weather (°C, mm) into the weather table (weather_2012_2019.csv, °F and inches)."""
+    df = raw.copy()
+    df["date"] = pd.to_datetime(df["date"])
+    for col in ["tavg", "tmin", "tmax"]:
+        df[col] = df[col] * (9 / 5) + 32
+    df["prcp"] = df["prcp"] * 0.0393701
+    return df[["team", "year", "date", "tavg", "tmin", "tmax", "prcp"]].reset_index(drop=True)
+
+def clean_census(raw, stadiums):
+    """
+    Turns raw ACS estimates (see ACS_VARS) into the census table (census_2012_2019.csv): household size, commute
+    shares and poverty rate, plus the team's estimated payroll from the stadium data.
+    """
+    df = raw.copy()
+    df["city"] = df["team"].map(lambda team: CENSUS_PLACES.get(team, (team_abb_dict.get(team, team),))[0])
+    df['average_household_size'] = (df['num_people_in_households'] / df['num_households']).round(1)
+    df['pct_public_transit'] = (df['public_transportation_to_work'] / df['total_workers'] * 100).round(1)
+    df['pct_car'] = (df['car_to_work'] / df['total_workers'] * 100).round(1)
+    df['pct_walk'] = (df['walk_to_work'] / df['total_workers'] * 100).round(1)
+    df['poverty_rate'] = (df['population_below_poverty'] / df['population_poverty_eligible'] * 100).round(1)
+    df = df[['team', 'city', 'year', 'population', 'median_age', 'median_household_income', 'average_household_size',
+             'pct_public_transit', 'pct_car', 'pct_walk', 'poverty_rate']]
+    return df.merge(stadiums[['team', 'year', 'payroll_est']], on=['team', 'year'], how='left')
+
+def write_csv(df, path):
+    """Writes a source CSV atomically, so load_data() never reads a half-written file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+def ingest(fetchers=None, teams=None, years=YEARS, raw_dir=RAW_DIRECTORY, out_dir=DATA_DIRECTORY,
+           stadium_path=STADIUM_FILE, workers=8, retries=3, backoff=1.0, refresh=False):
+    """
+    Fetches the missing partitions of every source (see fetch_partitions), then cleans all saved partitions and
+    writes the CSVs load_data() reads. A source with failed partitions is not rewritten, so its previous CSV stays
+    in place; run again to retry only what is still missing. The package picks up the new files automatically.
+    Parameters:
+        fetchers (dict): Source name -> Fetcher. Defaults to default_fetchers() (games and weather only).
+        out_dir (str): Directory the CSVs are written to. Defaults to the package's data directory.
+        stadium_path (str): Stadium capacity/payroll CSV used by the games and census cleaning.
+        Other parameters are passed to fetch_partitions().
+    Returns the fetch report, with the number of rows written under "rows" for each rebuilt source.
+    """
+    fetchers = default_fetchers() if fetchers is None else fetchers
+    report = fetch_partitions(fetchers, teams, years, raw_dir, workers, retries, backoff, refresh)
+    stadiums = read_stadiums(stadium_path)
+    cleaners = {
+        "games": lambda raw: clean_games(raw, stadiums),
+        "weather": clean_weather,
+        "census": lambda raw: clean_census(raw, stadiums),
+    }
+
+    os.makedirs(out_dir, exist_ok=True)
+    for source, result in report.items():
+        raw = read_partitions(raw_dir, source)
+        if result["failed"] or raw.empty:
+            continue
+        df = cleaners[source](raw)
+        write_csv(df, os.path.join(out_dir, SOURCE_FILES[source]))
+        result["rows"] = len(df)
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch missing source data and rebuild the package's CSVs.")
+    parser.add_argument("--sources", nargs="+", choices=SOURCES, default=list(SOURCES), help="Sources to refresh.")
+    parser.add_argument("--teams", nargs="+", help="Teams to fetch (default: all).")
+    parser.add_argument("--years", type=int, nargs=2, default=[YEARS[0], YEARS[-1]], metavar=("FIRST", "LAST"),
+                        help="First and last season to fetch.")
+    parser.add_argument("--fixtures", help="Read partitions from '<FIXTURES>/<source>/<team>_<year>.csv' (a directory "
+                                           "or URL) instead of the remote services.")
+    parser.add_argument("--census-key", help="Census API key (census data is skipped without one).")
+    parser.add_argument("--raw-dir", default=RAW_DIRECTORY, help="Where fetched partitions are saved.")
+    parser.add_argument("--out-dir", default=DATA_DIRECTORY, help="Where the CSVs are written.")
+    parser.add_argument("--workers", type=int, default=8, help="Partitions fetched at the same time.")
+    parser.add_argument("--retries", type=int, default=3, help="Retries per partition.")
+    parser.add_argument("--refresh", action="store_true", help="Fetch partitions again even if already saved.")
+    args = parser.parse_args(argv)
+
+    if args.fixtures:
+        fetchers = {source: CsvFetcher(f"{args.fixtures.rstrip('/')}/{source}/{{team}}_{{year}}.csv",
+                                       teams=CENSUS_PLACES if source == "census" else None)
+                    for source in SOURCES}
+    else:
+        fetchers = default_fetchers(args.census_key)
+    fetchers = {source: fetcher for source, fetcher in fetchers.items() if source in args.sources}
+
+    report = ingest(fetchers, args.teams, range(args.years[0], args.years[1] + 1), args.raw_dir, args.out_dir,
+                    workers=args.workers, retries=args.retries, refresh=args.refresh)
+    for source, result in report.items():
+        print(f"{source:<8} fetched {len(result['fetched']):>4}  skipped {len(result['skipped']):>4}  "
+              f"failed {len(result['failed']):>4}  rows written {result.get('rows', '-')}")
+        for (team, year), error in sorted(result["failed"].items()):
+            print(f"    {team} {year}: {error}")
+    return 1 if any(result["failed"] for result in report.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
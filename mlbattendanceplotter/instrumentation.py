@@ -0,0 +1,183 @@
+import os
+import time
+import functools
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+# Set MLBAP_PROFILE=1 to record every plot call of the process
+ENV_VAR = "MLBAP_PROFILE"
+
+_enabled = os.environ.get(ENV_VAR, "").lower() not in ("", "0", "false", "no")
+if _enabled:
+    tracemalloc.start()
+_sinks = [] # Callables receiving each finished top-level call record
+_state = threading.local() # Per-thread stack of open records
+_lock = threading.Lock()
+
+def enabled():
+    """Returns True if stage timings are currently being recorded."""
+    return _enabled
+
+def enable(on=True):
+    """Turns recording on (or off with on=False) for the whole process."""
+    global _enabled
+    _enabled = on
+    if on and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def add_sink(sink):
+    """Registers sink(record), called with every finished plot call record (e.g. to forward it to a metrics system)."""
+    with _lock:
+        _sinks.append(sink)
+
+def remove_sink(sink):
+    """Unregisters a sink added with add_sink()."""
+    with _lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+@contextmanager
+def profile(sink=None):
+    """
+    Records stage timings inside the with-block and yields the list the finished plot call records are added to.
+        with profile() as records:
+            scatter_daily('tavg', 'attendance', team='BOS')
+        print(format_report(records[0]))
+    Parameters:
+        sink (callable): Optional extra sink for the calls made inside the block.
+    """
+    records = []
+    previous = _enabled
+    started_tracing = not tracemalloc.is_tracing()
+    enable(True)
+    add_sink(records.append)
+    if sink is not None:
+        add_sink(sink)
+    try:
+        yield records
+    finally:
+        remove_sink(records.append)
+        if sink is not None:
+            remove_sink(sink)
+        enable(previous)
+        if started_tracing and not previous:
+            tracemalloc.stop()
+
+class _NullStage:
+    """Stand-in returned by stage() while recording is off, so instrumented code pays almost nothing."""
+    rows_out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+NULL_STAGE = _NullStage()
+
+class Stage:
+    """
+    An open timing record (see stage() and instrumented()). Set 'rows_out' inside the with-block to record the output size.
+    """
+    def __init__(self, name, kind, rows_in=None, args=None):
+        self.name = name
+        self.kind = kind
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.args = args
+        self.children = []
+
+    def __enter__(self):
+        stack = _stack()
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]._max_peak = max(stack[-1]._max_peak, peak)
+            tracemalloc.reset_peak()
+            self._start_memory = self._max_peak = current
+        stack.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        wall_time = time.perf_counter() - self._start
+        stack = _stack()
+        stack.pop()
+
+        peak_memory = None
+        if tracemalloc.is_tracing() and hasattr(self, "_start_memory"):
+            peak = max(self._max_peak, tracemalloc.get_traced_memory()[1])
+            peak_memory = peak - self._start_memory
+            if stack:
+                stack[-1]._max_peak = max(stack[-1]._max_peak, peak)
+
+        record = {
+            "name": self.name,
+            "kind": self.kind,
+            "wall_time": wall_time,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "peak_memory": peak_memory,
+            "stages": self.children,
+        }
+        if self.args is not None:
+            record["args"] = self.args
+        if exc_type is not None:
+            record["error"] = repr(exc)
+
+        if stack:
+            stack[-1].children.append(record)
+        else:
+            emit(record)
+        return False
+
+def _stack():
+    if not hasattr(_state, "stack"):
+        _state.stack = []
+    return _state.stack
+
+def emit(record):
+    """Sends a finished top-level record to every registered sink."""
+    with _lock:
+        sinks = list(_sinks)
+    for sink in sinks:
+        sink(record)
+
+def stage(name, rows_in=None):
+    """
+    Context manager timing one pipeline stage ('load', 'merge', 'filter', 'group', 'render', ...).
+    Records wall time, rows in/out and peak traced memory while recording is enabled; otherwise does nothing.
+    """
+    if not _enabled:
+        return NULL_STAGE
+    return Stage(name, "stage", rows_in=rows_in)
+
+def instrumented(func):
+    """
+    Decorator for plotting functions: while recording is enabled, each call produces a record with its arguments,
+    total wall time and peak memory, and the stages that ran inside it.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        call_args = {"args": [repr(arg) for arg in args], "kwargs": {key: repr(value) for key, value in kwargs.items()}}
+        with Stage(func.__name__, "call", args=call_args):
+            return func(*args, **kwargs)
+    return wrapper
+
+def format_report(record, indent=0):
+    """Returns a readable, indented breakdown of a call record and its stages."""
+    memory = record["peak_memory"]
+    rows = ""
+    if record["rows_in"] is not None:
+        rows = f"  rows {record['rows_in']}" + ("" if record["rows_out"] is None else f" -> {record['rows_out']}")
+    elif record["rows_out"] is not None:
+        rows = f"  rows -> {record['rows_out']}"
+    line = (f"{'  ' * indent}{record['name']:<{32 - 2 * indent}} {record['wall_time'] * 1000:>9.2f} ms"
+            f"{'' if memory is None else f'  peak {memory / 1024 ** 2:.1f} MiB'}{rows}")
+    return "\n".join([line] + [format_report(child, indent + 1) for child in record["stages"]])
@@ -1,15 +1,17 @@
+import numpy as np
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-import plotly.express as px
-from .processing import variable_dict, team_abb_dict, process_yearly, process_daily, group_attendance_by_time, load_data
-
-
-
-games, weather, census = load_data()
-
-
-def bar_attendance_by_time(by = "month" , team = "BOS", year = None, show_league_avg = False, attendance = "%"):
+from .processing import variable_dict, team_abb_dict, trend_dict, attendance_cube, rollup_attendance, process_trends, \
+    facet_attendance
+from .query import query, numeric_columns, LEVELS
+from .cache import cacheable
+from .stats import bin_2d, bin_3d, finite_rows, stratified_sample, fit_lines, fit_band, correlations
+from .instrumentation import instrumented, stage
+
+
+@instrumented
+@cacheable
+def bar_attendance_by_time(by = "month" , team = "BOS", year = None, show_league_avg = False, attendance = "%",
+                           show = True):
     """
     Plots a bar chart of average team attendance grouped by a time measurement of the user's choice.
 
@@ -30,9 +32,12 @@ def bar_attendance_by_time(by = "month" , team = "BOS", year = None, show_league
                             stadium's capacity. Select one of the following:
                             - 'raw': Total attendance
                             - '%': Attendance as a percentage of stadium capacity (Default)
+        show (bool): If True (default), the plot is displayed. If False, the figure is returned instead so it can be
+                        saved or rendered without a display (see rendering.render_batch).
+        cache (cache.ChartCache): Optional. If given, the chart is rendered in the cache's format and its bytes are
+                        returned. Repeated calls with the same arguments and data are served from the cache.
     Returns a plot with the desired arguments.
     """
-    load_data()
     if not isinstance(team, str) and team is not None:
         print("Please enter one team abbreviation as a string. Print team_abb_dict to see a list of team abbrevations.")
         return
@@ -42,37 +47,44 @@ def bar_attendance_by_time(by = "month" , team = "BOS", year = None, show_league
     elif attendance == "raw":
         attendance_measure = "attendance"
 
-    df = process_daily(games, weather, team=team, year=year)
-    time_df = group_attendance_by_time(df, by, attendance_measure)
-
-    if show_league_avg:
-        league_df = process_daily(games, weather, team=None, year=year)
-        league_avg_df = group_attendance_by_time(league_df, by, attendance_measure)
-
-
-    plt.figure(figsize=(10, 6))
-    ax = sns.barplot(data=time_df, x='time_measure', y=attendance_measure)
+    # Team and league averages are both roll-ups of the precomputed attendance cube
+    cube = attendance_cube()
+    time_df = rollup_attendance(cube, by, team=team, year=year, attendance=attendance_measure)
 
     if show_league_avg:
-        x = range(len(league_avg_df))
-        y = league_avg_df[attendance_measure].values
-        ax.plot(x, y, '-o', color='red', label = 'League Average', zorder = 5, markersize = 10)
-        ax.legend()
-    if year is None:
-        year = "2012-2019"
-    x_lab = variable_dict.get(by, by.title())
-    if attendance == "%":
-        y_lab = variable_dict.get('attendance%', 'Stadium Capacity Filled (%)')
-        plt.ylim(0, 100)
-    elif attendance == "raw":
-        y_lab = variable_dict.get('attendance', 'Attendance (Raw)')
-    plt.title(f'Average {y_lab} by {x_lab} ({team}, {year})')
-    plt.xlabel(x_lab)
-    plt.ylabel(y_lab)
-    plt.show()
-
-
-def bar_by_team(y, year = None):
+        league_avg_df = rollup_attendance(cube, by, team=None, year=year, attendance=attendance_measure)
+
+
+    with stage("render", rows_in=len(time_df)):
+        import matplotlib.pyplot as plt # Imported on first draw, keeping the package import fast
+        import seaborn as sns
+        fig = plt.figure(figsize=(10, 6))
+        ax = sns.barplot(data=time_df, x='time_measure', y=attendance_measure)
+
+        if show_league_avg:
+            x = range(len(league_avg_df))
+            y = league_avg_df[attendance_measure].values
+            ax.plot(x, y, '-o', color='red', label = 'League Average', zorder = 5, markersize = 10)
+            ax.legend()
+        if year is None:
+            year = "2012-2019"
+        x_lab = variable_dict.get(by, by.title())
+        if attendance == "%":
+            y_lab = variable_dict.get('attendance%', 'Stadium Capacity Filled (%)')
+            plt.ylim(0, 100)
+        elif attendance == "raw":
+            y_lab = variable_dict.get('attendance', 'Attendance (Raw)')
+        plt.title(f'Average {y_lab} by {x_lab} ({team}, {year})')
+        plt.xlabel(x_lab)
+        plt.ylabel(y_lab)
+        if not show:
+            return fig
+        plt.show()
+
+
+@instrumented
+@cacheable
+def bar_by_team(y, year = None, show = True):
     """
     Plots a bar chart for the selected y variable as an average and selected year (or all years),
         where each MLB team is assigned a bar.
@@ -99,28 +111,37 @@ def bar_by_team(y, year = None):
             - poverty_rate (float): Poverty Rate (%) (Census)
             - payroll_est (int): Estimated Team Payroll ($) (Baseball Reference)
         year (int): A year between the range 2012-2019. If None, all years are plotted.
+        show (bool): If True (default), the plot is displayed. If False, the figure is returned instead so it can be
+                        saved or rendered without a display (see rendering.render_batch).
+        cache (cache.ChartCache): Optional. If given, the chart is rendered in the cache's format and its bytes are
+                        returned. Repeated calls with the same arguments and data are served from the cache.
     """
-    load_data()
-
-    df = process_yearly(games, weather, census, year=year)
-
-    df = df.groupby('team')[y].mean().reset_index()
+    # Team averages of the yearly values, computed from the selected year(s) and the y column only
+    df = query("yearly", years=year, columns=[y], group_by="team")
     df = df.sort_values(y, ascending=False)
     if year is None:
         year = "2012-2019"
 
-    plt.figure(figsize=(8, 5))
-    sns.barplot(data=df, x='team', y=y)
-
-    y_lab = variable_dict.get(y, y.title())
-    plt.title(f'{y_lab} by Team ({year})')
-    plt.xlabel("Team")
-    plt.ylabel(y_lab)
-
-    plt.xticks(rotation=45)
-    plt.show()
-
-def scatter_daily(x, y, team=None, year=None, lobf = False, show_prcp = False):
+    with stage("render", rows_in=len(df)):
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        fig = plt.figure(figsize=(8, 5))
+        sns.barplot(data=df, x='team', y=y, order=df['team']) # Keep the sorted order rather than the category order
+
+        y_lab = variable_dict.get(y, y.title())
+        plt.title(f'{y_lab} by Team ({year})')
+        plt.xlabel("Team")
+        plt.ylabel(y_lab)
+
+        plt.xticks(rotation=45)
+        if not show:
+            return fig
+        plt.show()
+
+@instrumented
+@cacheable
+def scatter_daily(x, y, team=None, year=None, lobf = False, show_prcp = False, density = None, gridsize = 40, color = None,
+                  show = True):
     """
     Create a scatterplot with daily data for a given team(s) and year(s). For the best interpretation, select a
     single team and a single year, although a list of teams and years are accepted as well.
@@ -147,13 +168,32 @@ def scatter_daily(x, y, team=None, year=None, lobf = False, show_prcp = False):
         team (str): Team's abbreviation. Print team_abb_dict to see a list of team abbreviations. If no team is
                         selected, all teams are plotted.
         year (int): Year of interest. Defaults to None (selects all years 2012-2019).
-        lobf (bool): If True, simple Seaborn line of best fit is generated. By default, no line is plotted.
+        lobf (bool or str): If True, a least squares line of best fit with its 95% confidence band is drawn. With
+                        lobf='team', one line is drawn per team (points are colored by team). By default, no line is
+                        plotted. The fitted slopes, intercepts and r² can be computed with stats.fit_lines().
         show_prcp (bool): If True, color is added to represent precipitation categories. False by default.
         *** Please note that lobf and show_prcp cannot both be True at the same time ***
+        density (str): Optional. Draws aggregated cells instead of one marker per game, which keeps large selections
+                        fast to render: 'hist' (rectangular 2D histogram) or 'hex' (hexagonal bins).
+        gridsize (int): Number of cells along the x-axis in density mode (default 40).
+        color (str): Optional variable (e.g. 'prcp') whose mean colors each cell in density mode. By default cells
+                        are colored by the number of games. In density mode, show_prcp=True is the same as color='prcp'.
+        show (bool): If True (default), the plot is displayed. If False, the figure is returned instead so it can be
+                        saved or rendered without a display (see rendering.render_batch).
+        cache (cache.ChartCache): Optional. If given, the chart is rendered in the cache's format and its bytes are
+                        returned. Repeated calls with the same arguments and data are served from the cache.
 
     """
-    load_data()
-    df = process_daily(games, weather, team=team, year=year)
+    check_lobf(lobf)
+    if density not in (None, "hist", "hex"):
+        raise ValueError("Invalid argument for 'density'. Valid arguments are None, 'hist', 'hex'.")
+    if density is not None and show_prcp:
+        color, show_prcp = color or 'prcp', False
+    if lobf and show_prcp:
+        raise ValueError("Cannot show line of best fit and precipitation at the same time. Either set lobf or show_prcp to True, not both.")
+
+    columns = [x, y] + (['prcp'] if show_prcp else []) + ([color] if color else [])
+    df = query("daily", teams=team, years=year, columns=columns)
 
     def group_rain(prcp):
         if prcp < 0.1:
@@ -167,30 +207,90 @@ def scatter_daily(x, y, team=None, year=None, lobf = False, show_prcp = False):
         df["group_rain"] = df['prcp'].apply(group_rain)
 
     # Plotting setup
-    plt.figure(figsize=(8, 5))
+    with stage("render", rows_in=len(df)):
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        fig = plt.figure(figsize=(8, 5))
+
+        if density is not None:
+            density_plot(df, x, y, density, gridsize, color)
+            if lobf:
+                fit_plot(df, x, y, lobf)
+        elif lobf:
+            fit_plot(df, x, y, lobf, scatter = True)
+        else:
+            if show_prcp:
+                sns.scatterplot(data=df, x=x, y=y, hue = 'group_rain')
+            else:
+                sns.scatterplot(data=df, x=x, y=y)
 
-    if lobf and show_prcp:
-        raise ValueError("Cannot show line of best fit and precipitation at the same time. Either set lobf or show_prcp to True, not both.")
+        if show_prcp:
+            plt.legend(title = "Precipitation (in.)")
 
-    if lobf:
-        sns.regplot(data=df, x=x, y=y, scatter = True, ci = 95, line_kws={'color': 'red'})
+        x_lab = variable_dict.get(x, x.title())
+        y_lab = variable_dict.get(y, y)
+
+        plt.title(f' {x_lab} vs. {y_lab}')
+        plt.xlabel(x_lab)
+        plt.ylabel(y_lab)
+        if not show:
+            return fig
+        plt.show()
+
+
+
+def check_lobf(lobf):
+    """Raises a ValueError unless lobf is a valid 'lobf' argument (True/False or 'team')."""
+    if lobf not in (True, False, "team"):
+        raise ValueError("Invalid argument for 'lobf'. Valid arguments are True, False, 'team'.")
+
+def fit_plot(df, x, y, lobf, scatter = False):
+    """
+    Draws least squares line(s) of best fit of y on x with their 95% confidence bands on the current axes, fitted in
+    closed form (see stats.fit_lines) instead of by bootstrapping. lobf='team' fits one line per team, in the same
+    colors as the team points drawn when scatter=True. Returns the fitted coefficients (one row per line).
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    by_team = lobf == "team"
+    with stage("fit", rows_in=len(df)) as fit_stage:
+        fits = fit_lines(df[x], df[y], df["team"].astype(str) if by_team else None)
+        band = fit_band(fits)
+        fit_stage.rows_out = len(fits)
+
+    if by_team:
+        teams = list(fits.index)
+        palette = dict(zip(teams, sns.color_palette(n_colors=len(teams))))
     else:
-        if show_prcp:
-            sns.scatterplot(data=df, x=x, y=y, hue = 'group_rain')
+        palette = {"all": "red"}
+    if scatter:
+        if by_team:
+            sns.scatterplot(data=df, x=x, y=y, hue=df["team"].astype(str), hue_order=teams, palette=palette)
         else:
             sns.scatterplot(data=df, x=x, y=y)
 
-    if show_prcp:
-        plt.legend(title = "Precipitation (in.)")
-
-    x_lab = variable_dict.get(x, x.title())
-    y_lab = variable_dict.get(y, y)
+    for group, line in band.groupby("group", sort=False):
+        plt.plot(line["x"], line["y"], color=palette[group])
+        plt.fill_between(line["x"], line["lower"], line["upper"], color=palette[group], alpha=0.15, linewidth=0)
+    return fits
 
-    plt.title(f' {x_lab} vs. {y_lab}')
-    plt.xlabel(x_lab)
-    plt.ylabel(y_lab)
-    plt.show()
 
+def density_plot(df, x, y, kind, gridsize, color=None):
+    """
+    Draws (x, y) as aggregated cells on the current axes: a 2D histogram (kind='hist') or hexagonal bins
+    (kind='hex'). Cells are colored by the number of games, or by the mean of 'color' if given.
+    """
+    import matplotlib.pyplot as plt
+    values = None if color is None else df[color]
+    if kind == "hex":
+        mask = finite_rows(df[x], df[y], values)
+        mappable = plt.hexbin(df[x][mask], df[y][mask], C=None if values is None else values[mask],
+                              gridsize=gridsize, mincnt=1, reduce_C_function=np.mean, cmap="viridis")
+    else:
+        counts, means, x_edges, y_edges = bin_2d(df[x], df[y], bins=gridsize, values=values)
+        cells = np.ma.masked_where(counts == 0, counts if means is None else means) # Leave empty cells blank
+        mappable = plt.pcolormesh(x_edges, y_edges, cells.T, cmap="viridis")
+    plt.colorbar(mappable, label="Games" if color is None else f"Mean {variable_dict.get(color, color)}")
 
 
 # - opp_win_pct(float)
@@ -206,7 +306,9 @@ def scatter_daily(x, y, team=None, year=None, lobf = False, show_prcp = False):
 # - poverty_rate(float)
 # - payroll_est(int)
 
-def scatter_yearly(x, y, team=None, year=None, lobf = False):
+@instrumented
+@cacheable
+def scatter_yearly(x, y, team=None, year=None, lobf = False, show = True):
     """
     Create a scatterplot with yearly data for a given team(s) and year(s). For the best interpretation, select a
     single team and a single year, although a list of teams and years are accepted as well.
@@ -236,29 +338,43 @@ def scatter_yearly(x, y, team=None, year=None, lobf = False):
             - payroll_est (int): Estimated Team Payroll ($) (Baseball Reference)
         team (str or list): One or more team abbreviations. If None, all teams are plotted.
         year (int or list): One of more years to plot. If None, all years (2012-2019) are plotted.
-        lobf (bool): If True, simple Seaborn line of best fit is generated. By default, no line is plotted.
+        lobf (bool or str): If True, a least squares line of best fit with its 95% confidence band is drawn. With
+                        lobf='team', one line is drawn per team (points are colored by team). By default, no line is
+                        plotted. The fitted slopes, intercepts and r² can be computed with stats.fit_lines().
+        show (bool): If True (default), the plot is displayed. If False, the figure is returned instead so it can be
+                        saved or rendered without a display (see rendering.render_batch).
+        cache (cache.ChartCache): Optional. If given, the chart is rendered in the cache's format and its bytes are
+                        returned. Repeated calls with the same arguments and data are served from the cache.
     """
-    load_data()
-    df = process_yearly(games, weather, census, team=team, year=year)
+    check_lobf(lobf)
+    df = query("yearly", teams=team, years=year, columns=[x, y])
 
     # Plotting setup
-    plt.figure(figsize=(8, 5))
-    if lobf:
-        sns.regplot(data=df, x=x, y=y, scatter = True, ci = 95, line_kws={'color': 'red'})
-    else:
-        sns.scatterplot(data=df, x=x, y=y)
+    with stage("render", rows_in=len(df)):
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        fig = plt.figure(figsize=(8, 5))
+        if lobf:
+            fit_plot(df, x, y, lobf, scatter = True)
+        else:
+            sns.scatterplot(data=df, x=x, y=y)
 
-    x_lab = variable_dict.get(x, x.title())
-    y_lab = variable_dict.get(y, y)
+        x_lab = variable_dict.get(x, x.title())
+        y_lab = variable_dict.get(y, y)
 
-    plt.title(f' {x_lab} vs. {y_lab}')
-    plt.xlabel(x_lab)
-    plt.ylabel(y_lab)
-    plt.show()
+        plt.title(f' {x_lab} vs. {y_lab}')
+        plt.xlabel(x_lab)
+        plt.ylabel(y_lab)
+        if not show:
+            return fig
+        plt.show()
 
 
 #scatter_3d(x = "win_pct", y = "payroll_est", z = "attendance%", team = None, year = None, time = "yearly")
-def scatter_3d(x='win_pct', y='payroll_est', z='attendance%', team=None, year=None, time = "daily"):
+@instrumented
+@cacheable
+def scatter_3d(x='win_pct', y='payroll_est', z='attendance%', team=None, year=None, time = "daily", density = False,
+               bins = 20, color = None, max_points = None, show = True):
     """
     Create a 3D scatterplot using daily or yearly data.
 
@@ -300,17 +416,32 @@ def scatter_3d(x='win_pct', y='payroll_est', z='attendance%', team=None, year=No
                 - pct_walk (float): % of People who Commute to Work via Walking (Census)
                 - poverty_rate (float): Poverty Rate (%) (Census)
                 - payroll_est (int): Estimated Team Payroll ($) (Baseball Reference)
+        density (bool): If True, points are binned into a 3D grid and one marker is drawn per non-empty voxel (sized
+                        by its number of observations), so the output size depends on the grid rather than the number
+                        of games. Defaults to False.
+        bins (int): Number of voxels along each axis in density mode (default 20).
+        color (str): Optional variable used to color the markers (its per-voxel mean in density mode).
+        max_points (int): Optional cap on the number of points drawn. Points are sampled per team so every team
+                        keeps its share of the plot. Plotly draws 3D plots with WebGL, so up to tens of thousands of
+                        points stay interactive.
+        show (bool): If True (default), the plot is displayed. If False, the figure is returned instead so it can be
+                        saved or rendered without a display (see rendering.render_batch).
+        cache (cache.ChartCache): Optional. If given, the chart is rendered in the cache's format and its bytes are
+                        returned. Repeated calls with the same arguments and data are served from the cache.
     """
-    load_data()
-    if time == "daily":
-        df = process_daily(games, weather, team, year)
-    elif time == "yearly":
-        df = process_yearly(games, weather, census, team, year)
-    else:
+    if time not in LEVELS:
         raise ValueError("Please select time as daily or yearly.")
 
-    if not all(col in df.columns for col in [x, y, z]):
+    columns = [x, y, z] + ([color] if color else [])
+    if not all(col in LEVELS[time] for col in columns):
         raise ValueError(f"One of: ({x}, {y}, {z}) cannot be obtained. Recall that census data can only be used on a yearly basis.")
+    df = query(time, teams=team, years=year, columns=columns)
+
+    if density:
+        voxels = bin_3d(df[x], df[y], df[z], bins=bins, values=df[color] if color else None)
+        df = voxels.rename(columns={'x': x, 'y': y, 'z': z, 'mean': color})
+    elif max_points is not None:
+        df = stratified_sample(df, 'team', max_points)
 
     if team is None:
         team = "All Teams"
@@ -321,24 +452,322 @@ def scatter_3d(x='win_pct', y='payroll_est', z='attendance%', team=None, year=No
     y_lab = variable_dict.get(y, y)
     z_lab = variable_dict.get(z, z)
 
-    fig = px.scatter_3d(df, x=x, y=y, z=z,
-                        title = f"3D Scatterplot: {team}, {year}, {time.title()}",
-                        width = 700,
-                        height = 700,
-                        opacity = 0.7,
-                        labels={
-                            x: variable_dict.get(x, x.title()),
-                            y: variable_dict.get(y, y.title()),
-                            z: variable_dict.get(z, z.title())
-                        })
-    fig.update_traces(marker = dict(size=4))
-    fig.update_layout(
-        margin=dict(l=20, r=20, b=120, t=80),
+    with stage("render", rows_in=len(df)):
+        import plotly.express as px
+        fig = px.scatter_3d(df, x=x, y=y, z=z,
+                            title = f"3D Scatterplot: {team}, {year}, {time.title()}",
+                            width = 700,
+                            height = 700,
+                            opacity = 0.7,
+                            color = color if color or not density else 'count',
+                            size = 'count' if density else None,
+                            labels={
+                                x: variable_dict.get(x, x.title()),
+                                y: variable_dict.get(y, y.title()),
+                                z: variable_dict.get(z, z.title()),
+                                'count': 'Observations',
+                            })
+        if not density:
+            fig.update_traces(marker = dict(size=4))
+        fig.update_layout(
+            margin=dict(l=20, r=20, b=120, t=80),
+
+            scene=dict(camera=dict(eye=dict(x=1.8, y=1.8, z=1.8)))
+        )
+
+        if not show:
+            return fig
+        fig.show()
+
+
+@instrumented
+@cacheable
+def line_trend(y = "attendance%_rolling", team = "BOS", year = None, window = 10, show = True):
+    """
+    Plots how attendance or win % develops over a season, with one line per team-season against the home game number.
+
+    The series are computed for every team at once (see processing.process_trends), so changing the team or year
+        only selects different lines.
+    Parameters:
+        y (str): The trend series to plot. Select one of the following:
+            - attendance_rolling (float): Average attendance over the last 'window' home games
+            - attendance%_rolling (float): Average stadium capacity filled (%) over the last 'window' home games (Default)
+            - win_pct_delta (float): Change in win % since 'window' home games earlier
+            - attendance_yoy (float): Change in attendance from the same home game of the previous season
+            - attendance%_yoy (float): Change in stadium capacity filled (%) from the same home game of the previous season
+        team (str or list): One or more team abbreviations. If None, all teams are plotted. Defaults to 'BOS'.
+        year (int or list): One or more years. If None, all years (2012-2019) are plotted.
+        window (int): Number of home games covered by the rolling series (default 10).
+        show (bool): If True (default), the plot is displayed. If False, the figure is returned instead so it can be
+                        saved or rendered without a display (see rendering.render_batch).
+        cache (cache.ChartCache): Optional. If given, the chart is rendered in the cache's format and its bytes are
+                        returned. Repeated calls with the same arguments and data are served from the cache.
+    """
+    if y not in trend_dict:
+        raise ValueError(f"Invalid argument for 'y'. Valid arguments are: {', '.join(trend_dict)}.")
+    df = process_trends(team=team, year=year, window=window)
+    if df.empty:
+        raise ValueError(f"No games found for team {team} and year {year}.")
+
+    # One column per team-season, so every line is drawn by a single plot call
+    df['season'] = df['team'].astype(str) + " " + df['year'].astype(str)
+    lines = df.pivot(index='num_home_game', columns='season', values=y)
+    if df['team'].nunique() == 1:
+        labels = [season.split(" ")[1] for season in lines.columns]
+    elif df['year'].nunique() == 1:
+        labels = [season.split(" ")[0] for season in lines.columns]
+    else:
+        labels = list(lines.columns)
+
+    if team is None:
+        team = "All Teams"
+    if year is None:
+        year = "2012-2019"
+
+    with stage("render", rows_in=len(df)):
+        import matplotlib.pyplot as plt
+        fig = plt.figure(figsize=(10, 6))
+        plt.plot(lines.index, lines.to_numpy(), linewidth=1.5 if len(labels) <= 12 else 0.8)
+        if y.endswith(("_delta", "_yoy")):
+            plt.axhline(0, color='gray', linewidth=1, linestyle='--')
+        if len(labels) <= 12:
+            plt.legend(labels)
+
+        y_lab = trend_dict[y].format(window=window)
+        plt.title(f'{y_lab} ({team}, {year})')
+        plt.xlabel(variable_dict['num_home_game'])
+        plt.ylabel(y_lab)
+        if not show:
+            return fig
+        plt.show()
+
+
+@instrumented
+@cacheable
+def correlation_heatmap(time = "yearly", team = None, year = None, method = "pearson", variables = None,
+                        pair_grid = False, show = True):
+    """
+    Plots the correlation of every pair of variables as a heatmap, optionally as a grid of pairwise scatterplots.
+
+    The data is processed once for all pairs, and the whole matrix is computed in one pass (see query.correlate to
+        get the Pearson and Spearman matrices as a table).
+    Parameters:
+        time (str): 'yearly' (default, one point per team-season) or 'daily' (one point per game).
+        team (str or list): One or more team abbreviations. If None, all teams are used.
+        year (int or list): One or more years. If None, all years (2012-2019) are used.
+        method (str): 'pearson' (default, linear correlation) or 'spearman' (rank correlation).
+        variables (list): Variables to correlate. Defaults to every numeric variable of 'time' (see scatter_yearly
+                        and scatter_daily for the lists).
+        pair_grid (bool): If True, a grid of every pair is drawn instead: scatterplots below the diagonal, each
+                        variable's histogram on it and the correlations, colored as in the heatmap, above it.
+        show (bool): If True (default), the plot is displayed. If False, the figure is returned instead so it can be
+                        saved or rendered without a display (see rendering.render_batch).
+        cache (cache.ChartCache): Optional. If given, the chart is rendered in the cache's format and its bytes are
+                        returned. Repeated calls with the same arguments and data are served from the cache.
+    """
+    if time not in LEVELS:
+        raise ValueError("Please select time as daily or yearly.")
+    variables = numeric_columns(time) if variables is None else list(variables)
+    unknown = [col for col in variables if col not in numeric_columns(time)]
+    if unknown or len(variables) < 2:
+        raise ValueError(f"Select at least two of the following variables: {', '.join(numeric_columns(time))}.")
+
+    df = query(time, teams=team, years=year, columns=variables)
+    with stage("correlate", rows_in=len(df)):
+        matrix = correlations(df, variables, method).loc[method]
+
+    if team is None:
+        team = "All Teams"
+    if year is None:
+        year = "2012-2019"
+    title = f'{method.title()} Correlations ({team}, {year}, {time.title()})'
+
+    with stage("render", rows_in=len(df)):
+        import matplotlib.pyplot as plt
+        import seaborn as sns # Also registers the 'vlag' colormap
+        if not pair_grid:
+            size = max(6, 0.6 * len(variables))
+            fig = plt.figure(figsize=(size + 1, size))
+            sns.heatmap(matrix, vmin=-1, vmax=1, cmap="vlag", annot=len(variables) <= 15, fmt=".2f", square=True,
+                        cbar_kws={"label": "Correlation"})
+            plt.xlabel("")
+            plt.ylabel("")
+        else:
+            count = len(variables)
+            fig, axes = plt.subplots(count, count, figsize=(1.6 * count, 1.6 * count), squeeze=False,
+                                     gridspec_kw={"wspace": 0.05, "hspace": 0.05})
+            colors = plt.get_cmap("vlag")
+            for row, y in enumerate(variables):
+                for col, x in enumerate(variables):
+                    ax = axes[row, col]
+                    if row > col:
+                        ax.scatter(df[x], df[y], s=3, alpha=0.4, rasterized=True)
+                    elif row == col:
+                        ax.hist(df[x].dropna(), bins=20)
+                    else:
+                        r = matrix.loc[y, x]
+                        ax.set_facecolor(colors((r + 1) / 2) if np.isfinite(r) else "white")
+                        ax.text(0.5, 0.5, f"{r:.2f}", ha="center", va="center", transform=ax.transAxes)
+                    ax.set_xticks([])
+                    ax.set_yticks([])
+                    if row == count - 1:
+                        ax.set_xlabel(x, fontsize=8, rotation=45, ha="right")
+                    if col == 0:
+                        ax.set_ylabel(y, fontsize=8, rotation=45, ha="right")
+            fig.suptitle(title, y=0.9)
+        if not pair_grid:
+            plt.title(title)
+        if not show:
+            return fig
+        plt.show()
+
+
+def facet_grid(count, cols, panel_size=(3, 2.4)):
+    """
+    Creates one figure with a grid of 'count' panels sharing their x and y axes, 'cols' panels per row.
+    Unused panels in the last row are hidden. Returns the figure and the list of panel axes.
+    """
+    import matplotlib.pyplot as plt
+    cols = max(1, min(cols, count))
+    rows = -(-count // cols)
+    fig, axes = plt.subplots(rows, cols, figsize=(panel_size[0] * cols, panel_size[1] * rows), sharex=True,
+                             sharey=True, squeeze=False, layout="constrained")
+    axes = list(axes.ravel())
+    for position, ax in enumerate(axes):
+        if position >= count:
+            ax.set_visible(False)
+        elif position + cols >= count: # Lowest panel of its column
+            ax.xaxis.set_tick_params(labelbottom=True)
+    return fig, axes[:count]
+
+
+@instrumented
+@cacheable
+def bar_attendance_by_time_grid(by = "month", team = None, year = None, facet = "team", show_league_avg = True,
+                                attendance = "%", cols = 6, show = True):
+    """
+    Plots bar_attendance_by_time() for many teams (or years) as a grid of small charts in one figure.
+
+    All panels are computed together by one grouped roll-up of the attendance cube (see processing.facet_attendance),
+        and share their axes so that panels can be compared directly.
+    Parameters:
+        by (str): Time measurement to group by: 'start time', 'weekday', 'month' (default) or 'year'.
+        team (str or list): Team(s) to plot. If None (default), all teams are plotted.
+        year (int or list): Year(s) to plot. If None, all years (2012-2019) are used.
+        facet (str): 'team' (default, one panel per team averaged over the selected years) or 'year' (one panel per
+                        year averaged over the selected teams).
+        show_league_avg (bool): If True (default), a red line marks the league average in every panel: over the
+                        selected years with facet='team', or of the panel's own year with facet='year'. It is computed
+                        once for all panels.
+        attendance (str): 'raw' (total attendance) or '%' (attendance as a percentage of stadium capacity, default).
+        cols (int): Number of panels per row (default 6).
+        show (bool): If True (default), the plot is displayed. If False, the figure is returned instead so it can be
+                        saved or rendered without a display (see rendering.render_batch).
+        cache (cache.ChartCache): Optional. If given, the chart is rendered in the cache's format and its bytes are
+                        returned. Repeated calls with the same arguments and data are served from the cache.
+    """
+    if attendance not in ("%", "raw"):
+        raise ValueError("Invalid argument for 'attendance'. Valid arguments are '%', 'raw'.")
+    attendance_measure = "attendance%" if attendance == "%" else "attendance"
+
+    cube = attendance_cube()
+    panels = facet_attendance(cube, by, facet=facet, team=team, year=year, attendance=attendance_measure)
+    if panels.empty:
+        raise ValueError(f"No games found for team {team} and year {year}.")
+    if show_league_avg:
+        if facet == "year": # Each season is compared with the league in that season
+            league_avg = facet_attendance(cube, by, facet="year", team=None, year=year, attendance=attendance_measure)
+        else:
+            league_avg = rollup_attendance(cube, by, team=None, year=year, attendance=attendance_measure)
+            league_avg = league_avg.set_index('time_measure')[attendance_measure].to_frame().T
+        league_avg = league_avg.reindex(columns=panels.columns)
 
-        scene=dict(camera=dict(eye=dict(x=1.8, y=1.8, z=1.8)))
-    )
+    if year is None:
+        year = "2012-2019"
+    if team is None:
+        team = "All Teams"
 
-    fig.show()
+    with stage("render", rows_in=panels.size):
+        import matplotlib.pyplot as plt
+        fig, axes = facet_grid(len(panels), cols)
+        positions = np.arange(len(panels.columns))
+        for ax, (label, values) in zip(axes, panels.iterrows()):
+            ax.bar(positions, values.to_numpy(dtype=float))
+            if show_league_avg:
+                league_values = league_avg.loc[label] if facet == "year" else league_avg.iloc[0]
+                ax.plot(positions, league_values.to_numpy(dtype=float), '-o', color='red', markersize=3, zorder=5)
+            ax.set_title(str(label))
+        for ax in axes:
+            ax.set_xticks(positions, [str(unit) for unit in panels.columns], rotation=90)
+        if attendance == "%":
+            axes[0].set_ylim(0, 100)
+
+        x_lab = variable_dict.get(by, by.title())
+        y_lab = variable_dict[attendance_measure]
+        fig.suptitle(f'Average {y_lab} by {x_lab} ({team}, {year})')
+        fig.supxlabel(x_lab)
+        fig.supylabel(y_lab)
+        if not show:
+            return fig
+        plt.show()
+
+
+@instrumented
+@cacheable
+def scatter_daily_grid(x, y, team = None, year = None, facet = "team", lobf = False, cols = 6, show = True):
+    """
+    Plots scatter_daily() for many teams (or years) as a grid of small scatterplots in one figure.
 
+    The daily data is queried once for all panels, and lines of best fit are fitted for every panel together
+        (see stats.fit_lines). Panels share their axes.
+    Parameters:
+        x (str): x-axis variable (see scatter_daily for the variables).
+        y (str): y-axis variable.
+        team (str or list): Team(s) to plot. If None (default), all teams are plotted.
+        year (int or list): Year(s) to plot. If None, all years (2012-2019) are plotted.
+        facet (str): 'team' (default, one panel per team) or 'year' (one panel per year).
+        lobf (bool): If True, each panel gets its least squares line of best fit with its 95% confidence band.
+        cols (int): Number of panels per row (default 6).
+        show (bool): If True (default), the plot is displayed. If False, the figure is returned instead so it can be
+                        saved or rendered without a display (see rendering.render_batch).
+        cache (cache.ChartCache): Optional. If given, the chart is rendered in the cache's format and its bytes are
+                        returned. Repeated calls with the same arguments and data are served from the cache.
+    """
+    if facet not in ("team", "year"):
+        raise ValueError("Invalid argument for 'facet'. Valid arguments are 'team', 'year'.")
+    if lobf not in (True, False):
+        raise ValueError("Invalid argument for 'lobf'. Valid arguments are True, False.")
+    df = query("daily", teams=team, years=year, columns=[x, y])
+    if df.empty:
+        raise ValueError(f"No games found for team {team} and year {year}.")
+    groups = df[facet].astype(str)
+    if lobf:
+        with stage("fit", rows_in=len(df)) as fit_stage:
+            band = fit_band(fit_lines(df[x], df[y], groups))
+            fit_stage.rows_out = len(band)
 
+    if year is None:
+        year = "2012-2019"
+    if team is None:
+        team = "All Teams"
 
+    with stage("render", rows_in=len(df)):
+        import matplotlib.pyplot as plt
+        panels = df.groupby(groups, sort=True)
+        fig, axes = facet_grid(panels.ngroups, cols)
+        for ax, (label, points) in zip(axes, panels):
+            ax.scatter(points[x], points[y], s=6, alpha=0.6)
+            if lobf:
+                line = band[band["group"] == label]
+                ax.plot(line["x"], line["y"], color="red")
+                ax.fill_between(line["x"], line["lower"], line["upper"], color="red", alpha=0.15, linewidth=0)
+            ax.set_title(label)
+
+        x_lab = variable_dict.get(x, x.title())
+        y_lab = variable_dict.get(y, y)
+        fig.suptitle(f'{x_lab} vs. {y_lab} ({team}, {year})')
+        fig.supxlabel(x_lab)
+        fig.supylabel(y_lab)
+        if not show:
+            return fig
+        plt.show()
@@ -1,5 +1,18 @@
+import numpy as np
 import pandas as pd
+import copy
+import hashlib
+import importlib.util
+import itertools
 import os
+import sys
+import threading
+import warnings
+from collections import OrderedDict
+
+from .instrumentation import stage
+from .stats import group_starts, rolling_mean, lagged_difference
+from .dense import SeasonArrays, WEATHER_VARIABLES, ATTENDANCE_VARIABLES
 
 variable_dict = {
     "date" : "Date",
@@ -64,24 +77,618 @@ team_abb_dict = {
 
 DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), "data")
 
+# Source name -> CSV file name within the data directory
+SOURCE_FILES = {
+    "games" : "bref_2012_2019.csv",
+    "weather" : "weather_2012_2019.csv",
+    "census" : "census_2012_2019.csv",
+}
+
+# Explicit column types for each source. Strings that act as keys are stored as categoricals, dates as datetime64 and
+# integer-valued columns with the narrowest integer type that holds them. Measurements keep float64 so that averages
+# and rounding are unaffected.
+SOURCE_SCHEMAS = {
+    "games" : {
+        "date" : "datetime64[ns]",
+        "year" : "int16",
+        "team" : "category",
+        "win_pct" : "float64",
+        "attendance" : "int32",
+        "attendance%" : "float64",
+        "num_home_game" : "int16",
+        "opp" : "category",
+        "opp_win_pct" : "float64",
+        "start_time" : "category",
+        "cli" : "float64",
+    },
+    "weather" : {
+        "team" : "category",
+        "year" : "int16",
+        "date" : "datetime64[ns]",
+        "tavg" : "float64",
+        "tmin" : "float64",
+        "tmax" : "float64",
+        "prcp" : "float64",
+    },
+    "census" : {
+        "team" : "category",
+        "city" : "category",
+        "year" : "int16",
+        "population" : "int32",
+        "median_age" : "float64",
+        "median_household_income" : "float64",
+        "average_household_size" : "float64",
+        "pct_public_transit" : "float64",
+        "pct_car" : "float64",
+        "pct_walk" : "float64",
+        "poverty_rate" : "float64",
+        "payroll_est" : "int32",
+    },
+}
+
+# Team keys share one category set so merges between sources keep the categorical dtype
+TEAM_COLUMNS = ("team", "opp")
+
+def apply_schema(df, schema):
+    """
+    Casts the columns of 'df' to the types listed in 'schema' (column -> dtype). Columns missing from 'df' are
+    ignored. Integer columns that contain missing values are cast to the matching nullable integer type.
+    Returns the typed DataFrame.
+    """
+    dtypes = {}
+    for col, dtype in schema.items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        if dtype == "category" and col in TEAM_COLUMNS:
+            teams = set(team_abb_dict).union(df[col].dropna().astype(str))
+            dtypes[col] = pd.CategoricalDtype(sorted(teams))
+        elif dtype.startswith("int") and df[col].isna().any():
+            dtypes[col] = dtype.capitalize() # e.g. int32 -> Int32, which supports missing values
+        else:
+            dtypes[col] = dtype
+    return df.astype(dtypes) if dtypes else df
+
+def columnar_engine():
+    """Returns the name of an installed Parquet engine ('pyarrow' or 'fastparquet'), or None if neither is installed."""
+    for engine in ("pyarrow", "fastparquet"):
+        if importlib.util.find_spec(engine) is not None:
+            return engine
+    return None
+
+def read_source(path, schema=None):
+    """
+    Reads a source CSV and returns it with the column types in 'schema' applied.
+    A typed Parquet copy of the CSV is kept next to it ('<name>.parquet'), along with the modification time and size
+    of the CSV it was built from ('<name>.parquet.source'). The copy is used instead of the CSV while the CSV still
+    has that exact modification time and size, and is (re)built the first time the CSV is read or after the CSV
+    changes (even if it is replaced by a file with an older modification time). If no Parquet engine is installed,
+    or the data directory is not writable, the CSV is read directly.
+    Parameters:
+        path (str): Path of the source CSV file.
+        schema (dict): Column -> dtype mapping (see SOURCE_SCHEMAS).
+    Returns a pd.DataFrame.
+    """
+    schema = schema or {}
+    engine = columnar_engine()
+    cache_path = os.path.splitext(path)[0] + ".parquet"
+    source_path = f"{cache_path}.source"
+    stat = os.stat(path)
+    source = f"{stat.st_mtime_ns} {stat.st_size}" # Taken before reading, so a CSV changed meanwhile is read again
+
+    if engine is not None:
+        try:
+            with open(source_path) as file:
+                if file.read() == source:
+                    return apply_schema(pd.read_parquet(cache_path, engine=engine), schema)
+        except (OSError, ValueError):
+            pass # Missing or unreadable cache, rebuild it from the CSV below
+
+    df = apply_schema(pd.read_csv(path), schema)
+
+    if engine is not None:
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            df.to_parquet(tmp_path, engine=engine, index=False)
+            os.replace(tmp_path, cache_path) # Atomic, so concurrent readers never see a partial file
+            # Written after the copy: a reader that sees the new copy with the old source rebuilds it, never the reverse
+            with open(tmp_path, "w") as file:
+                file.write(source)
+            os.replace(tmp_path, source_path)
+        except (OSError, ValueError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return df
+
+# Set MLBAP_COMPACT=1 to hold the shared registry's data in compact form (see compact_frame), and MLBAP_MEMORY_BUDGET
+# (bytes, or e.g. '200MB') to cap the memory it keeps (see DatasetRegistry)
+COMPACT_ENV_VAR = "MLBAP_COMPACT"
+BUDGET_ENV_VAR = "MLBAP_MEMORY_BUDGET"
+# Set MLBAP_SHARED_DATA to the directory of data published with shared.publish() to attach it instead of loading it
+SHARED_ENV_VAR = "MLBAP_SHARED_DATA"
+
+def parse_bytes(value):
+    """Returns a byte count from an int or a string such as '1048576', '512KB', '200MB' or '1.5GB' (None stays None)."""
+    if value is None or isinstance(value, int):
+        return value
+    text = str(value).strip().upper().removesuffix("B")
+    for power, unit in enumerate(["K", "M", "G", "T"], start=1):
+        if text.endswith(unit):
+            return int(float(text[:-1]) * 1024 ** power)
+    return int(float(text))
+
+def compact_frame(df):
+    """
+    Returns df with the narrowest column types that hold its values: float64 measurements become float32, integer
+    columns the smallest integer type that fits (e.g. int8 for home game numbers) and remaining string columns
+    categoricals. Categorical keys and dates are kept as they are.
+    float32 keeps about 7 significant digits, so averages can differ from the default mode in the last decimal.
+    """
+    dtypes = {}
+    for col in df.columns:
+        dtype = df[col].dtype
+        if dtype == "float64":
+            dtypes[col] = "float32"
+        elif pd.api.types.is_integer_dtype(dtype) and len(df) and df[col].notna().any():
+            low, high = int(df[col].min()), int(df[col].max())
+            narrowest = next(np.dtype(candidate) for candidate in ("int8", "int16", "int32", "int64")
+                             if np.iinfo(candidate).min <= low and high <= np.iinfo(candidate).max)
+            if narrowest.itemsize < dtype.itemsize:
+                dtypes[col] = narrowest.name if isinstance(dtype, np.dtype) else narrowest.name.capitalize()
+        elif pd.api.types.is_string_dtype(dtype) and not isinstance(dtype, pd.CategoricalDtype):
+            dtypes[col] = "category"
+    return df.astype(dtypes) if dtypes else df
+
+def memory_size(value):
+    """Returns the number of bytes held by a DataFrame, NumPy array, SeasonArrays or a dict/list of them."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(value, pd.DataFrame) else usage)
+    if isinstance(value, (np.ndarray, SeasonArrays)):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(memory_size(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(memory_size(item) for item in value)
+    return sys.getsizeof(value)
+
+class DatasetRegistry:
+    """
+    Lazily loads and memoizes the source datasets (games, weather, census).
+    Each source is read from disk (see read_source) the first time it is requested and kept in memory afterwards.
+    A source is only re-read when its backing file's modification time or size changes, or after an explicit invalidate().
+    Rows appended in memory (see update) are kept as separate parts and merged into their table the first time the
+    whole table is used, so that appending costs as much as the new rows, however large the tables are.
+    Derived tables (see derived) are kept in least recently used order. When the sources and derived tables together
+    exceed 'memory_budget', the least recently used derived tables are evicted; they are rebuilt when next needed.
+    Parameters:
+        directory (str): Directory containing the source CSV files. Defaults to the package's data directory.
+        files (dict): Mapping of source name to file name within 'directory'.
+        compact (bool): If True, sources are held in compact form (see compact_frame) and dense arrays as float32.
+                        Defaults to the MLBAP_COMPACT environment variable (off).
+        memory_budget (int or str): Memory cap in bytes (or e.g. '200MB'). Defaults to the MLBAP_MEMORY_BUDGET
+                        environment variable (no cap).
+        shared (str): Directory of data published with shared.publish(). Its tables are attached (see shared.attach)
+                        the first time data is needed, instead of being loaded and built in this process.
+                        Defaults to the MLBAP_SHARED_DATA environment variable (none).
+    """
+    def __init__(self, directory=DATA_DIRECTORY, files=None, compact=None, memory_budget=None, shared=None):
+        self.directory = directory
+        self.files = dict(SOURCE_FILES if files is None else files)
+        if compact is None:
+            compact = os.environ.get(COMPACT_ENV_VAR, "").lower() not in ("", "0", "false", "no")
+        self.compact = compact
+        self.memory_budget = parse_bytes(os.environ.get(BUDGET_ENV_VAR) if memory_budget is None else memory_budget)
+        self.evictions = 0 # Derived tables evicted to stay within the memory budget
+        self.shared = (os.environ.get(SHARED_ENV_VAR) or None) if shared is None else shared
+        self._shared_checked = False
+        self._frames = {} # source name -> (file signature, DataFrame, bytes)
+        self._derived = OrderedDict() # derived table name -> (data version, value, bytes), least recently used first
+        self._hashes = {} # source name -> (file signature, content digest)
+        self._pending = {} # table name -> [(merge function, appended part)], merged on next use (see update)
+        self._unsaved = {} # source name -> digest of the rows appended to it in memory only
+        self._generation = 0 # Bumped by invalidate() so that caches keyed on version() are dropped too
+        self._lock = threading.RLock()
+
+    def path(self, name):
+        """Returns the path of the file backing the source 'name'."""
+        if name not in self.files:
+            raise ValueError(f"Unknown data source '{name}'. Valid sources are: {', '.join(self.files)}.")
+        return os.path.join(self.directory, self.files[name])
+
+    def signature(self, name):
+        """Returns a (mtime, size) tuple identifying the current version of the file backing 'name'."""
+        stat = os.stat(self.path(name))
+        return stat.st_mtime_ns, stat.st_size
+
+    def version(self):
+        """Returns a hashable token that changes whenever any source file changes or invalidate() is called."""
+        return (self._generation,) + tuple(self.signature(name) for name in self.files)
+
+    def fingerprint(self):
+        """
+        Returns a digest of the contents of every source file. Unlike version(), it only changes when the data itself
+        changes, so it can key caches that outlive the process. Files are only re-hashed when their signature changes.
+        Rows appended in memory only (see update) are included, so the fingerprint also changes when they are added.
+        """
+        digest = hashlib.sha256()
+        for name in self.files:
+            signature = self.signature(name)
+            with self._lock:
+                cached = self._hashes.get(name)
+                if cached is None or cached[0] != signature:
+                    file_digest = hashlib.sha256()
+                    with open(self.path(name), "rb") as file:
+                        for block in iter(lambda: file.read(1 << 20), b""):
+                            file_digest.update(block)
+                    cached = (signature, file_digest.hexdigest())
+                    self._hashes[name] = cached
+            digest.update(f"{name}:{cached[1]};".encode("utf-8"))
+            with self._lock:
+                if name in self._unsaved:
+                    digest.update(f"{name} unsaved:{self._unsaved[name]};".encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, name, merge=True):
+        """
+        Returns the DataFrame for the source 'name' ('games', 'weather', or 'census').
+        The frame is shared between callers, so it should be treated as read-only.
+        If merge is False, rows appended in memory that have not been merged yet (see update) are left out.
+        """
+        self.attach_shared()
+        signature = self.signature(name)
+        with self._lock:
+            cached = self._frames.get(name)
+            if cached is not None and cached[0] == signature:
+                return self.merged(self._frames, name) if merge else cached[1]
+            self._pending.pop(name, None) # The file changed, rows appended in memory only are dropped with the old copy
+            self._unsaved.pop(name, None)
+            with stage(f"load {name}") as timing:
+                df = read_source(self.path(name), SOURCE_SCHEMAS.get(name))
+                if self.compact:
+                    df = compact_frame(df)
+                timing.rows_out = len(df)
+            self._frames[name] = (signature, df, memory_size(df))
+            self.enforce_budget()
+            return df
+
+    def load(self):
+        """Returns a tuple of the three source DataFrames: games, weather, and census."""
+        return self.get("games"), self.get("weather"), self.get("census")
+
+    def derived(self, name, builder):
+        """
+        Returns a table derived from the sources, building it with builder(registry) the first time it is requested
+        and again whenever the data version changes. Derived tables are shared and should be treated as read-only.
+        """
+        self.attach_shared()
+        version = self.version()
+        with self._lock:
+            cached = self._derived.get(name)
+            if cached is not None and cached[0] == version:
+                self._derived.move_to_end(name)
+                return self.merged(self._derived, name)
+            self._pending.pop(name, None) # Rebuilt from the sources, which include the appended rows
+            value = builder(self)
+            self._derived[name] = (version, value, memory_size(value))
+            self._derived.move_to_end(name)
+            self.enforce_budget(keep=name)
+            return value
+
+    def cached(self, name, merge=True):
+        """
+        Returns the derived table 'name' if it is built for the current data version, or None (without building it).
+        If merge is False, rows appended to it that have not been merged yet are left out (see pending()).
+        """
+        version = self.version()
+        with self._lock:
+            cached = self._derived.get(name)
+            if cached is None or cached[0] != version:
+                return None
+            return self.merged(self._derived, name) if merge else cached[1]
+
+    def pending(self, name):
+        """Returns the (merge function, part) pairs appended to table 'name' that have not been merged into it yet."""
+        with self._lock:
+            return list(self._pending.get(name, []))
+
+    def merged(self, store, name):
+        """
+        Merges the parts pending for 'name' into its entry in 'store' (the sources or the derived tables) and returns
+        the merged table. Consecutive parts with the same merge function are merged with one call, merge(table, parts).
+        """
+        version, value, _ = store[name]
+        parts = self._pending.pop(name, None)
+        if not parts:
+            return value
+        with stage(f"merge {name}") as timing:
+            for merge, group in itertools.groupby(parts, key=lambda part: part[0]):
+                value = merge(value, [part for _, part in group])
+            timing.rows_out = len(value)
+        store[name] = (version, value, memory_size(value))
+        return value
+
+    def update(self, tables, appended=None, persisted=True):
+        """
+        Replaces sources and derived tables with updated values (e.g. after appending rows, see append_games) as one
+        change of data version: memoized selections are dropped, and derived tables not in 'tables' are rebuilt
+        from the updated data the next time they are used.
+        Parameters:
+            tables (dict): Table name -> updated value. Sources and derived tables that keep their value but have
+                            rows appended should be passed too, with their current (unmerged) value.
+            appended (dict): Table name -> (merge function, part). The part (e.g. new rows) is kept next to the table
+                            and merged into it with merge(table, parts) the first time the whole table is used.
+            persisted (bool): False if the parts appended to sources were not written to their files. They are then
+                            added to the fingerprint(), which only reads the files otherwise.
+        """
+        with self._lock:
+            self._generation += 1
+            self._derived.clear()
+            for name, value in tables.items():
+                self.install(name, value)
+            # Parts appended to derived tables that were dropped are included when they are rebuilt
+            self._pending = {name: parts for name, parts in self._pending.items()
+                             if name in self._frames or name in self._derived}
+            for name, part in (appended or {}).items():
+                self._pending.setdefault(name, []).append(part)
+                if not persisted and name in self.files:
+                    rows = pd.util.hash_pandas_object(part[1], index=False).to_numpy().tobytes()
+                    self._unsaved[name] = hashlib.sha256(self._unsaved.get(name, "").encode("utf-8") + rows).hexdigest()
+
+    def install(self, name, value):
+        """
+        Stores an already loaded source or built derived table 'name' (e.g. one attached from shared memory) as if it
+        had been loaded or built for the current data version.
+        """
+        with self._lock:
+            if name in self.files:
+                self._frames[name] = (self.signature(name), value, memory_size(value))
+            else:
+                self._derived[name] = (self.version(), value, memory_size(value))
+                self._derived.move_to_end(name)
+
+    def attach_shared(self):
+        """
+        Attaches the data published at 'shared' the first time it is called. If it cannot be attached (e.g. it was
+        published from other source files), a warning is issued and the data is loaded as usual.
+        """
+        if self.shared is None or self._shared_checked:
+            return
+        with self._lock:
+            if self._shared_checked:
+                return
+            self._shared_checked = True
+            from .shared import attach
+            try:
+                attach(self.shared, self)
+            except (OSError, ValueError) as error:
+                warnings.warn(f"Could not attach the shared data at {self.shared}, loading it instead: {error}")
+
+    def memory_usage(self):
+        """Returns the bytes held by the loaded sources and derived tables."""
+        with self._lock:
+            return sum(entry[2] for entry in self._frames.values()) + sum(entry[2] for entry in self._derived.values()) \
+                + sum(memory_size(part) for parts in self._pending.values() for _, part in parts)
+
+    def enforce_budget(self, keep=None):
+        """
+        Evicts the least recently used derived tables (other than 'keep') until the registry is within its memory
+        budget. Sources are never evicted, since every derived table is rebuilt from them.
+        """
+        if self.memory_budget is None:
+            return
+        with self._lock:
+            total = self.memory_usage()
+            for name in list(self._derived):
+                if total <= self.memory_budget:
+                    break
+                if name != keep:
+                    total -= self._derived.pop(name)[2]
+                    self.evictions += 1
+
+    def set_compact(self, compact=True):
+        """Turns compact mode on or off. Loaded data is dropped, so it is re-read in the new form on next use."""
+        self.compact = compact
+        self.invalidate()
+
+    def invalidate(self, name=None):
+        """
+        Drops the in-memory copy of source 'name' (or of every source if None) so it is re-read on next use.
+        Derived tables are always dropped, since they may depend on any source.
+        """
+        with self._lock:
+            if name is None:
+                self._frames.clear()
+            else:
+                self._frames.pop(name, None)
+            self._derived.clear()
+            self._pending = {name: parts for name, parts in self._pending.items() if name in self._frames}
+            self._unsaved = {name: digest for name, digest in self._unsaved.items() if name in self._frames}
+            self._generation += 1
+
+# Shared registry used by load_data() and the plotting functions
+registry = DatasetRegistry()
+
+def memory_report(reg=None):
+    """
+    Returns a pd.DataFrame with the memory held by a registry (the shared one by default), one row per column of
+    every loaded source and derived table: 'kind' ('source' or 'derived'), 'name', 'column', 'dtype' and 'bytes'.
+    Derived values that are not DataFrames (e.g. dense arrays) get a single row with column None.
+        report = memory_report()
+        report.groupby('name')['bytes'].sum()
+    """
+    reg = registry if reg is None else reg
+    with reg._lock:
+        entries = [("source", name, entry[1]) for name, entry in reg._frames.items()] + \
+                  [("derived", name, entry[1]) for name, entry in reg._derived.items()]
+    rows = []
+    for kind, name, value in entries:
+        if isinstance(value, pd.DataFrame):
+            usage = value.memory_usage(deep=True)
+            for col, size in usage.items():
+                dtype = value.index.dtype if col == "Index" else value[col].dtype
+                rows.append((kind, name, col, str(dtype), int(size)))
+        else:
+            rows.append((kind, name, None, type(value).__name__, memory_size(value)))
+    return pd.DataFrame(rows, columns=["kind", "name", "column", "dtype", "bytes"])
+
+def canonical_selection(values):
+    """
+    Returns a hashable, order-independent form of a team/year argument, so that e.g. 'BOS' and ['BOS'], or
+    [2013, 2012] and [2012, 2013], are treated as the same selection. None (everything) is returned unchanged.
+    """
+    if values is None:
+        return None
+    if isinstance(values, (str, int)):
+        return (values,)
+    values = set(values)
+    try:
+        return tuple(sorted(values))
+    except TypeError: # Mixed types, e.g. [2012, '2013']
+        return tuple(sorted(values, key=repr))
+
+def copy_on_write_enabled():
+    """Returns True if pandas copy-on-write is active, i.e. shallow copies of a DataFrame cannot modify each other."""
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return True
+    return pd.get_option("mode.copy_on_write") is True
+
+class SelectionCache:
+    """
+    Size-bounded LRU cache for process_yearly(), process_daily() and query() results on the registry's data.
+    Results are keyed on the canonical team/year selection (see canonical_selection), and the cache is emptied
+    whenever the registry's data version changes. Callers receive copies, so modifying a returned DataFrame never
+    affects the cached result. With pandas copy-on-write these are cheap shallow copies.
+    Parameters:
+        maxsize (int): Maximum number of results to keep. 0 disables caching.
+    """
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict() # (level, teams, years) -> DataFrame
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, level, team, year, builder):
+        """
+        Returns the result for the selection (level, team, year), calling builder() to compute it on a miss.
+        level names the kind of result, e.g. 'yearly' or 'daily' (any hashable, such as a query's full request).
+        """
+        key = (level, canonical_selection(team), canonical_selection(year))
+        version = registry.version()
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            df = self._entries.get(key)
+            if df is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return df.copy(deep=not copy_on_write_enabled())
+            self.misses += 1
+
+        df = builder()
+        with self._lock:
+            if self.maxsize > 0 and version == self._version:
+                self._entries[key] = df
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False) # Drop the least recently used result
+        return df.copy(deep=not copy_on_write_enabled())
+
+    def info(self):
+        """Returns a dict with the cache's hits, misses, current size and maxsize."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize}
+
+    def clear(self):
+        """Empties the cache and resets its hit/miss counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+# Shared cache of process_yearly()/process_daily() results on the registry's data
+selection_cache = SelectionCache()
+
 def load_data():
     """
     Loads and returns necessary data from CSV files.
     Automatically called within the plotting functions. No action is required as long as the required CSV files –
         'bref_2012_2019.csv', 'weather_2012_2019.csv', and 'census_2012_2019.csv' are in the project directory.
+    The files are only parsed once; later calls return copies of the in-memory data held by 'registry'.
     Returns a tuple of three Dataframes: games, weather, and census.
     """
-    games = pd.read_csv(os.path.join(DATA_DIRECTORY, 'bref_2012_2019.csv'))
-    weather = pd.read_csv(os.path.join(DATA_DIRECTORY, 'weather_2012_2019.csv'))
-    census = pd.read_csv(os.path.join(DATA_DIRECTORY, 'census_2012_2019.csv'))
-    return games, weather, census
+    games, weather, census = registry.load()
+    return games.copy(), weather.copy(), census.copy()
+
+YEARLY_COLUMNS = [
+    'year', 'team', 'attendance', 'attendance%', 'win_pct', 'opp_win_pct', 'tavg', 'prcp',
+    'population', 'median_age', 'median_household_income', 'average_household_size',
+    'pct_public_transit', 'pct_car', 'pct_walk', 'poverty_rate', 'payroll_est'
+]
+
+# Yearly game measures: the last recorded win % of the season, and season averages for the rest
+YEARLY_GAME_AGGREGATES = {
+    'win_pct': 'last', # Last recorded value of the season is a team's yearly win_pct
+    'attendance': 'mean', # Average yearly attendance for a given team/year
+    'attendance%': 'mean', # Average yearly capacity full for a given team/year
+    'opp_win_pct' : 'mean' # Average opponent win % at time of game
+}
+
+# Decimal places of the yearly output columns: attendance (whole number), attendance%, tavg to 1 decimal, prcp to 2
+YEARLY_ROUNDING = {'attendance': 0, 'attendance%': 1, 'tavg': 1, 'prcp': 2}
+
+def build_yearly_table(games, weather, census):
+    """
+    Builds the rounded yearly table (every team/year combination) returned by process_yearly().
+    See process_yearly() for the parameters and columns.
+    """
+    with stage("merge", rows_in=len(games) + len(weather) + len(census)) as timing:
+        # Convert daily Baseball Reference game data into group of team/year averages
+        games_yearly_avg = (
+            games.sort_values('date', kind='stable') # Should already be ordered, but sort so the last game's win_pct can be extracted easily
+            .groupby(['team', 'year'], observed=True) # Each observation is a team/year combo
+            .agg(YEARLY_GAME_AGGREGATES)
+            .reset_index())
+
+        # Convert daily Meteostat weather data into a group of team/year averages
+        weather_yearly_avg = (
+            weather.groupby(['team', 'year'], observed=True)[['tavg', 'prcp']].mean()
+            .reset_index())
+
+        yearly_df = assemble_yearly(games_yearly_avg, weather_yearly_avg, census)
+        timing.rows_out = len(yearly_df)
+    return yearly_df
+
+def assemble_yearly(games_yearly_avg, weather_yearly_avg, census):
+    """
+    Merges team/year game averages, team/year weather averages and census data into the rounded yearly table.
+    Shared by build_yearly_table() and stream_yearly().
+    """
+    # Combine game and weather data on a team/year basis
+    yearly_df = games_yearly_avg.merge(weather_yearly_avg, on=['team', 'year'], how='left')
+
+    # Merge census data with already-merged data. Census data is already on a yearly basis
+    yearly_df = yearly_df.merge(census, on=['team', 'year'], how='left')
+
+    yearly_df = yearly_df[YEARLY_COLUMNS]
+
+    for col, decimals in YEARLY_ROUNDING.items():
+        yearly_df[col] = yearly_df[col].round(decimals)
+
+    return yearly_df
+
+def yearly_table():
+    """Returns the yearly table for the registry's data. It is built once per data version and shared."""
+    return registry.derived("yearly", lambda reg: build_yearly_table(*reg.load()))
 
-def process_yearly(games, weather, census, team=None, year=None):
+def process_yearly(games=None, weather=None, census=None, team=None, year=None):
     """
     Process and merge data from the three data sources: games, weather, and census.
     This function converts data from games and weather into yearly averages to be merged with census data which is
     collected on a yearly basis. No user action is required – this function is called within the plotting functions.
     Please note that the Toronto Blue Jays do not have census data available.
+    If games, weather and census are not given, the package data is used. The yearly table is then only built once
+    per data version, and results are memoized per team/year selection (see selection_cache).
     Parameters:
         games (pd.DataFrame): Dataframe containing Baseball Reference attendance data (Attendance, Date, W-L, ...)
         weather (pd.DataFrame): Dataframe containing daily weather data for each team's city (Average Temperature,
@@ -109,60 +716,245 @@ def process_yearly(games, weather, census, team=None, year=None):
         - poverty_rate (float)
         - payroll_est (int)
     """
-    # Convert daily Baseball Reference game data into group of team/year averages
-    games_yearly_avg = (
-        games.sort_values('date') # Should already be ordered, but sort so the last game's win_pct can be extracted easily
-        .groupby(['team', 'year']) # Each observation is a team/year combo
-        .agg({
-            'win_pct': 'last', # Last recorded value of the season is a team's yearly win_pct
-            'attendance': 'mean', # Average yearly attendance for a given team/year
-            'attendance%': 'mean', # Average yearly capacity full for a given team/year
-            'opp_win_pct' : 'mean' # Average opponent win % at time of game
-        })
-        .reset_index())
-
-    # Convert daily Meteostat weather data into a group of team/year averages
-    weather_yearly_avg = (
-        weather.groupby(['team', 'year'])[['tavg', 'prcp']].mean()
-        .reset_index())
+    if games is None and weather is None and census is None:
+        return selection_cache.get("yearly", team, year, lambda: filter_teams_years(yearly_table(), team, year))
 
-    # Combine game and weather data on a team/year basis
-    yearly_df = games_yearly_avg.merge(weather_yearly_avg, on=['team', 'year'], how='left')
+    if games is None or weather is None or census is None:
+        registry_games, registry_weather, registry_census = registry.load()
+        games = registry_games if games is None else games
+        weather = registry_weather if weather is None else weather
+        census = registry_census if census is None else census
+    return filter_teams_years(build_yearly_table(games, weather, census), team, year)
 
-    # Merge census data with already-merged data. Census data is already on a yearly basis
-    yearly_df = yearly_df.merge(census, on=['team', 'year'], how='left')
+def filter_teams_years(df, team=None, year=None):
+    """
+    Returns the rows of df for the given team(s) and year(s). None selects all teams (or years).
+    """
+    with stage("filter", rows_in=len(df)) as timing:
+        # df now contains all team/year combos. If user specified team(s) or year(s), filter below:
+        if team is not None: # If user specified a team or list of teams
+            if isinstance(team, str): # If a single team is inputted (as a string)
+                team = [team] # Put it in list format to be consistent with multiple teams being inputted
+            df = df[df['team'].isin(team)] # Select user's specified list of teams
 
-    yearly_df = yearly_df[[
-        'year', 'team', 'attendance', 'attendance%', 'win_pct', 'opp_win_pct', 'tavg', 'prcp',
-        'population', 'median_age', 'median_household_income', 'average_household_size',
-        'pct_public_transit', 'pct_car', 'pct_walk', 'poverty_rate', 'payroll_est'
-    ]]
-
-    # yearly_df now contains all team/year combos. If user specified team(s) or year(s), filter below:
-    if team is not None: # If user specified a team or list of teams
-        if isinstance(team, str): # If a single team is inputted (as a string)
-            team = [team] # Put it in list format to be consistent with multiple teams being inputted
-        yearly_df = yearly_df[yearly_df['team'].isin(team)] # Select user's specified list of teams
-
-    # Repeat the same process for years
-    if year is not None:
-        if isinstance(year, int):
-            year = [year]
-        yearly_df = yearly_df[yearly_df['year'].isin(year)]
-
-    # Round: attendance (whole number), attendance%, tavg, prcp to 1 decimal
-    yearly_df['attendance'] = yearly_df['attendance'].round(0)
-    yearly_df['attendance%'] = yearly_df['attendance%'].round(1)
-    yearly_df['tavg'] = yearly_df['tavg'].round(1)
-    yearly_df['prcp'] = yearly_df['prcp'].round(2)
+        # Repeat the same process for years
+        if year is not None:
+            if isinstance(year, int):
+                year = [year]
+            df = df[df['year'].isin(year)]
+        timing.rows_out = len(df)
+    return df
 
-    return yearly_df
+# Running sums/counts kept by YearlyAccumulator for each averaged column
+GAME_MEANS = ['attendance', 'attendance%', 'opp_win_pct']
+WEATHER_MEANS = ['tavg', 'prcp']
+
+class YearlyAccumulator:
+    """
+    Running per-(team, year) aggregates that reproduce process_yearly()'s averages without holding the daily rows.
+    Games and weather rows are added in any number of chunks; memory use depends only on the number of team/year
+    combinations. For games, the sums and counts of attendance, attendance% and opp_win_pct are kept together with
+    the latest win_pct (by date). For weather, the sums and counts of tavg and prcp are kept.
+    """
+    def __init__(self):
+        self.games = None # DataFrame indexed by (team, year)
+        self.weather = None
+
+    def add_games(self, games):
+        """Adds a chunk of game rows (Baseball Reference format)."""
+        games = games.sort_values('date', kind='stable')
+        grouped = games.groupby(['team', 'year'], observed=True)
+        partial = pd.concat([
+            grouped[GAME_MEANS].sum().add_suffix('_sum'),
+            grouped[GAME_MEANS].count().add_suffix('_count'),
+            grouped[['date', 'win_pct']].last(), # Latest non-missing values within the chunk
+        ], axis=1)
+        self.games = combine_partials(self.games, partial, last=['date', 'win_pct'])
+
+    def add_weather(self, weather):
+        """Adds a chunk of daily weather rows (Meteostat format)."""
+        grouped = weather.groupby(['team', 'year'], observed=True)[WEATHER_MEANS]
+        partial = pd.concat([grouped.sum().add_suffix('_sum'), grouped.count().add_suffix('_count')], axis=1)
+        self.weather = combine_partials(self.weather, partial)
+
+    def games_yearly_avg(self):
+        """Returns the team/year game averages in the same format as build_yearly_table() computes them."""
+        df = self.games
+        averages = pd.DataFrame({'win_pct': df['win_pct']}, index=df.index)
+        for col in GAME_MEANS:
+            averages[col] = df[f'{col}_sum'] / df[f'{col}_count'] # NaN when a team/year has no values
+        return averages.reset_index()
+
+    def weather_yearly_avg(self):
+        """Returns the team/year weather averages in the same format as build_yearly_table() computes them."""
+        df = self.weather
+        averages = pd.DataFrame(index=df.index)
+        for col in WEATHER_MEANS:
+            averages[col] = df[f'{col}_sum'] / df[f'{col}_count']
+        return averages.reset_index()
+
+    def result(self, census, team=None, year=None):
+        """Returns the yearly table (process_yearly() format) for the rows added so far, merged with census."""
+        yearly_df = assemble_yearly(self.games_yearly_avg(), self.weather_yearly_avg(), census)
+        return filter_teams_years(yearly_df, team, year)
+
+def combine_partials(total, partial, last=()):
+    """
+    Combines two sets of per-(team, year) partial aggregates. Columns in 'last' hold the latest value by 'date'
+    ('partial' wins ties, since it holds later rows); every other column is summed.
+    """
+    if total is None:
+        return partial
+    combined = pd.concat([total, partial])
+    if last:
+        combined = combined.sort_values('date', kind='stable', na_position='first')
+    grouped = combined.groupby(level=['team', 'year'], observed=True)
+    sums = grouped[[col for col in combined.columns if col not in last]].sum()
+    if not last:
+        return sums
+    return pd.concat([sums, grouped[list(last)].last()], axis=1)
+
+def stream_yearly(team=None, year=None, chunksize=100_000, games_path=None, weather_path=None, census_path=None):
+    """
+    Streaming version of process_yearly() for source files too large to load at once.
+    The files are read in chunks of 'chunksize' rows. Rows outside the selected team(s)/year(s) are dropped as each
+    chunk is read, and the rest are folded into running aggregates (see YearlyAccumulator). Peak memory therefore
+    depends on 'chunksize' and the number of team/year combinations, not on the number of rows.
+    Parameters:
+        team (str, list): Team(s) of interest. If None, data is collected for all teams.
+        year (int, list): Year(s) of interest. If None, data is collected for all years.
+        chunksize (int): Number of rows read at a time.
+        games_path, weather_path, census_path (str): Source files (Baseball Reference, Meteostat and census CSVs).
+                        Default to the registry's files.
+    Returns a pd.DataFrame with the same columns and rounding as process_yearly().
+    """
+    games_path = games_path or registry.path("games")
+    weather_path = weather_path or registry.path("weather")
+    census_path = census_path or registry.path("census")
+
+    def chunks(path, columns):
+        for chunk in pd.read_csv(path, usecols=columns, chunksize=chunksize):
+            yield filter_teams_years(chunk, team, year)
+
+    accumulator = YearlyAccumulator()
+    for chunk in chunks(games_path, ['date', 'team', 'year', 'win_pct'] + GAME_MEANS):
+        accumulator.add_games(chunk)
+    for chunk in chunks(weather_path, ['team', 'year'] + WEATHER_MEANS):
+        accumulator.add_weather(chunk)
+    census = pd.concat(chunks(census_path, None), ignore_index=True)
+    return accumulator.result(census, team, year)
+
+DAILY_COLUMNS = ['date', 'year', 'team', 'win_pct', 'attendance', 'attendance%', 'num_home_game', 'opp',
+                 'opp_win_pct', 'start_time', 'cli', 'tavg', 'tmin', 'tmax', 'prcp']
 
-def process_daily(games, weather, team=None, year=None):
+# Decimal places of the daily output columns: attendance%, tavg, tmin, tmax to 1 decimal, prcp to 2
+DAILY_ROUNDING = {'attendance%': 1, 'tavg': 1, 'tmin': 1, 'tmax': 1, 'prcp': 2}
+
+def build_daily_table(games, weather):
+    """
+    Joins each game with the weather of its team and date into the daily fact table used by process_daily().
+    The weather is read from dense [team, year, day] arrays (see dense.SeasonArrays) by integer position instead of
+    being merged on (team, date) keys.
+    Values are rounded the same way as process_daily() output, and rows are indexed by a sorted (team, year)
+    MultiIndex so that team/year selections are index slices rather than full scans.
+    Parameters:
+        games (pd.DataFrame): Dataframe containing Baseball Reference attendance data (Attendance, Date, W-L, ...)
+        weather (pd.DataFrame or SeasonArrays): Daily weather data for each team's city (Average Temperature,
+                                    Daily Precipitation, ...), as a frame or already in array form.
+    Returns a pd.DataFrame with the process_daily() columns (other than team and year) indexed by (team, year).
+    """
+    if not isinstance(weather, SeasonArrays):
+        weather = SeasonArrays.from_frame(weather, WEATHER_VARIABLES)
+
+    with stage("merge", rows_in=len(games)) as timing:
+        daily_df = games.drop(columns='year')
+        daily_df['date'] = pd.to_datetime(daily_df['date'])
+        daily_df['year'] = daily_df['date'].dt.year
+
+        # Look up each game's weather by its (team, year, day) position
+        codes = weather.codes(daily_df['team'], daily_df['date'])
+        found = codes[0] >= 0
+        for variable in WEATHER_VARIABLES:
+            values = np.full(len(daily_df), np.nan)
+            values[found] = weather.values[variable][tuple(axis[found] for axis in codes)]
+            daily_df[variable] = values
+
+        daily_df = daily_df[DAILY_COLUMNS]
+
+        for col, decimals in DAILY_ROUNDING.items():
+            daily_df[col] = daily_df[col].round(decimals)
+
+        # Stable sort keeps each team-season's games in their original (date) order
+        daily_df = daily_df.sort_values(['team', 'year'], kind='stable').set_index(['team', 'year'])
+        daily_df.index = daily_df.index.remove_unused_levels()
+        timing.rows_out = len(daily_df)
+    return daily_df
+
+def array_dtype(reg):
+    """Returns the float dtype of a registry's dense arrays: float32 in compact mode, float64 otherwise."""
+    return "float32" if reg.compact else "float64"
+
+def weather_arrays():
+    """
+    Returns the registry's weather (tavg, tmin, tmax, prcp) as dense [team, year, day] arrays (see
+    dense.SeasonArrays), built once per data version. Use lookup()/value() for (team, date) lookups and select()
+    for team/year slices.
+    """
+    return registry.derived("weather_arrays",
+                            lambda reg: SeasonArrays.from_frame(reg.get("weather"), WEATHER_VARIABLES, dtype=array_dtype(reg)))
+
+def attendance_arrays():
+    """
+    Returns the registry's game attendance (attendance, attendance%) as dense [team, year, day] arrays, built once
+    per data version. Doubleheaders are averaged into one day; 'counts' holds the number of games on each day.
+    """
+    return registry.derived("attendance_arrays",
+                            lambda reg: SeasonArrays.from_frame(reg.get("games"), ATTENDANCE_VARIABLES, dtype=array_dtype(reg)))
+
+def daily_table(games=None, weather=None):
+    """
+    Returns the daily fact table (see build_daily_table) for games and weather. If neither is given, the table for
+    the registry's sources is returned; it is built once per data version and shared, so treat it as read-only.
+    """
+    if games is None and weather is None:
+        return registry.derived("daily", lambda reg: build_daily_table(reg.get("games"), weather_arrays()))
+    if games is None:
+        games = registry.get("games")
+    if weather is None:
+        weather = weather_arrays()
+    return build_daily_table(games, weather)
+
+def select_teams_years(table, team=None, year=None):
+    """
+    Selects the rows of a (team, year)-indexed table for the given team(s) and year(s) by slicing its index.
+    Teams or years that are not in the table are ignored. None selects all teams (or years).
+    Returns a pd.DataFrame (a new frame; the table itself is not modified).
+    """
+    if team is None and year is None:
+        return table.copy()
+
+    selection = []
+    for level, values in enumerate([team, year]):
+        if values is None:
+            selection.append(slice(None))
+            continue
+        if isinstance(values, (str, int)): # A single team/year, put it in list format
+            values = [values]
+        present = set(table.index.levels[level])
+        selection.append(sorted(value for value in values if value in present))
+
+    if any(isinstance(values, list) and not values for values in selection):
+        return table.iloc[:0].copy()
+    return table.loc[tuple(selection), :]
+
+def process_daily(games=None, weather=None, team=None, year=None):
     """
     Process and merge data from two data sources: games and weather.
     This function merges data from games and weather and maintains observations at the daily level. No user action
     is required – this function is called within the plotting functions.
+    If games and weather are not given, the package data is used and the merged table is only built once per data
+    version; each call then only slices out the selected team(s) and year(s), and results are memoized per
+    selection (see selection_cache).
     Parameters:
         games (pd.DataFrame): Dataframe containing Baseball Reference attendance data (Attendance, Date, W-L, ...)
         weather (pd.DataFrame): Dataframe containing daily weather data for each team's city (Average Temperature,
@@ -186,99 +978,513 @@ def process_daily(games, weather, team=None, year=None):
         - tmax (float)
         - prcp (float)
     """
-    # Combine game and weather data on a team/year basis
-    daily_df = games.merge(weather, on=['team', 'date'], how='left')
+    if games is None and weather is None:
+        return selection_cache.get("daily", team, year, lambda: select_daily(daily_table(), team, year))
+    return select_daily(daily_table(games, weather), team, year)
 
-    daily_df['year'] = pd.to_datetime(daily_df['date']).dt.year
+def select_daily(table, team=None, year=None):
+    """Selects team(s)/year(s) from a daily fact table and returns them in process_daily() format."""
+    with stage("filter", rows_in=len(table)) as timing:
+        daily_df = select_teams_years(table, team=team, year=year).reset_index()[DAILY_COLUMNS]
+        timing.rows_out = len(daily_df)
+    return daily_df
 
-    daily_df = daily_df[['date', 'year', 'team', 'win_pct', 'attendance', 'attendance%', 'num_home_game', 'opp',
-                         'opp_win_pct', 'start_time', 'cli', 'tavg', 'tmin', 'tmax', 'prcp']]
+WEEKDAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
 
-    if team is not None: # If user specified a team or list of teams
-        if isinstance(team, str): # If a single team is inputted (as a string)
-            team = [team] # Put it in list format to be consistent with multiple teams being inputted
-        daily_df = daily_df[daily_df['team'].isin(team)] # Select user's specified list of teams
+# Group March/April, September/October together. Not many regular season games played in March, October
+MONTH_ORDER = ['March/April', 'May', 'June', 'July', 'August', 'September/October']
 
-    # Repeat the same process for years
-    if year is not None:
-        if isinstance(year, int):
-            year = [year]
-        daily_df = daily_df[daily_df['year'].isin(year)]
+# Lookup table: month number (1-12) -> position in MONTH_ORDER, or -1 for months outside the regular season
+MONTH_BUCKETS = np.array([-1, -1, -1, 0, 0, 1, 2, 3, 4, 5, 5, -1, -1], dtype=np.int8)
 
-    # Round: attendance%, tavg, tmin, tmax, prcp to 1 decimal
-    daily_df['attendance%'] = daily_df['attendance%'].round(1)
-    daily_df['tavg'] = daily_df['tavg'].round(1)
-    daily_df['tmin'] = daily_df['tmin'].round(1)
-    daily_df['tmax'] = daily_df['tmax'].round(1)
-    daily_df['prcp'] = daily_df['prcp'].round(2)
+# 'by' argument -> name of the output column when grouping by several time measurements
+TIME_DIMENSIONS = {
+    "start time" : "start_time",
+    "weekday" : "weekday",
+    "month" : "month",
+    "year" : "year",
+}
 
-    return daily_df
+def time_buckets(df, by):
+    """
+    Returns a pd.Series (aligned with df) holding the time unit of each row for the time measurement 'by'
+    ('start time', 'weekday', 'month', 'year'). Weekdays and months are ordered categoricals; games played in months
+    outside MONTH_ORDER are NaN. df is not modified.
+    """
+    if by == "start time":
+        return df['start_time'].rename("start_time")
+    if by == "year":
+        return df['year'].rename("year")
+
+    dates = df['date']
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates)
+
+    if by == "weekday":
+        codes = dates.dt.weekday.fillna(-1).to_numpy(dtype=np.int8)
+        categories = WEEKDAY_ORDER
+    else:
+        codes = MONTH_BUCKETS[dates.dt.month.fillna(0).to_numpy(dtype=np.int8)]
+        categories = MONTH_ORDER
+    values = pd.Categorical.from_codes(codes, categories=categories, ordered=True)
+    return pd.Series(values, index=df.index, name=TIME_DIMENSIONS[by])
+
+def time_dimensions(by):
+    """Validates the 'by' argument of group_attendance_by_time() and returns it as a list of time measurements."""
+    dimensions = [by] if isinstance(by, str) else list(by)
+    dimensions = [dimension.lower() for dimension in dimensions]
+    if not dimensions or any(dimension not in TIME_DIMENSIONS for dimension in dimensions):
+        raise ValueError("Invalid argument for 'by'. Valid arguments are 'start time', 'weekday', 'month', 'year'.")
+    return dimensions
+
+def time_means_frame(means, by):
+    """
+    Converts a Series of attendance means indexed by time unit(s) into the output format of
+    group_attendance_by_time(). 'by' is that function's argument (a time measurement or a list of them).
+    """
+    if not isinstance(by, str):
+        return means.reset_index()
+
+    time_df = means.rename_axis('time_measure').reset_index()
+    if by.lower() == "weekday":
+        time_df.insert(0, 'weekday_int', time_df['time_measure'].cat.codes.astype(int)) # 0 = Monday, ..., 6 = Sunday
+        time_df['time_measure'] = time_df['time_measure'].cat.remove_unused_categories()
+    return time_df
 
 def group_attendance_by_time(df, by, attendance = 'attendance%'):
     """
     This function is called within plotting functions and groups attendance by a certain time unit (game start time,
         weekday, month, year), and then returns measurement averages based on the selected time measurement.
+    df is left unchanged, so the same frame can safely be shared between callers.
     Parameters:
         df (pd.DataFrame): Dataframe that has already been processed.
-        by (str): Time measurement: 'start time', 'weekday', 'month', 'year'.
+        by (str, list): Time measurement: 'start time', 'weekday', 'month', 'year'. A list of time measurements
+                            (e.g. ['month', 'start time']) groups by all of them at once.
         attendance (str): Either raw attendance count ('attendance') or as
                             a percentage of stadium capacity ('attendance%')
     Returns a Dataframe containing measurements that were grouped and averaged by the selected 'by' method.
+        For a single time measurement, the time unit is in the 'time_measure' column (plus 'weekday_int' when
+        grouping by weekday). For a list, each time measurement gets its own column ('start_time', 'weekday',
+        'month', 'year') and only combinations that occur in df are returned.
     """
-    by = by.lower()
+    dimensions = time_dimensions(by)
+    with stage("group", rows_in=len(df)) as timing:
+        keys = [time_buckets(df, dimension) for dimension in dimensions]
 
-    if by == "start time":
-        df['time_measure'] = df['start_time']
-        time_df = df.groupby('time_measure')[attendance].mean().reset_index()
-        return time_df
-
-    elif by == "weekday":
-        df['date'] = pd.to_datetime(df['date'])
-        df['weekday_int'] = df['date'].dt.weekday
-        weekday_dict = {
-            0: 'Monday', 1: 'Tuesday', 2: 'Wednesday', 3: 'Thursday',
-            4: 'Friday', 5: 'Saturday', 6: 'Sunday'
-        }
-        df['time_measure'] = df['weekday_int'].map(weekday_dict)
-        time_df = df.groupby(['weekday_int', 'time_measure'])[attendance].mean().reset_index()
-        return time_df.sort_values('weekday_int')
-
-    elif by == "month":
-        df['date'] = pd.to_datetime(df['date'])
-        df['month_int'] = df['date'].dt.month
-
-        # Group March/April, September/October together. Not many regular season games played in March, October
-        def group_months(i):
-            if i in [3, 4]:
-                return 'March/April'
-            elif i == 5:
-                return 'May'
-            elif i == 6:
-                return 'June'
-            elif i == 7:
-                return 'July'
-            elif i == 8:
-                return 'August'
-            elif i in [9, 10]:
-                return 'September/October'
-            elif i == 11:
-                return 'November'
-
-        df['time_measure'] = df['month_int'].map(group_months)
-
-        monthly_order = ['March/April', 'May', 'June', 'July', 'August', 'September/October']
-
-        time_df = (df[df['time_measure'].isin(monthly_order)]
-            .groupby('time_measure')[attendance].mean()
-                   .reindex(monthly_order)
-                   .reset_index())
-        return time_df
-
-    elif by == "year":
-        df['time_measure'] = df['year']
-        return df.groupby('time_measure')[attendance].mean().reset_index()
+        # Every month bucket is reported (NaN if no games were played), other time units only when they occur
+        observed = not (isinstance(by, str) and dimensions[0] == "month")
+        means = df[attendance].groupby(keys, observed=observed).mean()
+        time_df = time_means_frame(means, by)
+        timing.rows_out = len(time_df)
+    return time_df
 
-    else:
-        raise ValueError("Invalid argument for 'by'. Valid arguments are 'start time', 'weekly', 'monthly', 'yearly'.")
+CUBE_DIMENSIONS = ['start_time', 'weekday', 'month']
+
+def build_attendance_cube(daily_df):
+    """
+    Builds the attendance cube used by rollup_attendance(): the sum and count of 'attendance' and 'attendance%' for
+    every team × year × month bucket × weekday × start time combination in a daily table.
+    Parameters:
+        daily_df (pd.DataFrame): Daily data as returned by process_daily() (or the daily fact table).
+    Returns a pd.DataFrame indexed by a sorted (team, year) MultiIndex with columns 'start_time', 'weekday', 'month',
+        'attendance_sum', 'attendance_count', 'attendance%_sum' and 'attendance%_count'.
+    """
+    if 'team' in daily_df.columns:
+        daily_df = daily_df.set_index(['team', 'year'])
+    keys = [daily_df.index.get_level_values('team'), daily_df.index.get_level_values('year')]
+    keys += [time_buckets(daily_df, dimension) for dimension in ["start time", "weekday", "month"]]
+
+    with stage("cube", rows_in=len(daily_df)) as timing:
+        measures = daily_df[['attendance', 'attendance%']]
+        grouped = measures.groupby(keys, observed=True, dropna=False) # Keep games outside the month buckets
+        cube = pd.concat([grouped.sum().add_suffix('_sum'), grouped.count().add_suffix('_count')], axis=1)
+        cube = cube.reset_index(level=CUBE_DIMENSIONS).sort_index()
+        cube.index = cube.index.remove_unused_levels()
+        timing.rows_out = len(cube)
+    return cube
+
+def attendance_cube():
+    """Returns the attendance cube for the registry's data. It is built once per data version and shared."""
+    return registry.derived("cube", lambda reg: build_attendance_cube(daily_table()))
+
+def rollup_attendance(cube, by, team=None, year=None, attendance='attendance%'):
+    """
+    Averages attendance by time unit from an attendance cube, without touching the game rows.
+    The result is the same as group_attendance_by_time(process_daily(team=team, year=year), by, attendance).
+    Parameters:
+        cube (pd.DataFrame): Cube built by build_attendance_cube() (see attendance_cube()).
+        by (str, list): Time measurement(s): 'start time', 'weekday', 'month', 'year'.
+        team (str, list): Team(s) to average over. If None, the league average is returned.
+        year (int, list): Year(s) to average over. If None, all years are used.
+        attendance (str): Either 'attendance' or 'attendance%'.
+    Returns a Dataframe in the same format as group_attendance_by_time().
+    """
+    dimensions = time_dimensions(by)
+    with stage("group", rows_in=len(cube)) as timing:
+        cells = select_teams_years(cube, team=team, year=year).reset_index()
+
+        observed = not (isinstance(by, str) and dimensions[0] == "month")
+        totals = (cells.groupby([TIME_DIMENSIONS[dimension] for dimension in dimensions], observed=observed)
+                  [[f'{attendance}_sum', f'{attendance}_count']].sum())
+        means = (totals[f'{attendance}_sum'] / totals[f'{attendance}_count']).rename(attendance)
+        time_df = time_means_frame(means, by)
+        timing.rows_out = len(time_df)
+    return time_df
+
+def facet_attendance(cube, by, facet="team", team=None, year=None, attendance='attendance%'):
+    """
+    Averages attendance by time unit for many teams (or years) at once: one grouped sum over (facet, time unit) of
+    the attendance cube's cells gives every panel of a small-multiples chart. Each row is the same as
+    rollup_attendance(cube, by, team=..., year=..., attendance=attendance) for that team (or year).
+    Parameters:
+        cube (pd.DataFrame): Cube built by build_attendance_cube() (see attendance_cube()).
+        by (str): Time measurement: 'start time', 'weekday', 'month', 'year'.
+        facet (str): 'team' (one row per team, averaged over the selected years) or 'year' (one row per year,
+                        averaged over the selected teams).
+        team (str, list): Team(s) to include. If None, all teams are included.
+        year (int, list): Year(s) to include. If None, all years are included.
+        attendance (str): Either 'attendance' or 'attendance%'.
+    Returns a pd.DataFrame of attendance means indexed by team (or year), with one column per time unit (every
+        month bucket when by='month', otherwise the time units that occur in the selection).
+    """
+    if facet not in ("team", "year"):
+        raise ValueError("Invalid argument for 'facet'. Valid arguments are 'team', 'year'.")
+    if not isinstance(by, str):
+        raise ValueError("Please select one time measurement for 'by'.")
+    dimension = TIME_DIMENSIONS[time_dimensions(by)[0]]
+    with stage("group", rows_in=len(cube)) as timing:
+        cells = select_teams_years(cube, team=team, year=year).reset_index()
+        if dimension == facet: # e.g. yearly panels of yearly averages
+            cells[f'{facet} panel'] = cells[facet]
+            facet = f'{facet} panel'
+        totals = (cells.groupby([facet, dimension], observed=True)
+                  [[f'{attendance}_sum', f'{attendance}_count']].sum())
+        means = (totals[f'{attendance}_sum'] / totals[f'{attendance}_count']).unstack(dimension)
+        if dimension == "month":
+            means = means.reindex(columns=pd.CategoricalIndex(MONTH_ORDER, categories=MONTH_ORDER, ordered=True,
+                                                              name="month"))
+        if isinstance(means.index, pd.CategoricalIndex):
+            means.index = means.index.astype(str)
+        means.index.name = facet.split(" ")[0]
+        timing.rows_out = len(means)
+    return means
+
+TREND_COLUMNS = ['date', 'year', 'team', 'num_home_game', 'attendance', 'attendance%', 'win_pct',
+                 'attendance_rolling', 'attendance%_rolling', 'win_pct_delta', 'attendance_yoy', 'attendance%_yoy']
+
+# Trend series -> axis label ('{window}' is replaced by the number of games)
+trend_dict = {
+    "attendance_rolling" : "Attendance ({window}-Game Rolling Average)",
+    "attendance%_rolling" : "Stadium Capacity Filled (%) ({window}-Game Rolling Average)",
+    "win_pct_delta" : "Change in Win % over {window} Home Games",
+    "attendance_yoy" : "Attendance Change vs. Previous Season",
+    "attendance%_yoy" : "Stadium Capacity Filled (%) Change vs. Previous Season",
+}
+
+def build_trend_table(daily_df, window=10):
+    """
+    Computes within-season trend series for every team-season of a daily fact table at once. Each series is one
+    vectorized pass over the whole table (see stats.rolling_mean and stats.lagged_difference) rather than a loop over
+    team-seasons.
+    Parameters:
+        daily_df (pd.DataFrame): Daily fact table (see build_daily_table), indexed by a sorted (team, year) MultiIndex
+                            with each team-season's games in date order.
+        window (int): Number of home games the rolling series cover.
+    Returns a pd.DataFrame indexed like daily_df with the columns of TREND_COLUMNS (other than team and year):
+        - attendance_rolling, attendance%_rolling (float): Average over the last 'window' home games of the season,
+                            including this one (fewer at the start of the season)
+        - win_pct_delta (float): Change in win_pct since 'window' home games earlier (NaN for the first games)
+        - attendance_yoy, attendance%_yoy (float): Change from the same home game (num_home_game) of the previous
+                            season (NaN if the team has no such game that season)
+    """
+    if not isinstance(window, (int, np.integer)) or window < 1:
+        raise ValueError("Invalid argument for 'window'. It must be a positive number of games.")
+    with stage("trends", rows_in=len(daily_df)) as timing:
+        index = daily_df.index
+        team_codes, year_codes = index.codes
+        starts = group_starts(team_codes.astype(np.int64) * len(index.levels[1]) + year_codes)
+
+        trend_df = daily_df[[col for col in TREND_COLUMNS if col in daily_df.columns]].copy()
+        for col in ['attendance', 'attendance%']:
+            trend_df[f'{col}_rolling'] = rolling_mean(daily_df[col].to_numpy(dtype=float, na_value=np.nan), starts, window)
+        trend_df['win_pct_delta'] = lagged_difference(daily_df['win_pct'].to_numpy(dtype=float, na_value=np.nan),
+                                                      starts, window)
+
+        # Row of the same home game in the previous season, matched on (team, year, num_home_game) keys
+        years = index.get_level_values('year').to_numpy()
+        home_games = daily_df['num_home_game'].to_numpy()
+        keys = pd.MultiIndex.from_arrays([team_codes, years, home_games])
+        previous = keys.get_indexer(pd.MultiIndex.from_arrays([team_codes, years - 1, home_games]))
+        found = previous >= 0
+        for col in ['attendance', 'attendance%']:
+            values = daily_df[col].to_numpy(dtype=float, na_value=np.nan)
+            changes = np.full(len(values), np.nan)
+            changes[found] = values[found] - values[previous[found]]
+            trend_df[f'{col}_yoy'] = changes
+        timing.rows_out = len(trend_df)
+    return trend_df
+
+def trend_table(window=10):
+    """Returns the trend table (see build_trend_table) for the registry's data. It is built once per data version and window."""
+    return registry.derived(f"trends {window}", lambda reg: build_trend_table(daily_table(), window))
+
+def process_trends(team=None, year=None, window=10):
+    """
+    Returns rolling and year-over-year attendance series (see build_trend_table) for the selected team(s) and
+    year(s), one row per game in date order. The series are computed for every team at once and memoized per
+    selection (see selection_cache), so year-over-year changes of a single season still see the season before.
+    Parameters:
+        team (str, list): Team(s) of interest. If None, all teams are returned.
+        year (int, list): Year(s) of interest. If None, all years are returned.
+        window (int): Number of home games the rolling series cover (default 10).
+    Returns a pd.DataFrame with the columns of TREND_COLUMNS.
+    """
+    def select():
+        table = trend_table(window)
+        with stage("filter", rows_in=len(table)) as timing:
+            trend_df = select_teams_years(table, team=team, year=year).reset_index()[TREND_COLUMNS]
+            timing.rows_out = len(trend_df)
+        return trend_df
+    return selection_cache.get(("trends", window), team, year, select)
+
+# Columns that identify a row of each source that accepts appended rows
+APPEND_KEYS = {
+    "games" : ['team', 'year', 'num_home_game'],
+    "weather" : ['team', 'date'],
+}
+
+def validate_rows(name, df, existing):
+    """
+    Checks new rows for the source 'name' ('games' or 'weather') against the loaded source 'existing' and returns
+    them cast to its column types, in its column order.
+    Raises a ValueError if a column is missing or unexpected, a value cannot be converted (e.g. an unknown team or
+    start time, a malformed date or a fractional home game number), a key column or integer column is empty, a 'year'
+    does not match its 'date', or two rows share a key (see APPEND_KEYS).
+    """
+    missing = [col for col in existing.columns if col not in df.columns]
+    unexpected = [col for col in df.columns if col not in existing.columns]
+    if missing or unexpected:
+        raise ValueError(f"New {name} rows must have the columns {', '.join(existing.columns)} "
+                         f"(missing: {', '.join(missing) or 'none'}; unexpected: {', '.join(unexpected) or 'none'}).")
+
+    rows = {}
+    for col, dtype in existing.dtypes.items():
+        values = df[col].reset_index(drop=True)
+        if isinstance(dtype, pd.CategoricalDtype):
+            unknown = sorted(set(values.dropna().astype(str)) - set(dtype.categories.astype(str)))
+            if unknown:
+                raise ValueError(f"Unknown {col} value(s) in new {name} rows: {', '.join(unknown)}.")
+            rows[col] = values.astype(str).where(values.notna()).astype(dtype)
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            rows[col] = pd.to_datetime(values).astype(dtype)
+        elif pd.api.types.is_integer_dtype(dtype):
+            numbers = pd.to_numeric(values)
+            if isinstance(dtype, np.dtype) and numbers.isna().any():
+                raise ValueError(f"Column '{col}' of new {name} rows must not be empty.")
+            if (numbers.dropna() % 1 != 0).any():
+                raise ValueError(f"Column '{col}' of new {name} rows must hold whole numbers.")
+            info = np.iinfo(dtype.numpy_dtype if hasattr(dtype, "numpy_dtype") else dtype)
+            fits = numbers.dropna().between(info.min, info.max).all()
+            # Values too large for the loaded type are kept as 64-bit integers; appending then widens the column
+            rows[col] = numbers.astype(dtype if fits else ("int64" if isinstance(dtype, np.dtype) else "Int64"))
+        else:
+            rows[col] = pd.to_numeric(values).astype(dtype)
+    rows = pd.DataFrame(rows)
+
+    keys = APPEND_KEYS[name]
+    empty = [col for col in keys + ['date', 'year'] if rows[col].isna().any()]
+    if empty:
+        raise ValueError(f"Column(s) {', '.join(empty)} of new {name} rows must not be empty.")
+    if (rows['year'] != rows['date'].dt.year).any():
+        raise ValueError(f"The 'year' of new {name} rows must be the year of their 'date'.")
+    if rows.duplicated(keys).any():
+        raise ValueError(f"New {name} rows contain several rows for the same {', '.join(keys)}.")
+    return rows
+
+def append_csv(df, path):
+    """Appends rows to a source CSV, in the column order of its header and with dates written as YYYY-MM-DD."""
+    columns = pd.read_csv(path, nrows=0).columns
+    with open(path, "rb") as file:
+        file.seek(0, os.SEEK_END)
+        if file.tell():
+            file.seek(-1, os.SEEK_END)
+            ends_with_newline = file.read(1) == b"\n"
+        else:
+            ends_with_newline = True
+    with open(path, "a", newline="") as file:
+        if not ends_with_newline:
+            file.write("\n")
+        df[list(columns)].to_csv(file, header=False, index=False, date_format="%Y-%m-%d")
+
+def yearly_accumulator():
+    """
+    Returns running team/year sums and counts (see YearlyAccumulator) of the registry's games and weather, built once
+    per data version. append_games() and append_weather() update them from the new rows only.
+    """
+    def build(reg):
+        accumulator = YearlyAccumulator()
+        accumulator.add_games(reg.get("games"))
+        accumulator.add_weather(reg.get("weather"))
+        return accumulator
+    return registry.derived("yearly accumulator", build)
+
+def updated_yearly(add):
+    """
+    Returns the 'yearly accumulator' and 'yearly' tables updated by add(accumulator), if the yearly table is built.
+    The accumulator is copied first, so the tables of the current data version are not modified.
+    """
+    if registry.cached("yearly") is None:
+        return {} # Built from the appended data when it is next used
+    accumulator = copy.copy(yearly_accumulator())
+    add(accumulator)
+    yearly_df = assemble_yearly(accumulator.games_yearly_avg(), accumulator.weather_yearly_avg(), registry.get("census"))
+    return {"yearly accumulator": accumulator, "yearly": yearly_df}
+
+def combine_cubes(cube, partial):
+    """Adds the sums and counts of an attendance cube built from new rows to an existing cube (see build_attendance_cube)."""
+    combined = pd.concat([cube, partial]).set_index(CUBE_DIMENSIONS, append=True)
+    combined = combined.groupby(level=list(combined.index.names), observed=True, dropna=False).sum()
+    combined = combined.reset_index(level=CUBE_DIMENSIONS)
+    combined.index = combined.index.remove_unused_levels()
+    return combined
+
+def refresh_daily_weather(daily, arrays, rows):
+    """
+    Returns a copy of the daily fact table in which the weather of the team-seasons in 'rows' (new weather rows) is
+    looked up again in 'arrays'. Other team-seasons are copied unchanged.
+    """
+    daily = daily.copy()
+    positions = []
+    for team, year in rows[['team', 'year']].drop_duplicates().itertuples(index=False):
+        try:
+            locs = daily.index.get_loc((team, year))
+        except KeyError:
+            continue # No games for that team-season yet
+        positions.append(np.arange(len(daily))[locs])
+    if not positions:
+        return daily
+    positions = np.concatenate(positions)
+    teams = daily.index.get_level_values('team')[positions]
+    dates = daily['date'].to_numpy()[positions]
+    for variable in WEATHER_VARIABLES:
+        values = pd.Series(arrays.lookup(variable, teams, dates).astype("float64"))
+        if variable in DAILY_ROUNDING:
+            values = values.round(DAILY_ROUNDING[variable])
+        daily.iloc[positions, daily.columns.get_loc(variable)] = values.to_numpy()
+    return daily
+
+# Merge functions for rows appended to the registry's tables (see DatasetRegistry.update)
+def concat_rows(df, parts):
+    """Returns a source with appended rows added at the end."""
+    return pd.concat([df, *parts], ignore_index=True)
+
+def concat_daily(daily, parts):
+    """Returns the daily fact table with appended games, each after the existing games of its team-season."""
+    daily = pd.concat([daily, *parts]).sort_index(kind='stable')
+    daily.index = daily.index.remove_unused_levels()
+    return daily
+
+def merge_daily_weather(daily, parts):
+    """Returns the daily fact table with the weather of the team-seasons of appended weather rows looked up again."""
+    return refresh_daily_weather(daily, weather_arrays(), pd.concat(parts, ignore_index=True))
+
+def loaded_game_keys(teams, years):
+    """
+    Returns the (team, year, num_home_game) keys of the games in the daily fact table for the given teams and years,
+    including games appended but not merged yet, as a pd.MultiIndex. Builds the daily table if needed.
+    """
+    daily = registry.cached("daily", merge=False)
+    if daily is None:
+        daily = daily_table()
+    parts = [daily] + [part for merge, part in registry.pending("daily") if merge is concat_daily]
+    loaded = pd.concat([select_teams_years(part, team=teams, year=years) for part in parts]).reset_index()
+    return pd.MultiIndex.from_frame(loaded[APPEND_KEYS["games"]].astype({"team": str}))
+
+def append_games(df, persist=True):
+    """
+    Appends new games (e.g. the latest day of an in-progress season) to the registry's data and updates the tables
+    derived from it using only the new rows: the daily fact table gains the new games joined with their weather, the
+    attendance cube (time-bucket sums and counts used by rollup_attendance) adds their sums and counts, and the
+    running team/year sums, counts and latest win_pct behind process_yearly() are updated. Tables that have not been
+    built yet are built from the full data when they are next used.
+    The new rows of the games source and the daily table are kept apart from them and merged in with one copy of
+    each table the first time the whole table is used (e.g. by process_daily()), so appending day after day does
+    not copy the full tables each time. The cube and the yearly table are updated in place of the old ones.
+    Parameters:
+        df (pd.DataFrame): New rows with the columns of the games source ('bref_2012_2019.csv'). 'team' and 'opp'
+                            must be known team abbreviations and 'start_time' 'Day' or 'Night'.
+        persist (bool): If True, the rows are also appended to the games CSV, so that they are loaded again after
+                            invalidate() and by other processes. If False, they are only held in memory.
+    Raises a ValueError if the rows do not match the games schema (see validate_rows) or a game with the same team,
+        year and num_home_game is already loaded. Nothing is appended in that case.
+    Returns the appended rows, cast to the column types of the games source.
+    """
+    with registry._lock:
+        games = registry.get("games", merge=False)
+        rows = validate_rows("games", df, games)
+        if rows.empty:
+            return rows
+        existing = loaded_game_keys(list(rows['team'].astype(str).unique()), [int(year) for year in rows['year'].unique()])
+        new_keys = pd.MultiIndex.from_frame(rows[APPEND_KEYS["games"]].astype({"team": str}))
+        if new_keys.isin(existing).any():
+            raise ValueError("New games rows repeat games that are already loaded (same team, year and num_home_game).")
+
+        with stage("append games", rows_in=len(rows)) as timing:
+            new_daily = build_daily_table(rows, weather_arrays())
+            tables = {"games": games, "daily": registry.cached("daily", merge=False)}
+            appended = {"games": (concat_rows, rows), "daily": (concat_daily, new_daily)}
+            if (cube := registry.cached("cube")) is not None:
+                tables["cube"] = combine_cubes(cube, build_attendance_cube(new_daily))
+            tables.update(updated_yearly(lambda accumulator: accumulator.add_games(rows)))
+            if (arrays := registry.cached("weather_arrays")) is not None:
+                tables["weather_arrays"] = arrays
+            timing.rows_out = len(rows)
+
+        if persist:
+            append_csv(rows, registry.path("games"))
+        registry.update(tables, appended, persisted=persist)
+    return rows
+
+def append_weather(df, persist=True):
+    """
+    Appends new daily weather readings to the registry's data and updates the tables derived from it using only the
+    new rows: the dense weather arrays gain the new days, games already in the daily fact table on those days get
+    their weather, and the running team/year weather sums and counts behind process_yearly() are updated. Tables that
+    have not been built yet are built from the full data when they are next used.
+    As in append_games(), the new rows of the weather source, and the weather lookup for games already in the daily
+    table, are applied the first time the whole table is used.
+    Parameters:
+        df (pd.DataFrame): New rows with the columns of the weather source ('weather_2012_2019.csv').
+        persist (bool): If True, the rows are also appended to the weather CSV, so that they are loaded again after
+                            invalidate() and by other processes. If False, they are only held in memory.
+    Raises a ValueError if the rows do not match the weather schema (see validate_rows) or weather for the same team
+        and date is already loaded. Nothing is appended in that case.
+    Returns the appended rows, cast to the column types of the weather source.
+    """
+    with registry._lock:
+        weather = registry.get("weather", merge=False)
+        rows = validate_rows("weather", df, weather)
+        if rows.empty:
+            return rows
+        arrays = weather_arrays()
+        codes = arrays.codes(rows['team'], rows['date'])
+        found = codes[0] >= 0
+        if (arrays.counts[tuple(axis[found] for axis in codes)] > 0).any():
+            raise ValueError("New weather rows repeat days that are already loaded (same team and date).")
 
+        with stage("append weather", rows_in=len(rows)) as timing:
+            tables = {"weather": weather, "weather_arrays": arrays.add_rows(rows)}
+            appended = {"weather": (concat_rows, rows)}
+            if (daily := registry.cached("daily", merge=False)) is not None:
+                tables["daily"] = daily
+                appended["daily"] = (merge_daily_weather, rows)
+            tables.update(updated_yearly(lambda accumulator: accumulator.add_weather(rows)))
+            for name in ("cube", "attendance_arrays"): # Built from attendance only
+                if (table := registry.cached(name)) is not None:
+                    tables[name] = table
+            timing.rows_out = len(rows)
 
+        if persist:
+            append_csv(rows, registry.path("weather"))
+        registry.update(tables, appended, persisted=persist)
+    return rows
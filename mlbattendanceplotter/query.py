@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+
+from .processing import registry, selection_cache, canonical_selection, weather_arrays, variable_dict, DAILY_COLUMNS, \
+    DAILY_ROUNDING, YEARLY_COLUMNS, YEARLY_ROUNDING, YEARLY_GAME_AGGREGATES, SOURCE_SCHEMAS
+from .dense import WEATHER_VARIABLES
+from .instrumentation import stage
+from .stats import correlations
+
+# Columns that can be requested at each level
+LEVELS = {"daily": DAILY_COLUMNS, "yearly": YEARLY_COLUMNS}
+
+# Every result carries its team and year, whatever columns were requested
+KEYS = ["team", "year"]
+
+# Columns that identify or label a row rather than measure something
+LABEL_COLUMNS = ["date", "year", "team", "opp", "start_time", "city"]
+
+def numeric_columns(level):
+    """Returns the measurement columns of a level ('daily' or 'yearly'), in variable_dict order."""
+    if level not in LEVELS:
+        raise ValueError(f"Invalid argument for 'level'. Valid arguments are: {', '.join(LEVELS)}.")
+    return [col for col in variable_dict if col in LEVELS[level] and col not in LABEL_COLUMNS]
+
+def query(level="daily", teams=None, years=None, columns=None, group_by=None, metrics="mean"):
+    """
+    Returns daily or yearly data for the selected teams, years and columns, reading only what the request needs.
+    Team/year predicates are applied to each source first, as lookups of the matching team-seasons' rows (see
+    partitions), and only the requested columns are carried through the weather join or the yearly averages.
+    For example, query('daily', 'BOS', 2016, ['tavg', 'attendance%']) reads about 80 game rows and one weather
+    array, whatever the size of the data. Results are memoized per request (see selection_cache).
+    Values are the same as in process_daily()/process_yearly() output.
+    Parameters:
+        level (str): 'daily' (one row per game, see process_daily) or 'yearly' (one row per team-season, see
+                        process_yearly).
+        teams (str or list): One or more team abbreviations. If None, all teams are selected.
+        years (int or list): One or more years. If None, all years are selected.
+        columns (list): Columns to return (see LEVELS). If None, every column of the level is returned. 'team' and
+                        'year' are always included.
+        group_by (str or list): Optional column(s) to aggregate the rows by, e.g. 'team'.
+        metrics (str or dict): Aggregation applied to the other columns when group_by is given: one function name
+                        for all of them (default 'mean') or a column -> function name dict.
+    Returns a pd.DataFrame with the requested columns in the level's column order (grouped by the group_by
+        columns, if given).
+    """
+    if level not in LEVELS:
+        raise ValueError(f"Invalid argument for 'level'. Valid arguments are: {', '.join(LEVELS)}.")
+    columns = list(LEVELS[level]) if columns is None else [columns] if isinstance(columns, str) else list(columns)
+    group_by = [] if group_by is None else [group_by] if isinstance(group_by, str) else list(group_by)
+    unknown = [col for col in columns + group_by + list(metrics if isinstance(metrics, dict) else [])
+               if col not in LEVELS[level]]
+    if unknown:
+        raise ValueError(f"Unknown {level} column(s): {', '.join(map(str, unknown))}. "
+                         f"Valid columns are: {', '.join(LEVELS[level])}.")
+
+    request = ("query", level, tuple(columns), tuple(group_by), repr(metrics))
+    return selection_cache.get(request, teams, years,
+                               lambda: run_query(level, teams, years, columns, group_by, metrics))
+
+def run_query(level, teams, years, columns, group_by, metrics):
+    """Computes a query() result without memoization."""
+    wanted = set(columns) | set(group_by) | set(metrics if isinstance(metrics, dict) else [])
+    if level == "daily":
+        df = query_daily(teams, years, wanted)
+    else:
+        df = query_yearly(teams, years, wanted)
+    if not group_by:
+        return df
+
+    with stage("group", rows_in=len(df)) as timing:
+        if isinstance(metrics, dict):
+            aggregates = metrics
+        else:
+            aggregates = {col: metrics for col in df.columns if col in columns and col not in group_by}
+        df = df.groupby(group_by, observed=True)[list(aggregates)].agg(aggregates).reset_index()
+        timing.rows_out = len(df)
+    return df
+
+def partitions(name):
+    """
+    Returns {(team, year): row positions} for the registry source 'name', built once per data version.
+    Selecting team-seasons through it only touches their own rows instead of scanning the whole source.
+    """
+    return registry.derived(f"partitions {name}",
+                            lambda reg: reg.get(name).groupby(KEYS, observed=True, sort=True).indices)
+
+def select_rows(name, teams, years, columns):
+    """
+    Returns the rows of the registry source 'name' for the selected teams and years, with only 'columns'.
+    Rows come in (team, year) order and keep their source order within each team-season.
+    """
+    index = partitions(name)
+    teams, years = canonical_selection(teams), canonical_selection(years)
+    keys = sorted(key for key in index
+                  if (teams is None or key[0] in teams) and (years is None or key[1] in years))
+    positions = np.concatenate([index[key] for key in keys]) if keys else np.array([], dtype=np.intp)
+
+    source = registry.get(name)
+    with stage("filter", rows_in=len(positions)) as timing:
+        df = source[list(dict.fromkeys(columns))].take(positions).reset_index(drop=True)
+        timing.rows_out = len(df)
+    return df
+
+def query_daily(teams, years, wanted):
+    """Daily rows (see query) for the selected teams/years, with the columns in 'wanted' and the keys."""
+    weather_columns = [col for col in WEATHER_VARIABLES if col in wanted]
+    game_columns = [col for col in DAILY_COLUMNS if col in wanted and col not in weather_columns + KEYS]
+    if weather_columns or 'date' in wanted:
+        game_columns.append('date') # Needed to find each game's weather
+    df = select_rows("games", teams, years, ['team'] + game_columns + ([] if 'date' in game_columns else ['year']))
+
+    with stage("merge", rows_in=len(df)) as timing:
+        # Same dtype as process_daily(), whose year comes from the game date
+        df['year'] = df['date'].dt.year if 'date' in df else df['year'].astype("int32")
+        if weather_columns:
+            arrays = weather_arrays()
+            codes = arrays.codes(df['team'], df['date'])
+            found = codes[0] >= 0
+            for col in weather_columns:
+                values = np.full(len(df), np.nan)
+                values[found] = arrays.values[col][tuple(axis[found] for axis in codes)]
+                df[col] = values
+        for col, decimals in DAILY_ROUNDING.items():
+            if col in df:
+                df[col] = df[col].round(decimals)
+        df = df[[col for col in DAILY_COLUMNS if col in wanted or col in KEYS]]
+        timing.rows_out = len(df)
+    return df
+
+def query_yearly(teams, years, wanted):
+    """Yearly rows (see query) for the selected teams/years, with the columns in 'wanted' and the keys."""
+    game_aggregates = {col: agg for col, agg in YEARLY_GAME_AGGREGATES.items() if col in wanted}
+    weather_columns = [col for col in ['tavg', 'prcp'] if col in wanted]
+    census_columns = [col for col in SOURCE_SCHEMAS["census"] if col in wanted and col not in KEYS + ['city']]
+
+    games = select_rows("games", teams, years, KEYS + (['date'] if 'win_pct' in game_aggregates else [])
+                        + list(game_aggregates))
+    with stage("merge", rows_in=len(games)) as timing:
+        if 'win_pct' in game_aggregates:
+            games = games.sort_values('date', kind='stable') # So 'last' is the last game of the season
+        df = games.groupby(KEYS, observed=True).agg(game_aggregates) if game_aggregates \
+            else games.groupby(KEYS, observed=True).size().to_frame("games")[[]]
+        df = df.reset_index()
+
+        if weather_columns:
+            weather = select_rows("weather", teams, years, KEYS + weather_columns)
+            df = df.merge(weather.groupby(KEYS, observed=True)[weather_columns].mean().reset_index(),
+                          on=KEYS, how='left')
+        if census_columns:
+            df = df.merge(select_rows("census", teams, years, KEYS + census_columns), on=KEYS, how='left')
+
+        for col, decimals in YEARLY_ROUNDING.items():
+            if col in df:
+                df[col] = df[col].round(decimals)
+        df = df[[col for col in YEARLY_COLUMNS if col in wanted or col in KEYS]]
+        timing.rows_out = len(df)
+    return df
+
+def correlate(level="yearly", teams=None, years=None, columns=None, methods=("pearson", "spearman")):
+    """
+    Returns the correlation matrices of the selected teams' and years' data, for every pair of columns at once.
+    The data is queried once (see query) and every matrix is computed from it (see stats.correlations).
+    Parameters:
+        level (str): 'yearly' (one row per team-season) or 'daily' (one row per game).
+        teams (str or list): One or more team abbreviations. If None, all teams are selected.
+        years (int or list): One or more years. If None, all years are selected.
+        columns (list): Columns to correlate. Defaults to every measurement of the level (see numeric_columns).
+        methods (str or list): 'pearson' and/or 'spearman'.
+    Returns a pd.DataFrame with one row per (method, variable) and one column per variable, so that
+        result.loc['spearman'] is the Spearman matrix.
+    """
+    columns = numeric_columns(level) if columns is None else list(columns)
+    df = query(level, teams, years, columns=columns)
+    with stage("correlate", rows_in=len(df)) as timing:
+        matrices = correlations(df, columns, methods)
+        timing.rows_out = len(matrices)
+    return matrices
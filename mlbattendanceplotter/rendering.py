@@ -0,0 +1,174 @@
+import io
+import os
+import base64
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
+# Plot functions that can be rendered in batches (all live in plotting.py)
+PLOT_FUNCTIONS = ("bar_attendance_by_time", "bar_by_team", "scatter_daily", "scatter_yearly", "scatter_3d",
+                  "line_trend", "correlation_heatmap", "bar_attendance_by_time_grid", "scatter_daily_grid")
+
+FORMATS = ("png", "svg", "html")
+
+# Data extracts that can be written or served like charts (see extract_frame)
+EXTRACTS = ("yearly", "daily", "grouped")
+
+DATA_FORMATS = ("csv", "json")
+
+def render_figure(fig, fmt="png"):
+    """
+    Renders a figure returned by a plotting function (with show=False) and returns the encoded bytes.
+    Parameters:
+        fig (matplotlib.figure.Figure or plotly.graph_objects.Figure): Figure to render.
+        fmt (str): Output format: 'png', 'svg' or 'html'. PNG/SVG output of 3D (plotly) figures requires the
+                    'kaleido' package.
+    Returns the rendered figure as bytes.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Invalid format '{fmt}'. Valid formats are: {', '.join(FORMATS)}.")
+
+    if hasattr(fig, "to_html"): # plotly figure
+        if fmt == "html":
+            return fig.to_html(include_plotlyjs="cdn").encode("utf-8")
+        try:
+            return fig.to_image(format=fmt)
+        except (ImportError, ValueError) as error:
+            raise ValueError(f"Rendering 3D plots as {fmt} requires the 'kaleido' package: {error}") from error
+
+    buffer = io.BytesIO()
+    if fmt == "html":
+        fig.savefig(buffer, format="png", bbox_inches="tight")
+        image = base64.b64encode(buffer.getvalue()).decode("ascii")
+        return f'<html><body><img src="data:image/png;base64,{image}"/></body></html>'.encode("utf-8")
+    fig.savefig(buffer, format=fmt, bbox_inches="tight")
+    return buffer.getvalue()
+
+def close_figure(fig):
+    """Releases a figure returned by a plotting function. Matplotlib figures are closed; plotly figures need nothing."""
+    if not hasattr(fig, "to_html"):
+        import matplotlib.pyplot as plt
+        plt.close(fig)
+
+def render_plot(plot, fmt="png", **kwargs):
+    """
+    Calls the plotting function named 'plot' with kwargs without displaying it, and returns the rendered bytes.
+    The figure is closed before returning, even if rendering fails.
+    """
+    if plot not in PLOT_FUNCTIONS:
+        raise ValueError(f"Invalid plot '{plot}'. Valid plots are: {', '.join(PLOT_FUNCTIONS)}.")
+    from . import plotting
+
+    fig = getattr(plotting, plot)(show=False, **kwargs)
+    if fig is None:
+        raise ValueError(f"{plot}() did not produce a figure for arguments {kwargs}.")
+    try:
+        return render_figure(fig, fmt)
+    finally:
+        close_figure(fig)
+
+def extract_frame(extract, team=None, year=None, **kwargs):
+    """
+    Returns the DataFrame of the data extract named 'extract' for the selected team(s) and year(s):
+        'yearly': process_yearly() output.
+        'daily': process_daily() output.
+        'grouped': the daily data grouped with group_attendance_by_time(), by kwargs 'by' (default 'month') and
+                    'attendance' (default 'attendance%').
+    """
+    if extract not in EXTRACTS:
+        raise ValueError(f"Invalid extract '{extract}'. Valid extracts are: {', '.join(EXTRACTS)}.")
+    from .processing import process_yearly, process_daily, group_attendance_by_time
+
+    if extract == "yearly":
+        return process_yearly(team=team, year=year, **kwargs)
+    if extract == "daily":
+        return process_daily(team=team, year=year, **kwargs)
+    return group_attendance_by_time(process_daily(team=team, year=year), kwargs.pop("by", "month"), **kwargs)
+
+def render_frame(df, fmt="csv"):
+    """Encodes a DataFrame as CSV or as JSON records ('fmt' = 'csv' or 'json') and returns the bytes."""
+    if fmt not in DATA_FORMATS:
+        raise ValueError(f"Invalid format '{fmt}'. Valid formats are: {', '.join(DATA_FORMATS)}.")
+    if fmt == "csv":
+        return df.to_csv(index=False).encode("utf-8")
+    return df.to_json(orient="records", date_format="iso").encode("utf-8")
+
+def render_extract(extract, fmt="csv", **kwargs):
+    """Returns the data extract named 'extract' (see extract_frame) for kwargs, encoded as 'fmt' (see render_frame)."""
+    return render_frame(extract_frame(extract, **kwargs), fmt)
+
+def normalize_job(job, index, fmt="png"):
+    """
+    Converts a plot spec into a dict with 'plot', 'kwargs', 'format' and 'name' keys.
+    A spec is either a dict with a 'plot' key (and optional 'kwargs', 'format', 'name') or a (plot, kwargs) tuple.
+    """
+    if isinstance(job, dict):
+        job = dict(job)
+    else:
+        plot, kwargs = job
+        job = {"plot": plot, "kwargs": kwargs}
+    job.setdefault("kwargs", {})
+    job.setdefault("format", fmt)
+    job.setdefault("name", f"{index:04d}_{job['plot']}.{job['format']}")
+    if job["plot"] not in PLOT_FUNCTIONS:
+        raise ValueError(f"Invalid plot '{job['plot']}'. Valid plots are: {', '.join(PLOT_FUNCTIONS)}.")
+    return job
+
+def render_job(job, out_dir):
+    """Renders one normalized job (see normalize_job) into out_dir and returns the output path."""
+    data = render_plot(job["plot"], fmt=job["format"], **job["kwargs"])
+    path = os.path.join(out_dir, job["name"])
+    with open(path, "wb") as file:
+        file.write(data)
+    return path
+
+def init_worker():
+    """Process pool initializer: selects the non-interactive Agg backend before any figure is created."""
+    import matplotlib
+    matplotlib.use("Agg")
+
+@contextlib.contextmanager
+def headless():
+    """
+    Context manager that renders with the Agg backend in the calling process. The previous backend is restored on
+    exit, and figures the caller has open are kept out of the switch (switching backends closes every open figure).
+    """
+    import matplotlib
+    import matplotlib.pyplot as plt
+    from matplotlib._pylab_helpers import Gcf
+    previous = matplotlib.get_backend()
+    if previous.lower() == "agg":
+        yield
+        return
+    figures = dict(Gcf.figs)
+    Gcf.figs.clear()
+    plt.switch_backend("agg")
+    try:
+        yield
+    finally:
+        plt.switch_backend(previous) # Closes the figures left open by the rendering, if any
+        Gcf.figs.update(figures)
+
+def render_batch(jobs, out_dir, workers=None, fmt="png"):
+    """
+    Renders many plots to files without displaying them, spreading the work across a process pool.
+    Parameters:
+        jobs (list): Plot specs. Each is a dict such as
+                        {'plot': 'bar_by_team', 'kwargs': {'y': 'prcp', 'year': 2012}, 'format': 'svg', 'name': 'prcp.svg'}
+                        ('kwargs', 'format' and 'name' are optional) or a ('bar_by_team', {'y': 'prcp'}) tuple.
+        out_dir (str): Directory the files are written to. Created if it does not exist.
+        workers (int): Number of worker processes. Defaults to the number of CPUs. With workers=1 the plots are
+                        rendered in the calling process, with the Agg backend (see headless).
+        fmt (str): Default output format ('png', 'svg' or 'html') for jobs that do not set one.
+    Returns a list with the output path of each job, in the same order as 'jobs'.
+    """
+    jobs = [normalize_job(job, index, fmt) for index, job in enumerate(jobs)]
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(jobs) <= 1:
+        with headless():
+            return [render_job(job, out_dir) for job in jobs]
+
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+        return list(executor.map(render_job, jobs, [out_dir] * len(jobs), chunksize=chunksize))
@@ -0,0 +1,328 @@
+"""
+Local HTTP service for charts and aggregates, so dashboards can query one warm process instead of starting Python,
+loading the data and rendering a figure for every request.
+
+Endpoints (GET, arguments as query string parameters):
+    /plot/<plot>        One of the plotting functions (see rendering.PLOT_FUNCTIONS), called with the remaining
+                        parameters. 'format' selects 'png' (default), 'svg' or 'html'.
+                        e.g. /plot/scatter_daily?x=tavg&y=attendance&team=BOS&year=2016&lobf=true
+    /data/yearly        process_yearly() output for 'team' and 'year'.
+    /data/daily         process_daily() output for 'team' and 'year'.
+    /data/grouped       group_attendance_by_time() of the daily data for 'team' and 'year', by 'by' ('start time',
+                        'weekday', 'month', 'year', or several separated by commas) and 'attendance'.
+                        Data endpoints return JSON records, or CSV with format=csv.
+    /metrics            Request count, errors and latency percentiles per endpoint, as JSON.
+    /health             'ok'.
+Several values can be given separated by commas (team=BOS,NYY); 'true', 'false' and 'none' are converted.
+Parameters the endpoint does not take (including the plotting functions' 'show' and 'cache') get a 400 response.
+
+Requests are handled concurrently by an asyncio server. Aggregates are computed in threads of the server process,
+which keeps the datasets and derived tables in memory. Charts are rendered by a bounded process pool whose workers
+attach the server's data from shared memory (see shared.publish) when they start, so there is one copy of the data
+however many workers run. Requests beyond 'max_pending' waiting charts get a 503 response.
+
+Example:
+    python -m mlbattendanceplotter.serve --port 8000 --workers 4
+"""
+import os
+import sys
+import json
+import time
+import signal
+import inspect
+import asyncio
+import argparse
+import functools
+import threading
+import multiprocessing
+from collections import deque
+from urllib.parse import urlsplit, parse_qsl
+from concurrent.futures import ProcessPoolExecutor
+
+from .processing import process_yearly, process_daily, attendance_cube, SHARED_ENV_VAR
+from .rendering import PLOT_FUNCTIONS, FORMATS, EXTRACTS, render_plot, extract_frame, render_frame, init_worker
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+    "html": "text/html; charset=utf-8",
+    "json": "application/json",
+    "csv": "text/csv; charset=utf-8",
+    "text": "text/plain; charset=utf-8",
+}
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+class RequestError(Exception):
+    """An error reported to the client with an HTTP status."""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class EndpointMetrics:
+    """
+    Per-endpoint request counts, errors and latencies. Percentiles are computed over the last 'window' requests
+    of each endpoint.
+    """
+    def __init__(self, window=1024):
+        self.window = window
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, status):
+        """Records one finished request."""
+        with self._lock:
+            entry = self._endpoints.setdefault(endpoint, {"count": 0, "errors": 0, "total": 0.0,
+                                                          "latencies": deque(maxlen=self.window)})
+            entry["count"] += 1
+            entry["errors"] += status >= 400
+            entry["total"] += seconds
+            entry["latencies"].append(seconds)
+
+    def snapshot(self):
+        """Returns {endpoint: {'count', 'errors', 'mean_ms', 'p50_ms', 'p95_ms', 'max_ms'}}."""
+        with self._lock:
+            entries = {endpoint: dict(entry, latencies=sorted(entry["latencies"]))
+                       for endpoint, entry in self._endpoints.items()}
+        report = {}
+        for endpoint, entry in sorted(entries.items()):
+            latencies = entry["latencies"]
+            percentile = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+            report[endpoint] = {
+                "count": entry["count"],
+                "errors": entry["errors"],
+                "mean_ms": round(entry["total"] / entry["count"] * 1000, 3),
+                "p50_ms": round(percentile(0.5), 3),
+                "p95_ms": round(percentile(0.95), 3),
+                "max_ms": round(latencies[-1] * 1000, 3),
+            }
+        return report
+
+# Query string parameters of the /data/ endpoints, besides 'format'
+EXTRACT_PARAMETERS = {
+    "yearly": ("team", "year"),
+    "daily": ("team", "year"),
+    "grouped": ("team", "year", "by", "attendance"),
+}
+
+@functools.lru_cache(maxsize=None)
+def plot_parameters(plot):
+    """Returns the parameters of plotting function 'plot' that can be given in a request (all but 'show' and 'cache')."""
+    from . import plotting
+    parameters = inspect.signature(inspect.unwrap(getattr(plotting, plot))).parameters
+    return tuple(name for name in parameters if name not in ("show", "cache"))
+
+def check_parameters(target, arguments, valid):
+    """Raises a 400 RequestError naming the request parameters that 'target' does not take."""
+    unknown = [name for name in arguments if name not in valid]
+    if unknown:
+        raise RequestError(400, f"Invalid parameter(s) for {target}: {', '.join(unknown)}. "
+                                f"Valid parameters are: {', '.join(valid + ('format',))}.")
+
+def parse_value(text):
+    """Converts a query string value: comma-separated lists, 'true'/'false', 'none', integers and floats."""
+    if "," in text:
+        return [parse_value(item) for item in text.split(",") if item != ""]
+    lowered = text.lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    if lowered in ("none", "null"):
+        return None
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
+
+def parse_arguments(query):
+    """Returns the query string as a dict of converted values (see parse_value)."""
+    return {key: parse_value(value) for key, value in parse_qsl(query, keep_blank_values=True)}
+
+def warm():
+    """Loads the datasets and builds the derived tables the endpoints use, so the first requests are fast."""
+    process_yearly()
+    process_daily()
+    attendance_cube()
+
+def init_render_worker():
+    """Process pool initializer: selects the Agg backend and loads the data and drawing libraries once per worker."""
+    init_worker()
+    import matplotlib.pyplot, seaborn # Otherwise imported by the first chart of each worker
+    warm()
+
+class ChartServer:
+    """
+    asyncio HTTP server for the endpoints listed in the module docstring.
+    Parameters:
+        host (str): Interface to listen on. Defaults to localhost only.
+        port (int): Port to listen on (0 picks a free port, see 'port' after start()).
+        workers (int): Number of chart rendering processes.
+        max_pending (int): Charts that can be rendering or waiting at once before requests are refused with a 503.
+                        Defaults to 4 per worker.
+        warm_data (bool): Load the data and derived tables when starting, in the server and in each worker.
+        share_data (bool): Publish the server's data and derived tables to shared memory (see shared.publish) so
+                        the workers attach them instead of each holding their own copy. Requires warm_data.
+    """
+    def __init__(self, host="127.0.0.1", port=8000, workers=2, max_pending=None, warm_data=True, share_data=True):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_pending = max_pending or 4 * workers
+        self.warm_data = warm_data
+        self.share_data = share_data and warm_data
+        self.shared = None # Directory of the published data
+        self._previous_shared = None
+        self.metrics = EndpointMetrics()
+        self.pending = 0 # Charts rendering or waiting for a worker
+        self._pool = None
+        self._server = None
+
+    async def start(self):
+        """Starts the worker pool and begins accepting connections."""
+        loop = asyncio.get_running_loop()
+        if self.warm_data:
+            await loop.run_in_executor(None, warm)
+        if self.share_data: # Workers inherit the environment variable and attach the data on first use
+            from .shared import publish
+            self.shared = await loop.run_in_executor(None, publish)
+            self._previous_shared = os.environ.get(SHARED_ENV_VAR)
+            os.environ[SHARED_ENV_VAR] = self.shared
+        # Workers are spawned rather than forked: forking a process whose threads may hold locks can deadlock them
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=init_render_worker if self.warm_data else init_worker)
+        if self.warm_data: # Start every worker now, so their data is loaded before the first chart request
+            await asyncio.gather(*[loop.run_in_executor(self._pool, time.perf_counter) for _ in range(self.workers)])
+        self._server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """Stops accepting connections and shuts the worker pool down."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+        if self.shared is not None:
+            from .shared import unpublish
+            unpublish(self.shared)
+            if self._previous_shared is None:
+                os.environ.pop(SHARED_ENV_VAR, None)
+            else:
+                os.environ[SHARED_ENV_VAR] = self._previous_shared
+            self.shared = None
+
+    async def serve_forever(self):
+        """Starts the server (if needed) and handles requests until cancelled."""
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def handle(self, reader, writer):
+        """Reads one HTTP request from the connection, answers it and closes the connection."""
+        start = time.perf_counter()
+        endpoint = "invalid"
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""): # Headers are not used
+                pass
+            if len(request_line) != 3:
+                raise RequestError(400, "Malformed request line.")
+            method, target, _ = request_line
+            url = urlsplit(target)
+            endpoint = url.path
+            if method != "GET":
+                raise RequestError(405, "Only GET requests are supported.")
+            status, content_type, body = 200, *await self.dispatch(url.path, parse_arguments(url.query))
+        except RequestError as error:
+            status, content_type, body = error.status, CONTENT_TYPES["text"], str(error).encode("utf-8")
+        except (ValueError, TypeError, KeyError) as error: # Invalid arguments for the called function
+            status, content_type, body = 400, CONTENT_TYPES["text"], str(error).encode("utf-8")
+        except Exception as error:
+            status, content_type, body = 500, CONTENT_TYPES["text"], repr(error).encode("utf-8")
+
+        header = (f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+                  f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+        try:
+            writer.write(header.encode("latin-1") + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+        self.metrics.record("unknown" if status == 404 else endpoint, time.perf_counter() - start, status)
+
+    async def dispatch(self, path, arguments):
+        """Runs the endpoint for 'path' with the parsed arguments and returns (content type, bytes)."""
+        loop = asyncio.get_running_loop()
+        if path == "/health":
+            return CONTENT_TYPES["text"], b"ok"
+        if path == "/metrics":
+            return CONTENT_TYPES["json"], json.dumps(self.metrics.snapshot()).encode("utf-8")
+        if path.startswith("/data/") and path[len("/data/"):] in EXTRACTS:
+            # Computed in a thread of this process, where the data and derived tables are kept in memory
+            fmt = arguments.pop("format", "json")
+            check_parameters(path, arguments, EXTRACT_PARAMETERS[path[len("/data/"):]])
+            df = await loop.run_in_executor(None, functools.partial(extract_frame, path[len("/data/"):], **arguments))
+            data = render_frame(df, fmt)
+            return CONTENT_TYPES[fmt], data
+        if path.startswith("/plot/"):
+            return await self.render(path[len("/plot/"):], arguments)
+        raise RequestError(404, f"Unknown endpoint '{path}'.")
+
+    async def render(self, plot, arguments):
+        """Renders a chart in the worker pool and returns (content type, bytes)."""
+        fmt = arguments.pop("format", "png")
+        if plot not in PLOT_FUNCTIONS:
+            raise RequestError(404, f"Invalid plot '{plot}'. Valid plots are: {', '.join(PLOT_FUNCTIONS)}.")
+        if fmt not in FORMATS:
+            raise ValueError(f"Invalid format '{fmt}'. Valid formats are: {', '.join(FORMATS)}.")
+        check_parameters(f"/plot/{plot}", arguments, plot_parameters(plot))
+        if self.pending >= self.max_pending:
+            raise RequestError(503, "Too many charts waiting to be rendered, try again later.")
+
+        self.pending += 1
+        try:
+            data = await asyncio.get_running_loop().run_in_executor(
+                self._pool, functools.partial(render_plot, plot, fmt, **arguments))
+        finally:
+            self.pending -= 1
+        return CONTENT_TYPES[fmt], data
+
+def serve(host="127.0.0.1", port=8000, workers=2, max_pending=None, share_data=True):
+    """Runs a ChartServer until interrupted (e.g. with Ctrl+C or SIGTERM)."""
+    server = ChartServer(host, port, workers, max_pending, share_data=share_data)
+
+    async def run():
+        try: # Stop cleanly on SIGTERM too, so the shared data is removed
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        except NotImplementedError: # Not available on Windows
+            pass
+        await server.start()
+        print(f"Serving on http://{server.host}:{server.port} with {workers} rendering worker(s)")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve charts and aggregates of the package data over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default: localhost only).")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on.")
+    parser.add_argument("--workers", type=int, default=2, help="Chart rendering processes.")
+    parser.add_argument("--max-pending", type=int, help="Charts waiting at once before requests get a 503 "
+                                                        "(default: 4 per worker).")
+    parser.add_argument("--no-share-data", action="store_true",
+                        help="Let every worker load its own copy of the data instead of attaching the server's.")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.workers, args.max_pending, share_data=not args.no_share_data)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""
+Publishes the registry's loaded sources and derived tables once as memory-mapped NumPy files, so that many worker
+processes can attach read-only, zero-copy views of them instead of each parsing the CSVs and rebuilding the tables.
+
+Every column is written as its own .npy file (categoricals as their integer codes), by default under /dev/shm, which
+is memory-backed. Attaching maps the files into the process: the operating system keeps one copy of the data in
+memory for all the processes that attached it. Only small parts are copied per process: category labels, index
+levels and non-categorical string columns, if any. The layout is described by a JSON file (never a pickle, so a file
+placed in the shared directory cannot run code in the processes that attach it).
+
+Example (publish from the parent, then start the workers):
+    path = publish()
+    os.environ[SHARED_ENV_VAR] = path # Workers attach on first use (see DatasetRegistry)
+    with ProcessPoolExecutor(...) as executor:
+        ...
+    unpublish(path)
+Or pass initializer=attach, initargs=(path,) to the pool instead of setting the environment variable.
+"""
+import os
+import json
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from .processing import registry, SHARED_ENV_VAR
+from .dense import SeasonArrays
+
+META_FILE = "meta.json"
+
+def default_directory(reg):
+    """Returns a directory named after this process and the data fingerprint, in /dev/shm if available."""
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, f"mlbattendanceplotter-{os.getpid()}-{reg.fingerprint()[:16]}")
+
+def publishable(value):
+    """Returns True for the table types publish() can write: DataFrames and SeasonArrays."""
+    return isinstance(value, (pd.DataFrame, SeasonArrays))
+
+def encode_index(index):
+    """Returns the values of a pd.Index as JSON-serializable strings with their dtype (see decode_index)."""
+    return {"dtype": str(index.dtype), "values": [str(value) for value in index]}
+
+def decode_index(encoded):
+    """Returns the pd.Index described by encode_index()."""
+    return pd.Index(encoded["values"], dtype="object").astype(encoded["dtype"])
+
+def write_array(directory, file, array):
+    """Saves one array as directory/file and returns the file name."""
+    np.save(os.path.join(directory, file), np.ascontiguousarray(array), allow_pickle=False)
+    return file
+
+def load_array(directory, file):
+    """Maps directory/file read-only into memory and returns it as a plain ndarray view (not an np.memmap)."""
+    return np.asarray(np.load(os.path.join(directory, file), mmap_mode="r"))
+
+def write_column(directory, prefix, series):
+    """Writes a column and returns its description for read_column()."""
+    values = series.array
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return {"kind": "category", "codes": write_array(directory, f"{prefix}.codes.npy", values.codes),
+                "categories": encode_index(series.cat.categories), "ordered": bool(series.cat.ordered)}
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in "biufcmM": # Numbers, booleans and dates
+        return {"kind": "array", "file": write_array(directory, f"{prefix}.npy", series.to_numpy())}
+    if hasattr(values, "_mask"): # Nullable integer, float or boolean column
+        return {"kind": "masked", "dtype": str(series.dtype),
+                "data": write_array(directory, f"{prefix}.data.npy", values._data),
+                "mask": write_array(directory, f"{prefix}.mask.npy", values._mask)}
+    # Anything else (e.g. strings) is stored as codes of its unique values and rebuilt in each process
+    codes, uniques = pd.factorize(series)
+    return {"kind": "factorized", "dtype": str(series.dtype), "uniques": encode_index(pd.Index(uniques)),
+            "codes": write_array(directory, f"{prefix}.codes.npy", codes)}
+
+def read_column(directory, column):
+    """Returns the column described by 'column' (see write_column), backed by memory-mapped files where possible."""
+    load = lambda file: load_array(directory, file)
+    if column["kind"] == "category":
+        return pd.Categorical.from_codes(load(column["codes"]), dtype=pd.CategoricalDtype(
+            decode_index(column["categories"]), column["ordered"]))
+    if column["kind"] == "array":
+        return load(column["file"])
+    if column["kind"] == "masked":
+        dtype = pd.api.types.pandas_dtype(column["dtype"])
+        return dtype.construct_array_type()(load(column["data"]), load(column["mask"]))
+    uniques = decode_index(column["uniques"])
+    return pd.array(uniques.take(load(column["codes"]), allow_fill=True), dtype=column["dtype"])
+
+def write_table(directory, prefix, value):
+    """Writes a DataFrame or SeasonArrays to files starting with 'prefix' and returns its description for read_table()."""
+    if isinstance(value, SeasonArrays):
+        return {"kind": "arrays", "teams": encode_index(value.teams), "years": encode_index(value.years),
+                "day_origin": int(value.day_origin),
+                "counts": write_array(directory, f"{prefix}.counts.npy", value.counts),
+                "values": {variable: write_array(directory, f"{prefix}.{index}.npy", array)
+                           for index, (variable, array) in enumerate(value.values.items())}}
+
+    index_names = [] if isinstance(value.index, pd.RangeIndex) and value.index.start == 0 and value.index.step == 1 \
+        else list(value.index.names)
+    df = value.reset_index() if index_names else value
+    return {"kind": "frame", "index": index_names, "columns": [
+        (col, write_column(directory, f"{prefix}.{position}", df[col])) for position, col in enumerate(df.columns)]}
+
+def read_table(directory, table):
+    """Returns the DataFrame or SeasonArrays described by 'table' (see write_table)."""
+    load = lambda file: load_array(directory, file)
+    if table["kind"] == "arrays":
+        return SeasonArrays(decode_index(table["teams"]), decode_index(table["years"]), table["day_origin"],
+                            {variable: load(file) for variable, file in table["values"].items()}, load(table["counts"]))
+    df = pd.DataFrame({col: read_column(directory, column) for col, column in table["columns"]}, copy=False)
+    return df.set_index(table["index"]) if table["index"] else df
+
+def publish(directory=None, reg=None, names=None):
+    """
+    Writes the registry's sources and derived tables to memory-mapped files that other processes can attach.
+    Parameters:
+        directory (str): Where the files are written. Defaults to a directory named after this process and the data
+                        fingerprint in /dev/shm (or the temporary directory). An earlier publication there is replaced.
+        reg (DatasetRegistry): Registry to publish. Defaults to the shared registry.
+        names (list): Sources and derived tables to publish. Defaults to every source (loading them if needed) and
+                        every derived table that is currently built (e.g. 'daily', 'yearly', 'cube' and the
+                        weather/attendance arrays, once they have been used).
+    Returns the directory, to pass to attach() or to set as MLBAP_SHARED_DATA.
+    """
+    reg = registry if reg is None else reg
+    directory = default_directory(reg) if directory is None else directory
+    reg.load()
+    with reg._lock:
+        tables = {name: reg.merged(reg._frames, name) for name in list(reg._frames)} # With appended rows merged in
+        tables.update((name, reg.merged(reg._derived, name)) for name in list(reg._derived))
+        tables = {name: value for name, value in tables.items() if publishable(value)}
+        signatures = {name: reg.signature(name) for name in reg.files}
+        unsaved = dict(reg._unsaved)
+    if names is not None:
+        tables = {name: tables[name] if name in tables else reg.get(name) for name in names}
+
+    tmp_directory = f"{directory}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    # Digests of the rows appended in memory only to the published sources (see DatasetRegistry.fingerprint)
+    meta = {"sources": signatures, "compact": reg.compact,
+            "unsaved": {name: digest for name, digest in unsaved.items() if name in tables},
+            "tables": {name: write_table(tmp_directory, f"{position:02d}", value)
+                       for position, (name, value) in enumerate(tables.items())}}
+    with open(os.path.join(tmp_directory, META_FILE), "w") as file:
+        json.dump(meta, file)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.rename(tmp_directory, directory)
+    return directory
+
+def attach(directory=None, reg=None):
+    """
+    Makes the tables published at 'directory' the registry's sources and derived tables, as read-only views of the
+    memory-mapped files. Writing to them in place raises an error; load_data() still returns writable copies.
+    Parameters:
+        directory (str): Directory returned by publish(). Defaults to the MLBAP_SHARED_DATA environment variable.
+        reg (DatasetRegistry): Registry to attach to. Defaults to the shared registry.
+    Raises a ValueError if the data was published from different source files than 'reg' reads (e.g. they have
+        changed since), since the tables would then be out of date.
+    Returns the names of the attached tables.
+    """
+    reg = registry if reg is None else reg
+    directory = directory or os.environ.get(SHARED_ENV_VAR)
+    if not directory:
+        raise ValueError(f"No shared data directory given and {SHARED_ENV_VAR} is not set.")
+    with open(os.path.join(directory, META_FILE)) as file:
+        meta = json.load(file)
+    for name, signature in meta["sources"].items():
+        if name not in reg.files or reg.signature(name) != tuple(signature):
+            raise ValueError(f"The data at {directory} was published from a different version of '{name}'.")
+    if meta["compact"] != reg.compact:
+        raise ValueError(f"The data at {directory} was published with compact={meta['compact']}.")
+
+    with reg._lock:
+        for name, table in meta["tables"].items():
+            reg.install(name, read_table(directory, table))
+            if name in reg.files: # Includes the rows appended in memory only, if any, as in the publishing process
+                if name in meta["unsaved"]:
+                    reg._unsaved[name] = meta["unsaved"][name]
+                else:
+                    reg._unsaved.pop(name, None)
+    return list(meta["tables"])
+
+def unpublish(directory):
+    """Deletes data written by publish(). Processes that attached it keep their mapping until they exit."""
+    shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,239 @@
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+def finite_rows(*arrays):
+    """Returns a boolean mask of the positions where every array holds a finite value."""
+    mask = np.ones(len(arrays[0]), dtype=bool)
+    for array in arrays:
+        if array is not None:
+            mask &= np.isfinite(np.asarray(array, dtype=float))
+    return mask
+
+def bin_2d(x, y, bins=40, values=None):
+    """
+    Bins points (x, y) into a regular 2D grid with one vectorized histogram pass.
+    Rows with a missing x, y (or value) are ignored.
+    Parameters:
+        x, y (array-like): Point coordinates.
+        bins (int): Number of cells along each axis.
+        values (array-like): Optional third variable. Its mean is computed for every cell.
+    Returns a tuple (counts, means, x_edges, y_edges). counts and means are (bins, bins) arrays indexed [x, y];
+        means is None when no values are given and NaN for empty cells.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    values = None if values is None else np.asarray(values, dtype=float)
+    mask = finite_rows(x, y, values)
+    x, y = x[mask], y[mask]
+
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins)
+    means = None
+    if values is not None:
+        sums, _, _ = np.histogram2d(x, y, bins=[x_edges, y_edges], weights=values[mask])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums / counts
+    return counts, means, x_edges, y_edges
+
+def bin_3d(x, y, z, bins=20, values=None):
+    """
+    Bins points (x, y, z) into a regular 3D voxel grid with one vectorized histogram pass.
+    Parameters:
+        x, y, z (array-like): Point coordinates.
+        bins (int): Number of voxels along each axis.
+        values (array-like): Optional fourth variable. Its mean is computed for every voxel.
+    Returns a pd.DataFrame with one row per non-empty voxel: its center ('x', 'y', 'z'), 'count' and, if values
+        were given, 'mean'.
+    """
+    points = np.column_stack([np.asarray(axis, dtype=float) for axis in (x, y, z)])
+    values = None if values is None else np.asarray(values, dtype=float)
+    mask = finite_rows(points[:, 0], points[:, 1], points[:, 2], values)
+    points = points[mask]
+
+    counts, edges = np.histogramdd(points, bins=bins)
+    occupied = np.nonzero(counts)
+    centers = [(axis_edges[:-1] + axis_edges[1:]) / 2 for axis_edges in edges]
+    voxels = pd.DataFrame({
+        "x": centers[0][occupied[0]],
+        "y": centers[1][occupied[1]],
+        "z": centers[2][occupied[2]],
+        "count": counts[occupied].astype(int),
+    })
+    if values is not None:
+        sums, _ = np.histogramdd(points, bins=edges, weights=values[mask])
+        voxels["mean"] = sums[occupied] / counts[occupied]
+    return voxels
+
+def stratified_sample(df, strata, max_points, seed=0):
+    """
+    Returns at most about max_points rows of df, keeping each stratum's share of the rows (e.g. one stratum per team,
+    so that small groups do not disappear). Rows are picked at random within each stratum, without a per-group loop.
+    Parameters:
+        df (pd.DataFrame): Rows to sample.
+        strata (str or list): Column(s) defining the strata.
+        max_points (int): Target number of rows.
+        seed (int): Random seed, so repeated renders draw the same points.
+    """
+    if max_points is None or len(df) <= max_points:
+        return df
+    fraction = max_points / len(df)
+    rng = np.random.default_rng(seed)
+    shuffled = df.iloc[rng.permutation(len(df))]
+    grouped = shuffled.groupby(strata, observed=True, sort=False)
+    quota = np.ceil(grouped[shuffled.columns[0]].transform("size").to_numpy() * fraction)
+    keep = grouped.cumcount().to_numpy() < quota
+    return shuffled[keep].sort_index()
+
+def t_quantile(q, df):
+    """
+    Returns the q-quantile of Student's t distribution for each value of df (array-like), without SciPy.
+    Exact for 1 and 2 degrees of freedom; otherwise uses the Cornish-Fisher expansion around the normal quantile
+    (Abramowitz & Stegun 26.7.5), which is within 0.2% of the exact value from 3 degrees of freedom up.
+    """
+    df = np.asarray(df, dtype=float)
+    z = NormalDist().inv_cdf(q)
+    g1 = (z ** 3 + z) / 4
+    g2 = (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96
+    g3 = (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384
+    g4 = (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = z + g1 / df + g2 / df ** 2 + g3 / df ** 3 + g4 / df ** 4
+        t = np.where(df == 1, np.tan(np.pi * (q - 0.5)), t)
+        t = np.where(df == 2, (2 * q - 1) / np.sqrt(2 * q * (1 - q)), t)
+    return np.where(df >= 1, t, np.nan)
+
+def fit_lines(x, y, groups=None, level=0.95):
+    """
+    Fits an ordinary least squares line y = intercept + slope * x for every group at once, in closed form.
+    All groups are fitted together with a few vectorized passes (np.bincount), so one line per team costs about the
+    same as a single line. Rows with a missing x or y are ignored.
+    Parameters:
+        x, y (array-like): Points to fit.
+        groups (array-like): Optional group label of every point (e.g. the 'team' column). By default, all points
+                        are fitted with one line, labelled 'all'.
+        level (float): Confidence level of the band computed by fit_band() (default 0.95).
+    Returns a pd.DataFrame indexed by group with columns 'n', 'slope', 'intercept', 'r2' and 'slope_stderr', plus
+        the summary statistics fit_band() needs ('x_mean', 'x_min', 'x_max', 'sxx', 'resid_std', 't').
+        Groups with fewer than 2 points get NaN coefficients; fewer than 3 points, a NaN band.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if groups is None:
+        groups = np.full(len(x), "all", dtype=object)
+    mask = finite_rows(x, y)
+    codes, labels = pd.factorize(np.asarray(groups)[mask], sort=True)
+    x, y = x[mask], y[mask]
+    size = len(labels)
+
+    n = np.bincount(codes, minlength=size).astype(float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = np.bincount(codes, x, size) / n
+        y_mean = np.bincount(codes, y, size) / n
+        dx, dy = x - x_mean[codes], y - y_mean[codes] # Centered, to avoid cancellation in the sums of squares
+        sxx = np.bincount(codes, dx * dx, size)
+        sxy = np.bincount(codes, dx * dy, size)
+        syy = np.bincount(codes, dy * dy, size)
+
+        slope = np.where(n >= 2, sxy / sxx, np.nan)
+        intercept = y_mean - slope * x_mean
+        ss_res = np.maximum(syy - slope * sxy, 0)
+        r2 = np.where(syy > 0, 1 - ss_res / syy, np.nan)
+        resid_std = np.where(n >= 3, np.sqrt(ss_res / (n - 2)), np.nan)
+        slope_stderr = resid_std / np.sqrt(sxx)
+
+    x_min = np.full(size, np.inf)
+    x_max = np.full(size, -np.inf)
+    np.minimum.at(x_min, codes, x)
+    np.maximum.at(x_max, codes, x)
+
+    return pd.DataFrame({
+        "n": n.astype(int),
+        "slope": slope,
+        "intercept": intercept,
+        "r2": r2,
+        "slope_stderr": slope_stderr,
+        "x_mean": x_mean,
+        "x_min": x_min,
+        "x_max": x_max,
+        "sxx": sxx,
+        "resid_std": resid_std,
+        "t": t_quantile((1 + level) / 2, n - 2),
+    }, index=pd.Index(labels, name="group"))
+
+def fit_band(fits, points=100):
+    """
+    Evaluates the lines from fit_lines() on a grid spanning each group's x range, with the analytic confidence band
+    of the fitted mean: y_hat ± t * resid_std * sqrt(1/n + (x - x_mean)² / sxx).
+    Returns a long pd.DataFrame with columns 'group', 'x', 'y', 'lower' and 'upper' ('points' rows per group).
+    """
+    steps = np.linspace(0, 1, points)
+    x_min, x_max = fits["x_min"].to_numpy()[:, None], fits["x_max"].to_numpy()[:, None]
+    grid = x_min + (x_max - x_min) * steps # One row per group
+
+    column = lambda name: fits[name].to_numpy()[:, None]
+    y_hat = column("intercept") + column("slope") * grid
+    with np.errstate(invalid="ignore", divide="ignore"):
+        half_width = column("t") * column("resid_std") * np.sqrt(
+            1 / column("n") + (grid - column("x_mean")) ** 2 / column("sxx"))
+    return pd.DataFrame({
+        "group": np.repeat(fits.index.to_numpy(), points),
+        "x": grid.ravel(),
+        "y": y_hat.ravel(),
+        "lower": (y_hat - half_width).ravel(),
+        "upper": (y_hat + half_width).ravel(),
+    })
+
+def group_starts(groups):
+    """
+    Returns, for each element of an array of group labels in which every group is contiguous (e.g. rows sorted by
+    team-season), the position of the first element of its group.
+    """
+    groups = np.asarray(groups)
+    first = np.ones(len(groups), dtype=bool)
+    first[1:] = groups[1:] != groups[:-1]
+    return np.maximum.accumulate(np.where(first, np.arange(len(groups)), 0))
+
+def rolling_mean(values, starts, window):
+    """
+    Returns the mean of each value and the (window - 1) values before it within its group, in one pass over
+    cumulative sums. Groups are given by 'starts' (see group_starts). Near the start of a group, fewer values are
+    averaged. Missing values are skipped; the mean is NaN if the whole window is missing.
+    """
+    values = np.asarray(values, dtype=float)
+    present = ~np.isnan(values)
+    sums = np.concatenate([[0.0], np.cumsum(np.where(present, values, 0.0))])
+    counts = np.concatenate([[0], np.cumsum(present)])
+    end = np.arange(1, len(values) + 1)
+    begin = np.maximum(end - window, starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (sums[end] - sums[begin]) / (counts[end] - counts[begin])
+
+def lagged_difference(values, starts, lag):
+    """
+    Returns each value minus the value 'lag' positions earlier within its group (see group_starts), or NaN for the
+    first 'lag' values of a group.
+    """
+    values = np.asarray(values, dtype=float)
+    earlier = np.arange(len(values)) - lag
+    valid = earlier >= starts
+    result = np.full(len(values), np.nan)
+    result[valid] = values[valid] - values[earlier[valid]]
+    return result
+
+def correlations(df, columns=None, methods=("pearson", "spearman")):
+    """
+    Computes the correlation matrix of the numeric columns of df for one or more methods. Each matrix covers every
+    pair of columns in one call (pd.DataFrame.corr), using the rows where both columns are present.
+    Parameters:
+        df (pd.DataFrame): Data, e.g. process_yearly() output.
+        columns (list): Columns to correlate. Defaults to every numeric column.
+        methods (str or list): 'pearson' and/or 'spearman' (Pearson correlation of the ranks).
+    Returns a pd.DataFrame with one row per (method, variable) and one column per variable, so that
+        result.loc['pearson'] is the Pearson matrix.
+    """
+    methods = [methods] if isinstance(methods, str) else list(methods)
+    if not methods or any(method not in ("pearson", "spearman") for method in methods):
+        raise ValueError("Invalid argument for 'methods'. Valid arguments are 'pearson', 'spearman'.")
+    if columns is None:
+        columns = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
+    values = df[list(columns)].astype(float)
+    return pd.concat([values.corr(method=method) for method in methods], keys=methods, names=["method", "variable"])
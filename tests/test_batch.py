@@ -0,0 +1,68 @@
+import json
+import matplotlib
+matplotlib.use("Agg")
+import pytest
+from mlbattendanceplotter.batch import run_batch, normalize_jobs, shared_work
+
+SPEC = {
+    "charts": [
+        {"plot": "bar_by_team", "kwargs": {"y": "prcp", "year": 2012}, "name": "prcp.png"},
+        {"plot": "bar_by_team", "kwargs": {"y": "prcp", "year": 2012, "show": False}, "name": "prcp_copy.png"},
+        {"plot": "scatter_daily", "kwargs": {"x": "tavg", "y": "attendance", "team": "BOS", "year": 2016},
+         "format": "svg"},
+    ],
+    "extracts": [
+        {"extract": "grouped", "kwargs": {"by": "weekday", "team": "BOS", "year": 2016}, "format": "json"},
+        {"extract": "yearly", "kwargs": {"team": "BOS", "not_an_argument": 1}},
+    ],
+}
+
+### run_batch() tests ###
+def test_run_batch(tmp_path):
+    manifest = run_batch(SPEC, str(tmp_path), workers=2)
+    assert (manifest["jobs"], manifest["distinct_jobs"], manifest["groups"], manifest["failed"]) == (5, 4, 3, 1)
+    outputs = {entry["name"]: entry for entry in manifest["outputs"]}
+    assert list(outputs) == ["prcp.png", "prcp_copy.png", "0002_scatter_daily.svg", "0000_grouped.json",
+                             "0001_yearly.csv"]
+    assert outputs["prcp_copy.png"]["duplicate_of"] == "prcp.png"
+    assert (tmp_path / "prcp_copy.png").read_bytes() == (tmp_path / "prcp.png").read_bytes()
+    # The daily chart and extract for BOS 2016 share one selection, so they run in the same worker
+    assert outputs["0002_scatter_daily.svg"]["group"] == outputs["0000_grouped.json"]["group"]
+    assert len(json.loads((tmp_path / "0000_grouped.json").read_text())) == 7
+    assert "not_an_argument" in outputs["0001_yearly.csv"]["error"]
+    assert json.loads((tmp_path / "manifest.json").read_text())["outputs"][0]["bytes"] > 0
+
+def test_run_batch_in_process_is_headless(tmp_path, monkeypatch):
+    from mlbattendanceplotter import batch
+    backends = []
+    render_plot = batch.render_plot
+    monkeypatch.setattr(batch, "render_plot", lambda *args, **kwargs: (backends.append(matplotlib.get_backend()),
+                                                                       render_plot(*args, **kwargs))[1])
+    matplotlib.use("pdf") # Any backend other than Agg
+    try:
+        manifest = run_batch({"charts": [{"plot": "bar_by_team", "kwargs": {"y": "prcp", "year": 2012},
+                                          "name": "prcp.png"}]}, str(tmp_path), workers=1)
+        assert (manifest["jobs"], manifest["failed"]) == (1, 0) # One chart rendered
+        assert (tmp_path / "prcp.png").read_bytes().startswith(b"\x89PNG")
+        assert backends == ["agg"] and matplotlib.get_backend() == "pdf" # The caller's backend is restored
+    finally:
+        matplotlib.use("Agg")
+
+def test_invalid_jobs():
+    with pytest.raises(ValueError, match="'charts' and/or 'extracts'"):
+        normalize_jobs({"jobs": [{"plot": "bar_by_team"}]}) # Unknown top-level key
+    with pytest.raises(ValueError, match="'charts' and/or 'extracts'"):
+        run_batch({"chart": [{"plot": "bar_by_team"}]}, "unused")
+    with pytest.raises(ValueError):
+        normalize_jobs({"charts": [{"plot": "not_a_plot"}]})
+    with pytest.raises(ValueError):
+        normalize_jobs({"charts": [{"plot": "bar_by_team", "kwargs": {"z": 1}}]})
+    with pytest.raises(ValueError):
+        normalize_jobs({"extracts": [{"extract": "daily", "format": "png"}]})
+    with pytest.raises(ValueError):
+        normalize_jobs({"extracts": [{"extract": "daily", "name": "a.csv"}, {"extract": "yearly", "name": "a.csv"}]})
+
+def test_shared_work():
+    jobs = normalize_jobs({"charts": [{"plot": "scatter_3d", "kwargs": {"time": "yearly", "team": ["NYY", "BOS"]}}],
+                           "extracts": [{"extract": "yearly", "kwargs": {"team": ["BOS", "NYY"]}}]})
+    assert shared_work(jobs[0]) == shared_work(jobs[1]) == ("yearly", ("BOS", "NYY"), None)
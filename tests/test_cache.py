@@ -0,0 +1,41 @@
+import matplotlib
+matplotlib.use("Agg")
+import pytest
+from mlbattendanceplotter import rendering
+from mlbattendanceplotter.cache import ChartCache
+from mlbattendanceplotter.plotting import bar_by_team
+
+### ChartCache tests ###
+def test_chart_cache_hit_skips_rendering(tmp_path, monkeypatch):
+    cache = ChartCache(str(tmp_path))
+    data = bar_by_team("prcp", 2012, cache=cache)
+    assert data.startswith(b"\x89PNG")
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Chart should have been served from the cache")
+    monkeypatch.setattr(rendering, "render_plot", fail)
+    assert bar_by_team(y="prcp", year=2012, cache=cache) == data # Same arguments, passed by keyword
+    assert cache.hits == 1
+
+def test_chart_cache_key_depends_on_arguments(tmp_path):
+    cache = ChartCache(str(tmp_path), fmt="svg")
+    assert cache.key("bar_by_team", ("prcp",)) == cache.key("bar_by_team", (), {"y": "prcp", "year": None})
+    assert cache.key("bar_by_team", ("prcp",)) != cache.key("bar_by_team", ("tavg",))
+    assert cache.key("bar_by_team", ("prcp",)) != ChartCache(str(tmp_path)).key("bar_by_team", ("prcp",))
+
+def test_chart_cache_key_depends_on_compact_mode(tmp_path, monkeypatch):
+    from mlbattendanceplotter.processing import registry
+    cache = ChartCache(str(tmp_path))
+    key = cache.key("bar_by_team", ("prcp",))
+    monkeypatch.setattr(registry, "compact", not registry.compact)
+    assert cache.key("bar_by_team", ("prcp",)) != key
+
+def test_chart_cache_evicts_least_recently_used(tmp_path):
+    cache = ChartCache(str(tmp_path), max_bytes=10)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    cache.get("a") # 'a' becomes the most recently used chart
+    cache.put("c", b"12345")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"12345" and cache.get("c") == b"12345"
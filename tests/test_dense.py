@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+from mlbattendanceplotter.dense import SeasonArrays
+from mlbattendanceplotter.processing import registry, weather_arrays, attendance_arrays
+
+WEATHER = pd.DataFrame({
+    "team": ["BOS", "BOS", "NYY", "BOS"],
+    "date": pd.to_datetime(["2012-04-01", "2012-04-03", "2012-04-02", "2013-04-01"]),
+    "tavg": [50.0, np.nan, 60.0, 55.0],
+})
+
+### SeasonArrays tests ###
+def test_from_frame_shape_and_mask():
+    arrays = SeasonArrays.from_frame(WEATHER, ["tavg"])
+    assert list(arrays.teams) == ["BOS", "NYY"] and list(arrays.years) == [2012, 2013]
+    assert arrays.values["tavg"].shape == (2, 2, 4) # Days of the year 91 (April 1st, 2013) - 94 (April 3rd, 2012)
+    assert arrays.observed.sum() == 4
+    assert np.isnan(arrays.value("tavg", "BOS", "2012-04-03")) # Row present, reading missing
+    assert np.isnan(arrays.value("tavg", "NYY", "2012-04-01")) # No row
+    assert np.isnan(arrays.value("tavg", "TOR", "2012-04-01")) # Unknown team
+    assert arrays.value("tavg", "NYY", "2012-04-02") == 60.0
+
+def test_lookup_and_select():
+    arrays = SeasonArrays.from_frame(WEATHER, ["tavg"])
+    teams = pd.Series(["NYY", "BOS", "TOR"], dtype="category")
+    values = arrays.lookup("tavg", teams, pd.to_datetime(["2012-04-02", "2012-04-01", "2012-04-01"]))
+    assert np.allclose(values, [60.0, 50.0, np.nan], equal_nan=True)
+    assert arrays.select("tavg", team="BOS", year=[2013, 2020]).shape == (1, 1, 4)
+
+def test_add_rows_matches_from_frame():
+    new_rows = pd.DataFrame({"team": ["TOR", "BOS"], "date": pd.to_datetime(["2014-03-30", "2012-05-01"]),
+                             "tavg": [40.0, 65.0]})
+    arrays = SeasonArrays.from_frame(WEATHER, ["tavg"])
+    added = arrays.add_rows(new_rows)
+    expected = SeasonArrays.from_frame(pd.concat([WEATHER, new_rows]), ["tavg"])
+    assert list(added.teams) == ["BOS", "NYY", "TOR"] and list(added.years) == [2012, 2013, 2014]
+    assert added.day_origin == expected.day_origin and np.array_equal(added.counts, expected.counts)
+    assert np.array_equal(added.values["tavg"], expected.values["tavg"], equal_nan=True)
+    assert arrays.values["tavg"].shape == (2, 2, 4) # Unchanged
+
+def test_doubleheaders_are_averaged():
+    games = pd.DataFrame({"team": ["BOS", "BOS"], "date": pd.to_datetime(["2012-05-01"] * 2),
+                          "attendance": [30000.0, 20000.0]})
+    arrays = SeasonArrays.from_frame(games, ["attendance"])
+    assert arrays.value("attendance", "BOS", "2012-05-01") == 25000.0
+    assert arrays.counts.max() == 2
+
+def test_round_trip_matches_source():
+    weather = registry.get("weather")
+    frame = weather_arrays().to_frame(team="BOS", year=2016)
+    source = weather[(weather["team"] == "BOS") & (weather["year"] == 2016)].reset_index(drop=True)
+    assert len(frame) == len(source)
+    assert (frame["date"].to_numpy() == source["date"].to_numpy()).all()
+    assert np.allclose(frame["tavg"], source["tavg"], equal_nan=True)
+    assert attendance_arrays().observed.sum() <= len(registry.get("games"))
@@ -0,0 +1,37 @@
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def imported_state(code):
+    """Runs 'code' in a fresh interpreter and returns which heavy modules it imported and whether data was read."""
+    script = code + """
+import sys, json
+state = {name: name in sys.modules for name in ["pandas", "matplotlib.pyplot", "seaborn", "plotly.express"]}
+processing = sys.modules.get("mlbattendanceplotter.processing")
+state["data_read"] = bool(processing and (processing.registry._frames or processing.registry._derived))
+print(json.dumps(state))
+"""
+    output = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout)
+
+### Import tests ###
+def test_package_import_is_lazy():
+    state = imported_state("import mlbattendanceplotter")
+    assert not any(state.values())
+
+def test_plotting_import_defers_drawing_libraries():
+    state = imported_state("import mlbattendanceplotter\nmlbattendanceplotter.plotting.scatter_daily")
+    assert state == {"pandas": True, "matplotlib.pyplot": False, "seaborn": False, "plotly.express": False,
+                     "data_read": False}
+
+def test_lazy_attributes():
+    import mlbattendanceplotter
+    assert mlbattendanceplotter.processing.__name__ == "mlbattendanceplotter.processing"
+    assert "plotting" in dir(mlbattendanceplotter)
+    with pytest.raises(AttributeError):
+        mlbattendanceplotter.not_a_module
@@ -0,0 +1,90 @@
+import pandas as pd
+import pytest
+from mlbattendanceplotter.ingest import Fetcher, CsvFetcher, fetch_partitions, partition_path, clean_games, \
+    clean_weather, ingest
+from mlbattendanceplotter.processing import DatasetRegistry
+
+STADIUMS = pd.DataFrame({"year": [2012, 2012], "team": ["BOS", "NYY"], "capacity": [40000, 50000],
+                         "payroll_est": [1, 2]})
+
+def raw_schedule(team, opp, home):
+    return pd.DataFrame({
+        "Date": ["Friday, Apr 6", "Saturday, Apr 7 (1)", "Sunday, Apr 8"],
+        "Home_Away": ["Home" if home else "@"] * 3,
+        "Opp": [opp] * 3,
+        "W-L": ["1-0", "1-1", "2-1"] if home else ["0-1", "1-1", "1-2"],
+        "D/N": ["D", "N", "N"],
+        "Attendance": [45000.0, 30000.0, 2000.0],
+        "cLI": [1.0, 1.1, 1.2],
+    })
+
+### Fetching tests ###
+class FlakyFetcher(Fetcher):
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def fetch(self, team, year):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("temporary failure")
+        return pd.DataFrame({"team_year": [f"{team}{year}"]})
+
+def test_fetcher_requires_fetch():
+    class Incomplete(Fetcher):
+        pass
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_fetch_partitions_retries_and_skips_existing(tmp_path):
+    fetcher = FlakyFetcher(failures=1)
+    report = fetch_partitions({"games": fetcher}, teams=["BOS"], years=[2012], raw_dir=str(tmp_path), backoff=0)
+    assert report["games"]["fetched"] == [("BOS", 2012)] and fetcher.calls == 2
+    assert pd.read_csv(partition_path(str(tmp_path), "games", "BOS", 2012))["team_year"][0] == "BOS2012"
+
+    report = fetch_partitions({"games": fetcher}, teams=["BOS", "NYY"], years=[2012], raw_dir=str(tmp_path))
+    assert report["games"]["skipped"] == [("BOS", 2012)] # Only the missing partition is fetched
+    assert report["games"]["fetched"] == [("NYY", 2012)] and fetcher.calls == 3
+
+def test_fetch_partitions_reports_failures(tmp_path):
+    report = fetch_partitions({"games": FlakyFetcher(failures=10)}, teams=["BOS"], years=[2012],
+                              raw_dir=str(tmp_path), retries=2, backoff=0)
+    assert list(report["games"]["failed"]) == [("BOS", 2012)]
+    assert "ConnectionError" in report["games"]["failed"][("BOS", 2012)]
+
+### Cleaning tests ###
+def test_clean_games():
+    raw = pd.concat([raw_schedule("BOS", "NYY", home=True).assign(team="BOS", year=2012),
+                     raw_schedule("NYY", "BOS", home=False).assign(team="NYY", year=2012)])
+    games = clean_games(raw, STADIUMS)
+    assert list(games["team"]) == ["BOS", "BOS"] # Away rows and the 2,000 fan game are dropped
+    assert list(games["date"]) == list(pd.to_datetime(["2012-04-06", "2012-04-07"]))
+    assert list(games["win_pct"]) == [1.0, 0.5]
+    assert list(games["opp_win_pct"]) == [0.0, 0.5]
+    assert list(games["attendance%"]) == [100.0, 75.0] # Capped at full capacity
+    assert list(games["num_home_game"]) == [1, 2]
+    assert list(games["start_time"]) == ["Day", "Night"]
+
+def test_ingest_from_fixtures(tmp_path):
+    fixtures, raw_dir, out_dir = tmp_path / "fixtures", tmp_path / "raw", tmp_path / "out"
+    (fixtures / "games").mkdir(parents=True)
+    (fixtures / "weather").mkdir()
+    raw_schedule("BOS", "NYY", home=True).to_csv(fixtures / "games" / "BOS_2012.csv", index=False)
+    pd.DataFrame({"date": ["2012-04-06", "2012-04-07"], "tavg": [10.0, 20.0], "tmin": [5.0, 15.0],
+                  "tmax": [15.0, 25.0], "prcp": [0.0, 25.4]}).to_csv(fixtures / "weather" / "BOS_2012.csv", index=False)
+    stadium_path = tmp_path / "stadium_data.csv"
+    STADIUMS.rename(columns=str.title).to_csv(stadium_path, index=False)
+
+    fetchers = {source: CsvFetcher(str(fixtures / source / "{team}_{year}.csv"), teams=["BOS"])
+                for source in ["games", "weather"]}
+    report = ingest(fetchers, years=[2012], raw_dir=str(raw_dir), out_dir=str(out_dir), stadium_path=str(stadium_path))
+    assert report["games"]["rows"] == 2 and report["weather"]["rows"] == 2
+
+    registry = DatasetRegistry(directory=str(out_dir))
+    weather = registry.get("weather")
+    assert list(weather["tavg"]) == [50.0, 68.0]
+    assert abs(weather["prcp"][1] - 1.0) < 1e-6
+    assert len(registry.get("games")) == 2
+
+    report = ingest(fetchers, years=[2012], raw_dir=str(raw_dir), out_dir=str(out_dir), stadium_path=str(stadium_path))
+    assert report["games"]["fetched"] == [] and report["games"]["skipped"] == [("BOS", 2012)]
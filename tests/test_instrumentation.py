@@ -0,0 +1,32 @@
+import matplotlib
+matplotlib.use("Agg")
+from mlbattendanceplotter import instrumentation
+from mlbattendanceplotter.instrumentation import profile, stage, format_report, add_sink, remove_sink, NULL_STAGE
+from mlbattendanceplotter.plotting import scatter_daily
+
+### profile() tests ###
+def test_profile_records_stages():
+    with profile() as records:
+        scatter_daily(x="tavg", y="attendance", team="NYY", year=2012, show=False)
+    assert [record["name"] for record in records] == ["scatter_daily"]
+
+    stages = {child["name"]: child for child in records[0]["stages"]}
+    assert "render" in stages
+    assert stages["render"]["wall_time"] > 0 and stages["render"]["peak_memory"] is not None
+    assert "scatter_daily" in format_report(records[0])
+
+def test_sink_receives_records():
+    received = []
+    add_sink(received.append)
+    try:
+        with profile():
+            with stage("custom", rows_in=10) as timing:
+                timing.rows_out = 5
+    finally:
+        remove_sink(received.append)
+    assert received[0]["name"] == "custom"
+    assert (received[0]["rows_in"], received[0]["rows_out"]) == (10, 5)
+
+def test_disabled_by_default():
+    assert not instrumentation.enabled()
+    assert stage("load") is NULL_STAGE
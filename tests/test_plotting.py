@@ -1,5 +1,6 @@
 import pytest
-from mlbattendanceplotter.plotting import bar_attendance_by_time, bar_by_team, scatter_daily, scatter_yearly, scatter_3d
+from mlbattendanceplotter.plotting import bar_attendance_by_time, bar_by_team, scatter_daily, scatter_yearly, scatter_3d, \
+    line_trend, correlation_heatmap, bar_attendance_by_time_grid, scatter_daily_grid
 
 ### bar_attendance_by_time() tests ###
 def test_bar_attendance_by_time_invalid_arguments():
@@ -52,3 +53,38 @@ def test_scatter_3d_invalid_arguments():
         scatter_3d(x="win_pct", y="payroll_est", z="attendance%", year = 2020, time="yearly") # Invalid year
     with pytest.raises(ValueError):
         scatter_3d(x="win_pct", y="payroll_est", z="attendance%", time="yearly", team="Red Sox") # Invalid team
+
+### line_trend() tests ###
+def test_line_trend():
+    with pytest.raises(ValueError):
+        line_trend(y = "attendance") # Invalid y, not a trend series
+    with pytest.raises(ValueError):
+        line_trend(team = "Red Sox") # Invalid team
+    fig = line_trend(y = "attendance_yoy", team = "BOS", year = [2018, 2019], show = False)
+    assert len(fig.axes[0].lines) == 3 # One line per season and the zero line
+
+### correlation_heatmap() tests ###
+def test_correlation_heatmap():
+    with pytest.raises(ValueError):
+        correlation_heatmap(variables = ["tavg", "population"], time = "daily") # Census data is yearly only
+    with pytest.raises(ValueError):
+        correlation_heatmap(method = "kendall") # Invalid method
+    fig = correlation_heatmap(variables = ["tavg", "attendance%", "win_pct"], year = 2019, pair_grid = True, show = False)
+    assert len(fig.axes) == 9
+
+### Faceted grid tests ###
+def test_bar_attendance_by_time_grid():
+    with pytest.raises(ValueError):
+        bar_attendance_by_time_grid(facet = "month") # Invalid facet
+    fig = bar_attendance_by_time_grid(by = "weekday", team = ["BOS", "NYY", "TBR"], year = 2019, cols = 2, show = False)
+    assert sum(ax.get_visible() for ax in fig.axes) == 3 # One panel per team, the fourth is hidden
+    fig = bar_attendance_by_time_grid(by = "month", team = "BOS", year = [2013, 2019], facet = "year", show = False)
+    league_2013, league_2019 = (ax.lines[0].get_ydata() for ax in fig.axes[:2])
+    assert list(league_2013) != list(league_2019) # Each season is compared with that season's league average
+
+def test_scatter_daily_grid():
+    with pytest.raises(ValueError):
+        scatter_daily_grid(x = "win_pct", y = "attendance", facet = "weekday") # Invalid facet
+    fig = scatter_daily_grid(x = "win_pct", y = "attendance", team = "NYY", year = [2018, 2019], facet = "year",
+                             lobf = True, show = False)
+    assert sum(ax.get_visible() for ax in fig.axes) == 2
@@ -1,5 +1,11 @@
+import numpy as np
 import pytest
-from mlbattendanceplotter.processing import load_data, process_yearly, process_daily, group_attendance_by_time
+from mlbattendanceplotter import processing
+from mlbattendanceplotter.processing import load_data, process_yearly, process_daily, group_attendance_by_time, \
+    registry, DatasetRegistry, SOURCE_SCHEMAS, read_source, columnar_engine, attendance_cube, rollup_attendance, \
+    selection_cache, SelectionCache, stream_yearly, compact_frame, memory_report, parse_bytes, \
+    append_games, append_weather, build_daily_table, build_yearly_table, build_attendance_cube, \
+    process_trends, facet_attendance
 
 ### load_data() test ###
 def test_load_data():
@@ -27,3 +33,267 @@ def test_process_daily():
     test_cols = ['team', 'year', 'win_pct', 'tavg']
     missing_cols = [each for each in test_cols if each not in daily_df.columns]
     assert not missing_cols  # AssertionError if test_cols aren't in daily_df.columns
+
+### DatasetRegistry tests ###
+def test_registry_memoizes_sources():
+    games = registry.get("games")
+    assert registry.get("games") is games # Second access is served from memory
+
+def test_registry_reloads_changed_file(tmp_path):
+    (tmp_path / "bref.csv").write_text("team,year\nBOS,2012\n")
+    local_registry = DatasetRegistry(directory=str(tmp_path), files={"games": "bref.csv"})
+    games = local_registry.get("games")
+    assert len(games) == 1
+
+    (tmp_path / "bref.csv").write_text("team,year\nBOS,2012\nNYY,2012\n") # Size change triggers a reload
+    assert len(local_registry.get("games")) == 2
+
+    reloaded = local_registry.get("games")
+    local_registry.invalidate("games")
+    assert local_registry.get("games") is not reloaded
+
+### Columnar cache tests ###
+def test_read_source_applies_schema_and_builds_cache(tmp_path):
+    csv_path = tmp_path / "bref.csv"
+    csv_path.write_text("date,year,team,attendance\n2012-04-06,2012,ARI,49130.0\n")
+    schema = SOURCE_SCHEMAS["games"]
+
+    df = read_source(str(csv_path), schema)
+    assert str(df['date'].dtype).startswith("datetime64")
+    assert df['team'].dtype == "category"
+    assert df['attendance'].dtype == "int32"
+    if columnar_engine() is not None:
+        assert (tmp_path / "bref.parquet").exists()
+        cached = read_source(str(csv_path), schema) # Served from the Parquet copy
+        assert cached['team'].dtype == "category" and cached['attendance'].iloc[0] == 49130
+
+def test_read_source_rebuilds_cache_when_csv_is_replaced_by_an_older_file(tmp_path):
+    import os
+    if columnar_engine() is None:
+        pytest.skip("No Parquet engine installed")
+    csv_path = tmp_path / "bref.csv"
+    csv_path.write_text("date,year,team,attendance\n2012-04-06,2012,ARI,49130.0\n")
+    read_source(str(csv_path), SOURCE_SCHEMAS["games"]) # Builds the Parquet copy
+    csv_path.write_text("date,year,team,attendance\n2012-04-06,2012,BOS,37016.0\n")
+    stat = os.stat(tmp_path / "bref.parquet")
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10**9)) # e.g. restored with 'cp -p' or 'rsync -t'
+    assert read_source(str(csv_path), SOURCE_SCHEMAS["games"])['attendance'].tolist() == [37016]
+
+def test_read_source_without_engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(processing, "columnar_engine", lambda: None)
+    csv_path = tmp_path / "weather.csv"
+    csv_path.write_text("team,year,date,tavg\nBOS,2012,2012-04-06,50.1\n")
+    df = read_source(str(csv_path), SOURCE_SCHEMAS["weather"])
+    assert df['year'].dtype == "int16"
+    assert not (tmp_path / "weather.parquet").exists()
+
+### Daily fact table tests ###
+def test_process_daily_matches_explicit_merge():
+    games, weather, census = load_data()
+    expected = process_daily(games, weather, team=["NYY", "BOS"], year=2016)
+    daily_df = process_daily(team=["BOS", "NYY"], year=[2016]) # Served from the registry's fact table
+    assert list(daily_df.columns) == list(expected.columns)
+    assert daily_df['attendance'].tolist() == expected['attendance'].tolist()
+    assert set(daily_df['team']) == {"BOS", "NYY"}
+    assert (daily_df['year'] == 2016).all()
+
+def test_process_daily_unknown_selection_is_empty():
+    assert process_daily(team="Red Sox").empty
+
+### group_attendance_by_time() tests ###
+def test_group_attendance_by_time_does_not_mutate():
+    daily_df = process_daily(team="BOS", year=2016)
+    columns = list(daily_df.columns)
+    for by in ["start time", "weekday", "month", "year"]:
+        group_attendance_by_time(daily_df, by)
+    assert list(daily_df.columns) == columns
+
+def test_group_attendance_by_time_multiple_dimensions():
+    daily_df = process_daily(team="BOS", year=2016)
+    time_df = group_attendance_by_time(daily_df, ["month", "start time"], attendance="attendance")
+    assert list(time_df.columns) == ["month", "start_time", "attendance"]
+    assert time_df['month'].iloc[0] == "March/April"
+
+    month_df = group_attendance_by_time(daily_df, "month")
+    assert list(month_df['time_measure']) == ['March/April', 'May', 'June', 'July', 'August', 'September/October']
+
+    with pytest.raises(ValueError):
+        group_attendance_by_time(daily_df, ["month", "century"])
+
+### Attendance cube tests ###
+def test_rollup_attendance_matches_group_attendance_by_time():
+    cube = attendance_cube()
+    for by in ["weekday", "month", ["year", "start time"]]:
+        expected = group_attendance_by_time(process_daily(team="PIT", year=2013), by, "attendance")
+        rolled_up = rollup_attendance(cube, by, team="PIT", year=2013, attendance="attendance")
+        assert list(rolled_up.columns) == list(expected.columns)
+        assert rolled_up['attendance'].round(6).tolist() == expected['attendance'].round(6).tolist()
+
+    league = rollup_attendance(cube, "year")
+    expected = group_attendance_by_time(process_daily(), "year")
+    assert league['attendance%'].round(6).tolist() == expected['attendance%'].round(6).tolist()
+
+def test_facet_attendance_matches_rollup_attendance():
+    cube = attendance_cube()
+    teams = ["BOS", "PIT", "SEA"]
+    grid = facet_attendance(cube, "month", team=teams, year=[2013, 2014])
+    assert list(grid.index) == teams
+    for team in teams:
+        expected = rollup_attendance(cube, "month", team=team, year=[2013, 2014])['attendance%']
+        assert grid.loc[team].dropna().round(6).tolist() == expected.round(6).tolist()
+
+    grid = facet_attendance(cube, "year", facet="year", team="PIT")
+    expected = rollup_attendance(cube, "year", team="PIT")
+    assert grid.index.tolist() == expected['time_measure'].tolist()
+    assert np.diag(grid.to_numpy()).round(6).tolist() == expected['attendance%'].round(6).tolist()
+
+### Selection cache tests ###
+def test_selection_cache_canonicalizes_and_protects_results():
+    selection_cache.clear()
+    first = process_yearly(team="BOS", year=[2013, 2012])
+    second = process_yearly(team=["BOS"], year=[2012, 2013]) # Equivalent selection
+    assert selection_cache.info()["hits"] == 1
+
+    second['attendance'] = 0 # Modifying a returned frame must not corrupt the cached result
+    second['extra'] = 1
+    third = process_yearly(team="BOS", year=[2012, 2013])
+    assert third['attendance'].tolist() == first['attendance'].tolist()
+    assert 'extra' not in third.columns
+
+def test_selection_cache_size_bound():
+    cache = SelectionCache(maxsize=1)
+    cache.get("daily", "BOS", 2012, lambda: process_daily(team="BOS", year=2012))
+    cache.get("daily", "NYY", 2012, lambda: process_daily(team="NYY", year=2012))
+    assert cache.info()["size"] == 1
+    cache.get("daily", "BOS", 2012, lambda: process_daily(team="BOS", year=2012))
+    assert cache.info()["misses"] == 3
+
+### stream_yearly() tests ###
+def test_stream_yearly_matches_process_yearly():
+    expected = process_yearly(year=[2012, 2013]).reset_index(drop=True)
+    streamed = stream_yearly(year=[2012, 2013], chunksize=2500).reset_index(drop=True)
+    assert list(streamed.columns) == list(expected.columns)
+    assert streamed['team'].astype(str).tolist() == expected['team'].astype(str).tolist()
+    for col in ['attendance', 'attendance%', 'win_pct', 'tavg', 'prcp', 'median_age']:
+        assert streamed[col].round(6).equals(expected[col].astype(float).round(6)), col
+
+### Compact memory mode tests ###
+def test_compact_registry_uses_less_memory():
+    default, compact = DatasetRegistry(), DatasetRegistry(compact=True)
+    default.load()
+    compact.load()
+    assert compact.memory_usage() < 0.75 * default.memory_usage()
+    games = compact.get("games")
+    assert str(games["num_home_game"].dtype) == "int8" and str(games["cli"].dtype) == "float32"
+    assert (games["attendance"] == default.get("games")["attendance"]).all() # Integers are narrowed losslessly
+
+def test_compact_frame_keeps_nullable_integers():
+    import pandas as pd
+    df = compact_frame(pd.DataFrame({"n": pd.array([1, None, 300], dtype="Int64"), "s": ["a", "b", "a"]}))
+    assert str(df["n"].dtype) == "Int16" and str(df["s"].dtype) == "category"
+
+def test_memory_budget_evicts_least_recently_used_derived_tables():
+    budgeted = DatasetRegistry(memory_budget=parse_bytes("1KB"))
+    budgeted.derived("first", lambda reg: list(range(10)))
+    budgeted.derived("second", lambda reg: reg.get("census").copy())
+    assert budgeted.evictions >= 1
+    report = memory_report(budgeted)
+    assert "first" not in set(report["name"]) and "second" in set(report["name"]) # The newest table is kept
+    assert set(report.columns) == {"kind", "name", "column", "dtype", "bytes"}
+    assert report.loc[report["name"] == "census", "bytes"].sum() == budgeted.get("census").memory_usage(deep=True).sum()
+
+### process_trends() tests ###
+def test_process_trends_matches_per_season_pandas():
+    trends = process_trends(team="BOS", year=[2015, 2016], window=5)
+    daily = process_daily(team="BOS", year=[2014, 2015, 2016])
+    seasons = daily.groupby('year')
+    daily['rolling'] = seasons['attendance%'].transform(lambda s: s.rolling(5, min_periods=1).mean())
+    daily['delta'] = seasons['win_pct'].transform(lambda s: s - s.shift(5))
+    previous = daily.assign(year=daily['year'] + 1)[['year', 'num_home_game', 'attendance']]
+    daily = daily.merge(previous, on=['year', 'num_home_game'], how='left', suffixes=('', '_previous'))
+    expected = daily[daily['year'] >= 2015].reset_index(drop=True)
+
+    assert trends['date'].equals(expected['date'])
+    assert np.allclose(trends['attendance%_rolling'], expected['rolling'])
+    assert np.allclose(trends['win_pct_delta'], expected['delta'], equal_nan=True)
+    assert np.allclose(trends['attendance_yoy'], expected['attendance'] - expected['attendance_previous'], equal_nan=True)
+    assert trends['attendance_yoy'].notna().any() # 2015 games are compared with 2014, outside the selection
+    with pytest.raises(ValueError):
+        process_trends(team="BOS", window=0)
+
+### append_games()/append_weather() tests ###
+@pytest.fixture
+def season_in_progress(tmp_path):
+    """Points the shared registry at a copy of the data without the games and weather from 2019-09-20 on."""
+    import shutil
+    games = read_source(registry.path("games"))
+    weather = read_source(registry.path("weather"))
+    games[games['date'] < "2019-09-20"].to_csv(tmp_path / registry.files["games"], index=False)
+    weather[weather['date'] < "2019-09-20"].to_csv(tmp_path / registry.files["weather"], index=False)
+    shutil.copy(registry.path("census"), tmp_path / registry.files["census"])
+    directory = registry.directory
+    registry.directory = str(tmp_path)
+    registry.invalidate()
+    try:
+        yield games[games['date'] >= "2019-09-20"], weather[weather['date'] >= "2019-09-20"]
+    finally:
+        registry.directory = directory
+        registry.invalidate()
+
+def test_append_updates_derived_tables_like_a_rebuild(season_in_progress):
+    import pandas as pd
+    new_games, new_weather = season_in_progress
+    process_daily(team="BOS", year=2019)
+    process_yearly()
+    attendance_cube()
+    daily, games = registry.cached("daily"), registry.get("games")
+    for day in sorted(new_games['date'].unique())[:3]: # One day at a time, as for a season in progress
+        append_weather(new_weather[new_weather['date'] == day])
+        append_games(new_games[new_games['date'] == day])
+    # The full tables are not copied by each append, the new rows are merged in on first use
+    assert registry.cached("daily", merge=False) is daily and registry.get("games", merge=False) is games
+    assert len(registry.pending("daily")) == 6
+    assert registry.cached("daily") is not None and registry.cached("cube") is not None # Updated, not dropped
+
+    games, weather, census = registry.load()
+    pd.testing.assert_frame_equal(registry.cached("daily"), build_daily_table(games, weather))
+    expected = build_yearly_table(games, weather, census).sort_values(['team', 'year'], ignore_index=True)
+    pd.testing.assert_frame_equal(registry.cached("yearly").sort_values(['team', 'year'], ignore_index=True), expected)
+    expected_cube = build_attendance_cube(build_daily_table(games, weather))
+    for by in ["month", ["weekday", "start time"]]:
+        pd.testing.assert_frame_equal(rollup_attendance(attendance_cube(), by, team="BOS", year=2019),
+                                      rollup_attendance(expected_cube, by, team="BOS", year=2019))
+
+    appended = process_daily(team="BOS", year=2019)
+    registry.invalidate() # Appended rows were written to the CSVs
+    pd.testing.assert_frame_equal(process_daily(team="BOS", year=2019), appended)
+
+def test_append_in_memory_invalidates_cached_charts(season_in_progress, tmp_path):
+    import matplotlib
+    matplotlib.use("Agg")
+    from mlbattendanceplotter.cache import ChartCache
+    from mlbattendanceplotter.plotting import bar_by_team
+    new_games, new_weather = season_in_progress
+    cache = ChartCache(str(tmp_path / "charts"))
+    before = bar_by_team("attendance", 2019, cache=cache)
+    append_games(new_games, persist=False)
+    after = bar_by_team("attendance", 2019, cache=cache)
+    assert (cache.hits, cache.misses) == (0, 2) and after != before # Rendered again with the appended games
+    assert bar_by_team("attendance", 2019, cache=cache) == after
+
+def test_append_rejects_invalid_rows(season_in_progress):
+    new_games, new_weather = season_in_progress
+    games = new_games.head(2)
+    with pytest.raises(ValueError, match="Unknown team"):
+        append_games(games.assign(team="XYZ"))
+    with pytest.raises(ValueError, match="year"):
+        append_games(games.assign(year=2018))
+    with pytest.raises(ValueError, match="missing: cli"):
+        append_games(games.drop(columns="cli"))
+    with pytest.raises(ValueError, match="same team, year"):
+        append_games(games.assign(num_home_game=1))
+    with pytest.raises(ValueError, match="already loaded"):
+        append_games(registry.get("games").head(1))
+    with pytest.raises(ValueError, match="already loaded"):
+        append_weather(registry.get("weather").head(1))
+    assert not (registry.get("games")['date'] >= "2019-09-20").any() # Nothing was appended
@@ -0,0 +1,46 @@
+import pytest
+import pandas as pd
+from mlbattendanceplotter.query import query, correlate, numeric_columns
+from mlbattendanceplotter.processing import process_daily, process_yearly, selection_cache
+from mlbattendanceplotter.instrumentation import profile, instrumented
+
+### query() tests ###
+@pytest.mark.parametrize("level, process", [("daily", process_daily), ("yearly", process_yearly)])
+@pytest.mark.parametrize("teams, years", [(None, None), ("BOS", 2016), (["NYY", "BOS"], [2012, 2019])])
+def test_query_matches_process_functions(level, process, teams, years):
+    result = query(level, teams, years, columns=["tavg", "attendance%"])
+    expected = process(team=teams, year=years).reset_index(drop=True)
+    assert set(result.columns) == {"team", "year", "tavg", "attendance%"}
+    pd.testing.assert_frame_equal(result, expected[list(result.columns)], check_categorical=False)
+
+def test_query_pushes_selection_down():
+    selection_cache.clear()
+    run = instrumented(lambda: query("daily", "BOS", 2016, columns=["tavg", "attendance%"]))
+    with profile() as records:
+        df = run()
+    filters = [stage for stage in records[0]["stages"] if stage["name"] == "filter"]
+    assert [stage["rows_in"] for stage in filters] == [len(df)] # Only the selected team-season's rows are read
+    assert list(df.columns) == ["year", "team", "attendance%", "tavg"]
+
+def test_query_group_by():
+    df = query("yearly", years=2016, columns=["payroll_est"], group_by="team")
+    assert list(df.columns) == ["team", "payroll_est"]
+    yearly = process_yearly(team="BOS", year=2016)
+    assert df.loc[df["team"] == "BOS", "payroll_est"].item() == yearly["payroll_est"].item()
+
+    totals = query("daily", "BOS", columns=["attendance"], group_by="year", metrics={"attendance": "sum"})
+    daily = process_daily(team="BOS")
+    assert totals["attendance"].tolist() == daily.groupby("year")["attendance"].sum().tolist()
+
+def test_query_invalid_arguments():
+    with pytest.raises(ValueError):
+        query("monthly")
+    with pytest.raises(ValueError):
+        query("daily", columns=["payroll_est"]) # Census data is yearly only
+
+def test_correlate_covers_every_yearly_variable():
+    matrices = correlate("yearly", years=[2018, 2019])
+    assert len(numeric_columns("yearly")) == 15
+    assert matrices.shape == (30, 15) # Pearson and Spearman rows for every variable
+    expected = process_yearly(year=[2018, 2019])[numeric_columns("yearly")].astype(float).corr(method="spearman")
+    pd.testing.assert_frame_equal(matrices.loc["spearman"], expected, check_names=False)
@@ -0,0 +1,43 @@
+import os
+import matplotlib
+matplotlib.use("Agg")
+import pytest
+from mlbattendanceplotter.rendering import render_batch, render_plot
+
+### render_plot() tests ###
+def test_render_plot_formats():
+    assert render_plot("bar_by_team", fmt="png", y="prcp", year=2012).startswith(b"\x89PNG")
+    assert b"<svg" in render_plot("scatter_yearly", fmt="svg", x="tavg", y="attendance%", year=2013)
+    html = render_plot("scatter_3d", fmt="html", x="win_pct", y="tavg", z="attendance%", team="BOS", year=2016)
+    assert b"<html>" in html
+    with pytest.raises(ValueError):
+        render_plot("not_a_plot")
+
+### render_batch() tests ###
+def test_render_batch(tmp_path):
+    jobs = [
+        {"plot": "bar_attendance_by_time", "kwargs": {"by": "weekday", "team": "LAD", "year": 2012}},
+        ("scatter_daily", {"x": "tavg", "y": "attendance", "team": "NYY", "year": 2012}),
+        {"plot": "bar_by_team", "kwargs": {"y": "win_pct"}, "format": "svg", "name": "win_pct.svg"},
+    ]
+    paths = render_batch(jobs, str(tmp_path), workers=2)
+    assert [path.rsplit("/", 1)[-1] for path in paths] == \
+        ["0000_bar_attendance_by_time.png", "0001_scatter_daily.png", "win_pct.svg"]
+    assert all((tmp_path / name).stat().st_size > 0 for name in ["0000_bar_attendance_by_time.png", "win_pct.svg"])
+
+def test_render_batch_in_process_is_headless(tmp_path, monkeypatch):
+    import matplotlib.pyplot as plt
+    from mlbattendanceplotter import rendering
+    backends = []
+    render_plot = rendering.render_plot
+    monkeypatch.setattr(rendering, "render_plot", lambda *args, **kwargs: (backends.append(matplotlib.get_backend()),
+                                                                           render_plot(*args, **kwargs))[1])
+    matplotlib.use("pdf") # Any backend other than Agg
+    fig = plt.figure() # A figure the caller has open
+    try:
+        paths = render_batch([("bar_by_team", {"y": "prcp", "year": 2012})], str(tmp_path), workers=1)
+        assert backends == ["agg"] and os.path.getsize(paths[0]) > 0
+        assert matplotlib.get_backend() == "pdf" and plt.fignum_exists(fig.number) # Restored, not closed
+    finally:
+        plt.close(fig)
+        matplotlib.use("Agg")
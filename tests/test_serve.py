@@ -0,0 +1,77 @@
+import json
+import asyncio
+
+from mlbattendanceplotter.serve import ChartServer, EndpointMetrics, parse_arguments
+
+def fetch_all(paths, workers=1):
+    """Starts a server on a free port, requests every path concurrently and returns [(status, headers, body)]."""
+    async def request(port, path):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode("latin-1"))
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, body = response.split(b"\r\n\r\n", 1)
+        lines = head.decode("latin-1").split("\r\n")
+        headers = dict(line.split(": ", 1) for line in lines[1:])
+        return int(lines[0].split()[1]), headers, body
+
+    async def run():
+        server = ChartServer(port=0, workers=workers, warm_data=False)
+        await server.start()
+        try:
+            return await asyncio.gather(*[request(server.port, path) for path in paths])
+        finally:
+            await server.close()
+    return asyncio.run(run())
+
+### Argument parsing tests ###
+def test_parse_arguments():
+    assert parse_arguments("team=BOS,NYY&year=2016&lobf=true&by=start%20time&color=none&x=attendance%25") == \
+        {"team": ["BOS", "NYY"], "year": 2016, "lobf": True, "by": "start time", "color": None, "x": "attendance%"}
+
+### Endpoint tests ###
+def test_endpoints():
+    paths = [
+        "/data/yearly?team=BOS&year=2016",
+        "/data/daily?team=BOS,NYY&year=2016&format=csv",
+        "/data/grouped?by=weekday&team=LAD&year=2012",
+        "/plot/bar_by_team?y=prcp&year=2012",
+        "/plot/scatter_yearly?x=tavg&y=attendance%25&format=svg",
+        "/plot/not_a_plot",
+        "/data/yearly?team=BOS&format=xml",
+        "/health",
+    ]
+    yearly, daily, grouped, png, svg, missing, invalid, health = fetch_all(paths)
+
+    assert yearly[0] == 200 and yearly[1]["Content-Type"] == "application/json"
+    rows = json.loads(yearly[2])
+    assert len(rows) == 1 and rows[0]["team"] == "BOS" and rows[0]["year"] == 2016
+    assert daily[0] == 200 and daily[2].startswith(b"date,") and daily[2].count(b"\n") > 100
+    assert grouped[0] == 200 and len(json.loads(grouped[2])) == 7
+    assert png[0] == 200 and png[1]["Content-Type"] == "image/png" and png[2].startswith(b"\x89PNG")
+    assert svg[0] == 200 and b"<svg" in svg[2]
+    assert missing[0] == 404 and invalid[0] == 400
+    assert health[2] == b"ok"
+
+def test_invalid_parameters():
+    paths = {
+        "/plot/bar_by_team?y=prcp&cache=0": "cache",
+        "/plot/bar_by_team?y=prcp&show=true": "show",
+        "/plot/scatter_daily?x=tavg&y=attendance&tema=BOS": "tema",
+        "/data/grouped?by=weekday&games=1": "games",
+    }
+    for (status, headers, body), parameter in zip(fetch_all(list(paths)), paths.values()):
+        assert status == 400 and "Invalid parameter(s) for /" in body.decode() and parameter in body.decode()
+
+### Metrics tests ###
+def test_metrics():
+    metrics = EndpointMetrics(window=10)
+    for seconds in range(1, 21):
+        metrics.record("/data/yearly", seconds / 1000, 200 if seconds % 5 else 500)
+    report = metrics.snapshot()["/data/yearly"]
+    assert report["count"] == 20 and report["errors"] == 4
+    assert report["mean_ms"] == 10.5 and report["max_ms"] == 20 and report["p50_ms"] == 16 # Last 10 requests
+
+    status, _, body = fetch_all(["/health", "/metrics"])[1]
+    assert status == 200 and json.loads(body)["/health"]["count"] == 1
@@ -0,0 +1,62 @@
+import mmap
+import numpy as np
+import pandas as pd
+import pytest
+from mlbattendanceplotter.processing import DatasetRegistry, DATA_DIRECTORY, daily_table, weather_arrays, registry
+from mlbattendanceplotter.shared import publish, attach
+
+def mapped(series):
+    """Returns True if the column's values are a view of a memory-mapped file."""
+    base = series.to_numpy()
+    while getattr(base, "base", None) is not None:
+        base = base.base
+    return isinstance(base, mmap.mmap)
+
+### publish()/attach() tests ###
+def test_publish_and_attach(tmp_path):
+    daily = daily_table() # Builds the weather arrays too
+    path = publish(str(tmp_path / "shared"))
+
+    attached = DatasetRegistry()
+    names = attach(path, attached)
+    assert {"games", "weather", "census", "daily", "weather_arrays"} <= set(names)
+
+    games = attached.get("games")
+    pd.testing.assert_frame_equal(games, registry.get("games"))
+    pd.testing.assert_frame_equal(attached.derived("daily", lambda reg: None), daily)
+    arrays = attached.derived("weather_arrays", lambda reg: None)
+    assert np.array_equal(arrays.values["tavg"], weather_arrays().values["tavg"], equal_nan=True)
+
+    assert mapped(games["attendance"]) and not isinstance(games["attendance"].to_numpy(), np.memmap)
+    with pytest.raises(ValueError):
+        games.loc[0, "attendance"] = 0
+
+def test_registry_attaches_on_first_use(tmp_path):
+    path = publish(str(tmp_path / "shared"), names=["games", "census"])
+    shared_registry = DatasetRegistry(shared=path)
+    assert mapped(shared_registry.get("census")["population"])
+    assert not mapped(shared_registry.get("weather")["tavg"]) # Not published, loaded as usual
+
+def test_attach_rejects_other_data(tmp_path):
+    path = publish(str(tmp_path / "shared"), names=["census"])
+    (tmp_path / "census.csv").write_bytes(open(f"{DATA_DIRECTORY}/census_2012_2019.csv", "rb").read())
+    other = DatasetRegistry(directory=str(tmp_path), files={"census": "census.csv"})
+    with pytest.raises(ValueError):
+        attach(path, other)
+    with pytest.warns(UserWarning):
+        census = DatasetRegistry(directory=str(tmp_path), files={"census": "census.csv"}, shared=path).get("census")
+    assert not mapped(census["population"])
+
+def test_attach_keeps_rows_appended_in_memory(tmp_path):
+    from mlbattendanceplotter.processing import append_games
+    game = registry.get("games").tail(1).assign(num_home_game=999) # A game that is not loaded yet
+    try:
+        append_games(game, persist=False)
+        path = publish(str(tmp_path / "shared"), names=["games"])
+        assert (tmp_path / "shared" / "meta.json").exists()
+        attached = DatasetRegistry()
+        attach(path, attached)
+        assert len(attached.get("games")) == len(registry.get("games"))
+        assert attached.fingerprint() == registry.fingerprint() != DatasetRegistry().fingerprint()
+    finally:
+        registry.invalidate() # Drops the appended game
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+from mlbattendanceplotter.stats import bin_2d, bin_3d, stratified_sample, fit_lines, fit_band, t_quantile, \
+    group_starts, rolling_mean, lagged_difference, correlations
+
+### Binning tests ###
+def test_bin_2d_counts_and_means():
+    x = np.array([0.0, 0.1, 0.9, 1.0, np.nan])
+    y = np.array([0.0, 0.1, 0.9, 1.0, 0.5])
+    counts, means, x_edges, y_edges = bin_2d(x, y, bins=2, values=[1, 3, 5, 7, 100])
+    assert counts.sum() == 4 # The NaN row is ignored
+    assert counts[0, 0] == 2 and counts[1, 1] == 2
+    assert means[0, 0] == 2 and means[1, 1] == 6
+    assert np.isnan(means[0, 1])
+    assert len(x_edges) == len(y_edges) == 3
+
+def test_bin_3d_returns_occupied_voxels():
+    rng = np.random.default_rng(0)
+    x, y, z = rng.random((3, 1000))
+    voxels = bin_3d(x, y, z, bins=5, values=x)
+    assert voxels["count"].sum() == 1000
+    assert (voxels["count"] > 0).all()
+    assert np.allclose(voxels["mean"], voxels["x"], atol=0.1) # Voxel means lie within the voxel
+
+### Sampling tests ###
+def test_stratified_sample_keeps_small_strata():
+    df = pd.DataFrame({"team": ["A"] * 990 + ["B"] * 10, "value": range(1000)})
+    sample = stratified_sample(df, "team", 100)
+    assert 100 <= len(sample) <= 102
+    assert set(sample["team"]) == {"A", "B"}
+    assert sample.index.is_monotonic_increasing
+    assert sample.equals(stratified_sample(df, "team", 100)) # Same seed, same points
+    assert stratified_sample(df, "team", 5000) is df
+
+### Regression tests ###
+def test_fit_lines_matches_polyfit_per_group():
+    rng = np.random.default_rng(0)
+    x = rng.random(300)
+    groups = np.repeat(["BOS", "NYY", "TBR"], 100)
+    y = 3 * x + np.repeat([1.0, 5.0, -2.0], 100) + rng.normal(0, 0.2, 300)
+    y[5] = np.nan # Ignored
+    fits = fit_lines(x, y, groups)
+    assert list(fits.index) == ["BOS", "NYY", "TBR"]
+    assert fits.loc["BOS", "n"] == 99
+    for team in fits.index:
+        mask = (groups == team) & ~np.isnan(y)
+        slope, intercept = np.polyfit(x[mask], y[mask], 1)
+        assert np.isclose(fits.loc[team, "slope"], slope)
+        assert np.isclose(fits.loc[team, "intercept"], intercept)
+        assert np.isclose(fits.loc[team, "r2"], np.corrcoef(x[mask], y[mask])[0, 1] ** 2)
+
+def test_fit_band_is_narrowest_at_mean():
+    rng = np.random.default_rng(1)
+    x = rng.random(50)
+    fits = fit_lines(x, 2 * x + rng.normal(0, 1, 50))
+    band = fit_band(fits, points=101)
+    assert len(band) == 101 and (band["group"] == "all").all()
+    width = band["upper"] - band["lower"]
+    assert (width > 0).all()
+    assert abs(band["x"][width.idxmin()] - fits.loc["all", "x_mean"]) < 0.02
+    assert np.allclose((band["upper"] + band["lower"]) / 2, band["y"])
+
+def test_t_quantile():
+    assert np.allclose(t_quantile(0.975, [1, 2, 3, 10, 30]), [12.7062, 4.3027, 3.1824, 2.2281, 2.0423], rtol=2e-3)
+    assert np.isnan(t_quantile(0.975, 0))
+
+### Grouped series tests ###
+def test_rolling_mean_and_lagged_difference_stay_within_groups():
+    starts = group_starts(["a", "a", "a", "b", "b"])
+    assert list(starts) == [0, 0, 0, 3, 3]
+    values = [1.0, np.nan, 5.0, 10.0, 20.0]
+    assert np.allclose(rolling_mean(values, starts, 2), [1.0, 1.0, 5.0, 10.0, 15.0])
+    assert np.allclose(lagged_difference(values, starts, 1), [np.nan, np.nan, np.nan, np.nan, 10.0], equal_nan=True)
+
+### Correlation tests ###
+def test_correlations_match_pandas_for_every_method():
+    df = pd.DataFrame({"a": [1.0, 2.0, 3.0, 4.0, 5.0], "b": [2.0, 1.0, 4.0, np.nan, 6.0], "c": [5.0, 3.0, 4.0, 1.0, 2.0],
+                       "team": list("vwxyz")})
+    matrices = correlations(df)
+    assert list(matrices.columns) == ["a", "b", "c"] # Numeric columns only
+    for method in ["pearson", "spearman"]:
+        pd.testing.assert_frame_equal(matrices.loc[method], df[["a", "b", "c"]].corr(method=method), check_names=False)